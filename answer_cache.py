@@ -0,0 +1,215 @@
+# answer_cache.py - Cache sémantique des réponses générées
+
+"""
+Cache sémantique placé devant l'appel au LLM.
+
+Une réponse déjà générée est réutilisée si la nouvelle question est proche
+(similarité cosinus >= seuil) d'une question déjà traitée ET si le contexte
+récupéré est exactement le même ET si elle a été produite par le même
+backend et le même modèle (une réponse du backend local extractif n'est
+jamais servie à l'application Gemini). Les entrées sont persistées dans
+SQLite, partagé par tous les backends : seules celles du backend et du
+modèle courants sont chargées, les autres sont conservées pour un retour à
+ce backend. Elles expirent après un TTL et sont purgées quand la version de
+l'index change. Au-delà de `max_entries` (par backend et modèle), les
+entrées expirées puis les moins récemment servies sont évincées.
+
+L'index vectoriel des questions est une matrice NumPy gardée en mémoire,
+préallouée et agrandie par doublement ; une entrée évincée est remplacée
+par la dernière ligne.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from config import ANSWER_CACHE_PATH, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+
+INITIAL_CAPACITY = 64
+
+
+def context_key(context):
+    """Identifie un contexte récupéré par l'ensemble de ses passages (ordre indifférent)"""
+    ids = sorted(hashlib.sha1(passage.encode("utf-8")).hexdigest() for passage in context)
+    return hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    def __init__(self, path=ANSWER_CACHE_PATH, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            context_key TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            index_version INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )""")
+        # Colonnes ajoutées après coup : les anciennes entrées (backend '') ne sont plus servies
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(answers)")}
+        for column, definition in [("backend", "TEXT NOT NULL DEFAULT ''"), ("model", "TEXT NOT NULL DEFAULT ''"),
+                                   ("last_used", "REAL NOT NULL DEFAULT 0")]:
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE answers ADD COLUMN {column} {definition}")
+        self.db.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers(backend, model)")
+        self.db.commit()
+
+        self._scope = None  # (version de l'index, backend, modèle) des entrées chargées
+        self._reset()
+
+    def _reset(self, dim=0):
+        self._size = 0
+        self._ids = []
+        self._contexts = []
+        self._created = np.zeros(INITIAL_CAPACITY)
+        self._used = np.zeros(INITIAL_CAPACITY)
+        self._matrix = np.zeros((INITIAL_CAPACITY, dim), dtype=np.float32)
+
+    def _grow(self, dim):
+        """Double la capacité (et fixe la dimension au premier vecteur)"""
+        if self._matrix.shape[1] != dim:
+            self._matrix = np.zeros((len(self._created), dim), dtype=np.float32)
+        if self._size < len(self._created):
+            return
+        capacity = 2 * len(self._created)
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        self._created = np.resize(self._created, capacity)
+        self._used = np.resize(self._used, capacity)
+
+    def _append(self, entry_id, vector, key, created, used):
+        self._grow(len(vector))
+        row = self._size
+        self._matrix[row] = vector
+        self._created[row] = created
+        self._used[row] = used
+        self._ids.append(entry_id)
+        self._contexts.append(key)
+        self._size += 1
+
+    def _remove(self, row):
+        """Retire une entrée de la mémoire : la dernière ligne prend sa place"""
+        last = self._size - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._created[row] = self._created[last]
+            self._used[row] = self._used[last]
+            self._ids[row] = self._ids[last]
+            self._contexts[row] = self._contexts[last]
+        self._ids.pop()
+        self._contexts.pop()
+        self._size = last
+
+    def _load(self, scope):
+        """Recharge l'index mémoire pour une version d'index et un générateur, en purgeant les entrées obsolètes"""
+        index_version, backend, model = scope
+        cutoff = time.time() - self.ttl
+        # Les réponses des autres backends restent en base ; seules l'ancienne version de l'index et le TTL purgent
+        self.db.execute("DELETE FROM answers WHERE index_version != ? OR created_at < ?", (index_version, cutoff))
+        self.db.commit()
+        rows = self.db.execute(
+            "SELECT id, embedding, context_key, created_at, last_used FROM answers "
+            "WHERE backend = ? AND model = ? ORDER BY id", (backend, model)).fetchall()
+
+        self._scope = scope
+        self._reset()
+        for entry_id, blob, key, created, used in rows:
+            self._append(entry_id, np.frombuffer(blob, dtype=np.float32), key, created, used or created)
+
+    def _evict(self, now):
+        """Évince les entrées expirées, puis les moins récemment servies, jusqu'à max_entries"""
+        evicted = []
+        expired = np.flatnonzero(self._created[:self._size] < now - self.ttl)
+        for row in sorted(expired, reverse=True):
+            evicted.append(self._ids[row])
+            self._remove(int(row))
+        while self._size > self.max_entries:
+            row = int(np.argmin(self._used[:self._size]))
+            evicted.append(self._ids[row])
+            self._remove(row)
+        if evicted:
+            self.db.executemany("DELETE FROM answers WHERE id = ?", [(entry_id,) for entry_id in evicted])
+            self.evictions += len(evicted)
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding, context, index_version, backend, model=""):
+        """Renvoie la réponse mise en cache la plus proche pour ce backend et ce modèle, ou None"""
+        key = context_key(context)
+        query = self._normalize(embedding)
+        scope = (index_version, backend, model)
+        with self._lock:
+            if self._scope != scope:
+                self._load(scope)
+            if not self._size:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            scores = self._matrix[:self._size] @ query
+            valid = (np.array([c == key for c in self._contexts])
+                     & (self._created[:self._size] >= now - self.ttl))
+            scores = np.where(valid, scores, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            row = self.db.execute("SELECT answer FROM answers WHERE id = ?", (self._ids[best],)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._used[best] = now
+            self.db.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, self._ids[best]))
+            self.db.commit()
+            self.hits += 1
+            return row[0]
+
+    def store(self, question, embedding, context, answer, index_version, backend, model=""):
+        vector = self._normalize(embedding)
+        key = context_key(context)
+        now = time.time()
+        scope = (index_version, backend, model)
+        with self._lock:
+            if self._scope != scope:
+                self._load(scope)
+            cursor = self.db.execute(
+                "INSERT INTO answers (question, embedding, context_key, answer, index_version, created_at, "
+                "backend, model, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (question, vector.tobytes(), key, answer, index_version, now, backend, model, now))
+            self._append(cursor.lastrowid, vector, key, now, now)
+            if self._size > self.max_entries:
+                self._evict(now)
+            self.db.commit()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions
+            }
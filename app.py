@@ -1,9 +1,8 @@
 # app.py - Point d'entrée principal pour l'application d'assistant médical
 
 import streamlit as st
-import json
-import os
-from datetime import datetime
+
+from user_store import get_user_store
 
 # Titre et style de l'application - DOIT ÊTRE la première commande Streamlit
 st.set_page_config(
@@ -12,35 +11,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# Chemins de stockage local
-USER_DATA_DIR = "user_data"
-USERS_FILE = os.path.join(USER_DATA_DIR, "users.json")
-os.makedirs(USER_DATA_DIR, exist_ok=True)
-
-# Charger les utilisateurs
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    
-    # Essayer différents encodages
-    encodings = ['utf-8', 'latin-1', 'ISO-8859-1', 'cp1252']
-    for encoding in encodings:
-        try:
-            with open(USERS_FILE, "r", encoding=encoding) as f:
-                return json.load(f)
-        except UnicodeDecodeError:
-            continue
-        except json.JSONDecodeError:
-            break
-    
-    # Si rien ne fonctionne, créer un nouveau fichier vide
-    return {}
-
-# Sauvegarder les utilisateurs
-def save_users(users):
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=2, ensure_ascii=False)
-
 # Initialisation session state pour l'authentification
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
@@ -58,11 +28,11 @@ def login_page():
     col1, col2 = st.columns([3, 1])
     with col1:
         if st.button("Se connecter", use_container_width=True):
-            users = load_users()
-            if username in users and users[username].get("password") == password:
+            account = get_user_store().get_user(username)
+            if account is not None and account["password"] == password:
                 st.session_state.logged_in = True
                 st.session_state.current_user = username
-                st.session_state.language = users[username].get("language", "fr")
+                st.session_state.language = account["language"]
                 st.success(f"👋 Bienvenue {username} ! Redirection vers l'accueil...")
                 # Redirection automatique vers la page d'accueil
                 st.switch_page("pages/00_Accueil.py")
@@ -83,20 +53,12 @@ def register_page():
     language = st.selectbox("Langue préférée", ["fr", "en"])
 
     if st.button("Créer compte", use_container_width=True):
-        users = load_users()
-        if new_username in users:
-            st.warning("⚠️ Ce nom d'utilisateur existe déjà.")
-        elif len(new_password) < 6:
+        store = get_user_store()
+        if len(new_password) < 6:
             st.warning("⚠️ Mot de passe trop court (minimum 6 caractères).")
+        elif not store.create_user(new_username, new_password, language):
+            st.warning("⚠️ Ce nom d'utilisateur existe déjà.")
         else:
-            users[new_username] = {
-                "password": new_password,
-                "created_at": str(datetime.now()),
-                "history": [],
-                "potential_diseases": [],
-                "language": language
-            }
-            save_users(users)
             st.success("✅ Compte créé ! Redirection vers l'accueil...")
             st.session_state.logged_in = True
             st.session_state.current_user = new_username
@@ -0,0 +1,764 @@
+# benchmark.py - Banc de performance de bout en bout de la chaîne RAG
+
+"""
+Mesure les performances de MedAi sur un corpus synthétique (même schéma que
+data/raw/medical_data.jsonl) et écrit les résultats en JSON pour comparer
+deux exécutions.
+
+    python benchmark.py --sizes 1000,10000 --top-k 3,10 --output bench.json
+    python benchmark.py --baseline bench_main.json --tolerance 0.15
+
+Suites disponibles (--suites) :
+- index     : débit d'indexation de load_medical_knowledge (à froid, cache
+              d'embeddings chaud, delta vide) et de create_vector_store ;
+- retrieval : latences p50/p95/p99 de retrieve_context par taille de corpus et
+              top_k, taille sur disque et recouvrement des top_k avec le
+              premier stockage de --stores ;
+- quantization : stockage numpy avec première passe binaire ou int8 puis
+              re-classement exact, contre le stockage actuel : mémoire parcourue
+              par recherche, latences, rappel@k par rapport à la recherche exacte
+              float32 et recouvrement des passages retenus par retrieve_context ;
+- e2e       : latence question -> réponse avec un LLM simulé (backend local
+              ou serveur Gemini factice) ;
+- batching  : encodage des questions par N sessions concurrentes, avec et
+              sans micro-lots (débit, latences, taille moyenne des lots) ;
+- users     : écritures de N sessions concurrentes dans la base des
+              utilisateurs (consultations, changements de profil, lectures),
+              transaction par écriture contre group commit : débit, latences,
+              mises à jour perdues (doit rester 0) ; la taille de corpus sert
+              de nombre de consultations déjà enregistrées ;
+- embedder  : encodeur PyTorch de référence contre ONNX int8 (latence par
+              question, débit, RSS du processus, cosinus et recouvrement des
+              top_k par rapport à la référence) ;
+- startup   : temps d'import des modules (interpréteur neuf), modules lourds
+              chargés à l'import, délai avant assistant prêt et première réponse.
+
+Les suites index, retrieval et e2e sont mesurées pour chaque stockage
+vectoriel de --stores (chroma, numpy), avec les mêmes questions.
+
+Chaque scénario s'exécute dans un répertoire temporaire (les chemins de
+config.py sont relatifs) : la base et les caches du dépôt ne sont jamais touchés.
+Avec --baseline, les métriques dégradées de plus de --tolerance sont signalées
+et le code de sortie vaut 1 ; de même si un import dépasse --import-budget-ms.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+CONDITIONS = ["diabète", "hypertension", "asthme", "migraine", "grippe", "anémie", "arthrose",
+              "bronchite", "eczéma", "dépression", "insuffisance cardiaque", "hypothyroïdie",
+              "gastro-entérite", "otite", "pneumonie", "psoriasis", "sinusite", "varicelle"]
+SYMPTOMS = ["fièvre", "fatigue", "toux", "douleur thoracique", "maux de tête", "nausées",
+            "vertiges", "essoufflement", "douleurs articulaires", "démangeaisons", "perte de poids",
+            "soif intense", "palpitations", "troubles du sommeil", "douleur abdominale"]
+TREATMENTS = ["repos", "hydratation", "paracétamol", "antibiotiques", "insuline", "bêtabloquants",
+              "corticoïdes", "kinésithérapie", "antihistaminiques", "activité physique régulière",
+              "régime pauvre en sel", "inhalateur", "suivi médical", "vaccination"]
+QUESTION_TEMPLATES = ["Quels sont les symptômes de {c} ?", "Comment traiter {c} ?",
+                      "{s} et {c}, faut-il consulter ?", "Quel traitement pour {c} avec {s} ?",
+                      "Est-ce que {t} aide contre {c} ?"]
+
+
+def generate_corpus(path, n_docs, seed=0, sentences_per_doc=8):
+    """Écrit n_docs documents synthétiques au format medical_data.jsonl"""
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_docs):
+            condition = rng.choice(CONDITIONS)
+            sentences = []
+            for _ in range(sentences_per_doc):
+                sentences.append(rng.choice([
+                    f"Le {condition} peut provoquer {rng.choice(SYMPTOMS)} et {rng.choice(SYMPTOMS)}.",
+                    f"Le traitement repose souvent sur {rng.choice(TREATMENTS)} et {rng.choice(TREATMENTS)}.",
+                    f"Consultez un médecin si {rng.choice(SYMPTOMS)} persiste plus de {rng.randint(2, 14)} jours.",
+                    f"Chez {rng.randint(1, 40)} % des patients, {rng.choice(SYMPTOMS)} apparaît en premier.",
+                ]))
+            f.write(json.dumps({
+                "title": f"{condition.capitalize()} - fiche {i}",
+                "text": " ".join(sentences),
+                "source": rng.choice(["NHS", "PubMed"]),
+                "domain": condition
+            }, ensure_ascii=False) + "\n")
+
+
+def generate_questions(n, seed=1):
+    rng = random.Random(seed)
+    return [rng.choice(QUESTION_TEMPLATES).format(c=rng.choice(CONDITIONS), s=rng.choice(SYMPTOMS),
+                                                  t=rng.choice(TREATMENTS)) + f" (#{i})"
+            for i in range(n)]
+
+
+def percentiles(samples_s):
+    """p50/p95/p99 et moyenne, en millisecondes"""
+    values = np.asarray(samples_s) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "n": int(values.size)
+    }
+
+
+@contextmanager
+def scratch_dir(keep=False):
+    """Répertoire de travail temporaire ; les chemins relatifs de config.py y sont résolus"""
+    previous = os.getcwd()
+    path = tempfile.mkdtemp(prefix="medai_bench_")
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        # Chroma garde un client par chemin (relatif) : l'oublier avant de changer de répertoire
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+        if not keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _new_assistant(args, store=None):
+    from rag_pipeline import MedicalRAGAssistant
+    return MedicalRAGAssistant(llm_backend=args.llm_backend, vector_store=store or args.stores[0])
+
+
+# --- Suites ---------------------------------------------------------------------------
+
+def bench_index(args, size):
+    results = {}
+    for store in args.stores:
+        results[store] = _bench_index_store(args, size, store)
+    return results
+
+
+def _bench_index_store(args, size, store):
+    from config import DATA_FILE
+    results = {}
+
+    with scratch_dir(args.keep):
+        # Assistant sur un corpus vide, pour ne mesurer que l'indexation
+        generate_corpus(DATA_FILE, 0)
+        assistant = _new_assistant(args, store)
+        generate_corpus(DATA_FILE, size, seed=args.seed)
+
+        for label in ["cold", "warm_cache"]:
+            if label == "warm_cache":
+                assistant.store.reset()
+                os.remove(assistant.store.manifest_path)
+            start = time.perf_counter()
+            assistant.load_medical_knowledge()
+            elapsed = time.perf_counter() - start
+            results[f"load_{label}_s"] = round(elapsed, 3)
+            results[f"load_{label}_docs_per_s"] = round(size / elapsed, 1)
+
+        start = time.perf_counter()
+        assistant.load_medical_knowledge()
+        results["load_noop_delta_s"] = round(time.perf_counter() - start, 3)
+
+    if args.create_store:
+        import create_embeddings
+        with scratch_dir(args.keep):
+            generate_corpus(DATA_FILE, size, seed=args.seed)
+            start = time.perf_counter()
+            create_embeddings.create_vector_store(DATA_FILE, workers=args.workers, store=store)
+            elapsed = time.perf_counter() - start
+            results["create_store_s"] = round(elapsed, 3)
+            results["create_store_docs_per_s"] = round(size / elapsed, 1)
+            results["create_store_workers"] = args.workers or os.cpu_count()
+
+    return results
+
+
+def _overlap(found, reference):
+    return round(float(np.mean([len(set(f) & set(r)) / max(len(r), 1) for f, r in zip(found, reference)])), 4)
+
+
+def bench_retrieval(args, size):
+    from config import DATA_FILE
+    from embedding_cache import QueryEmbeddingCache
+    from vector_store import open_vector_store
+    results = {}
+
+    with scratch_dir(args.keep):
+        generate_corpus(DATA_FILE, size, seed=args.seed)
+        assistant = _new_assistant(args)
+        questions = generate_questions(args.queries, seed=args.seed + 1)
+        embeddings = assistant.embed_queries(questions)
+        reference = {}  # top_k -> identifiants trouvés par le premier stockage
+
+        for store in args.stores:
+            if store != assistant.store.name:
+                # Même assistant (et cache d'embeddings) : seul le stockage change
+                assistant.store = open_vector_store(store)
+                assistant.load_medical_knowledge()
+            store_results = results[store] = {"disk_mb": round(assistant.store.disk_size() / 2 ** 20, 2)}
+
+            for _ in range(args.warmup):
+                assistant.retrieve_context("question d'échauffement", 3)
+
+            for top_k in args.top_k:
+                found = assistant.store.query(embeddings, top_k)["ids"]
+                if top_k in reference:
+                    store_results[f"overlap@{top_k}"] = _overlap(found, reference[top_k])
+                else:
+                    reference[top_k] = found
+
+                assistant.query_cache = QueryEmbeddingCache()  # questions inédites : pas d'effet cache
+                samples = []
+                for question in questions:
+                    start = time.perf_counter()
+                    assistant.retrieve_context(question, top_k)
+                    samples.append(time.perf_counter() - start)
+                store_results[f"top_k={top_k}"] = percentiles(samples)
+
+                # Mêmes questions une seconde fois : chemin servi par le cache de requêtes
+                samples = []
+                for question in questions:
+                    start = time.perf_counter()
+                    assistant.retrieve_context(question, top_k)
+                    samples.append(time.perf_counter() - start)
+                store_results[f"top_k={top_k}_cached_query"] = percentiles(samples)
+
+    return results
+
+
+def bench_quantization(args, size):
+    from config import DATA_FILE, VECTOR_RESCORE_CANDIDATES
+    from vector_store import NumpyVectorStore
+    results = {}
+
+    with scratch_dir(args.keep):
+        generate_corpus(DATA_FILE, size, seed=args.seed)
+        assistant = _new_assistant(args)
+        current = assistant.store
+        questions = generate_questions(args.queries, seed=args.seed + 4)
+        embeddings = assistant.embed_queries(questions)
+        top_k = max(args.top_k)
+
+        # Vérité terrain : recherche exacte en float32
+        assistant.store = NumpyVectorStore(path="exact", dtype="float32", quantization="none")
+        assistant.load_medical_knowledge()
+        truth = assistant.store.query(embeddings, top_k)["ids"]
+        reference = _selected_passages(assistant, questions)
+
+        stores = {"current": current}
+        for mode in args.quantization:
+            stores[mode] = NumpyVectorStore(path=f"numpy_{mode}", dtype="float32", quantization=mode,
+                                            rescore=args.rescore or VECTOR_RESCORE_CANDIDATES)
+
+        for label, store in stores.items():
+            assistant.store = store
+            if store is not current:
+                assistant.load_medical_knowledge()
+            entry = results[label] = {"resident_mb": round(store.resident_size() / 2 ** 20, 2),
+                                      "disk_mb": round(store.disk_size() / 2 ** 20, 2)}
+
+            for embedding in embeddings[:args.warmup]:
+                store.query([embedding], top_k)
+            samples, found = [], []
+            for embedding in embeddings:
+                start = time.perf_counter()
+                found.append(store.query([embedding], top_k)["ids"][0])
+                samples.append(time.perf_counter() - start)
+            entry["search"] = percentiles(samples)
+            for k in args.top_k:
+                entry[f"recall@{k}"] = _overlap([f[:k] for f in found], [t[:k] for t in truth])
+
+            entry["context_overlap"] = _overlap(_selected_passages(assistant, questions), reference)
+
+    return results
+
+
+def _selected_passages(assistant, questions):
+    return [[(m["parent_id"], m["chunk"]) for m in assistant.retrieve_context(question)[1]] for question in questions]
+
+
+def bench_e2e(args, size):
+    results = {}
+    for store in args.stores:
+        results[store] = _bench_e2e_store(args, size, store)
+    return results
+
+
+def _bench_e2e_store(args, size, store):
+    from config import DATA_FILE
+    from context_builder import estimate_tokens
+    from llm_backends import build_prompt, LLMError
+    results = {}
+
+    with scratch_dir(args.keep):
+        generate_corpus(DATA_FILE, size, seed=args.seed)
+        assistant = _new_assistant(args, store)
+        questions = generate_questions(args.e2e_queries, seed=args.seed + 2)
+
+        total, retrieve, generate, first_chunk, prompt_tokens = [], [], [], [], []
+        errors = 0
+        for question in questions:
+            t0 = time.perf_counter()
+            context, _ = assistant.retrieve_context(question)
+            t1 = time.perf_counter()
+            first = None
+            try:
+                for _chunk in assistant.stream_answer(question, context):
+                    if first is None:
+                        first = time.perf_counter()
+            except LLMError:
+                errors += 1
+            t2 = time.perf_counter()
+            retrieve.append(t1 - t0)
+            generate.append(t2 - t1)
+            first_chunk.append((first or t2) - t0)
+            total.append(t2 - t0)
+            prompt_tokens.append(estimate_tokens(build_prompt(question, context)))
+
+        results["total"] = percentiles(total)
+        results["retrieve"] = percentiles(retrieve)
+        results["generate"] = percentiles(generate)
+        results["time_to_first_chunk"] = percentiles(first_chunk)
+        results["prompt_tokens_mean"] = round(float(np.mean(prompt_tokens)), 1)
+        results["llm_errors"] = errors
+        results["llm_backend"] = assistant.llm.name
+
+    return results
+
+
+# Modules importés au premier affichage d'une page, et dépendances qu'ils ne doivent pas charger
+STARTUP_MODULES = ["config", "utils", "rag_pipeline"]
+HEAVY_MODULES = ["sentence_transformers", "torch", "chromadb", "fpdf"]
+
+_IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"s": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_READY_PROBE = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+from rag_pipeline import MedicalRAGAssistant
+assistant = MedicalRAGAssistant(llm_backend={backend!r})
+ready = time.perf_counter()
+assistant.retrieve_context("Quels sont les symptômes du diabète ?")
+first = time.perf_counter()
+print(json.dumps({{"ready_s": ready - start, "first_query_s": first - ready}}))
+"""
+
+
+def _probe(code, cwd=None):
+    """Exécute un script dans un interpréteur neuf et renvoie sa dernière ligne (JSON)"""
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=cwd, text=True,
+                                     stderr=subprocess.DEVNULL)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_startup(args, size):
+    from config import DATA_FILE
+    results = {"imports": {}}
+
+    for module in STARTUP_MODULES:
+        samples, heavy = [], set()
+        for _ in range(args.import_runs):
+            probe = _probe(_IMPORT_PROBE.format(repo=REPO_DIR, module=module, heavy=HEAVY_MODULES))
+            samples.append(probe["s"])
+            heavy.update(probe["heavy"])
+        results["imports"][module] = {
+            "median_ms": round(float(np.median(samples)) * 1000, 1),
+            "heavy_modules": sorted(heavy)
+        }
+
+    with scratch_dir(args.keep) as path:
+        generate_corpus(DATA_FILE, size, seed=args.seed)
+        code = _READY_PROBE.format(repo=REPO_DIR, backend=args.llm_backend)
+        _probe(code, cwd=path)  # indexation initiale, hors mesure
+        for preload in ["0", "1"]:
+            os.environ["EMBEDDER_PRELOAD"] = preload
+            try:
+                probe = _probe(code, cwd=path)
+            finally:
+                os.environ.pop("EMBEDDER_PRELOAD", None)
+            label = "preload" if preload == "1" else "lazy"
+            results[f"{label}_ready_s"] = round(probe["ready_s"], 3)
+            results[f"{label}_first_query_s"] = round(probe["first_query_s"], 3)
+
+    return results
+
+
+def bench_batching(args, size):
+    from concurrent.futures import ThreadPoolExecutor
+    from config import DATA_FILE
+    from embedders import EmbeddingBatcher
+    from embedding_cache import QueryEmbeddingCache
+    results = {}
+
+    with scratch_dir(args.keep):
+        generate_corpus(DATA_FILE, size, seed=args.seed)
+        assistant = _new_assistant(args)
+        assistant.warm_up()
+        questions = generate_questions(args.queries, seed=args.seed + 3)
+
+        for threads in args.threads:
+            for label in ["single", "batched"]:
+                assistant.query_cache = QueryEmbeddingCache()
+                assistant.embedding_batcher = EmbeddingBatcher(assistant._encode_questions) if label == "batched" else None
+
+                def timed(question):
+                    t0 = time.perf_counter()
+                    assistant.embed_query(question)
+                    return time.perf_counter() - t0
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    samples = list(pool.map(timed, questions))
+                elapsed = time.perf_counter() - start
+                entry = percentiles(samples)
+                entry["queries_per_s"] = round(len(questions) / elapsed, 1)
+                if assistant.embedding_batcher is not None:
+                    entry["mean_batch"] = assistant.embedding_batcher.stats()["mean_batch"]
+                    assistant.embedding_batcher.close()
+                results[f"threads={threads}_{label}"] = entry
+
+    return results
+
+
+def bench_users(args, size):
+    from concurrent.futures import ThreadPoolExecutor
+    from user_store import UserStore
+    results = {}
+
+    def populate(db):
+        db.executemany("INSERT INTO users (username, created_at) VALUES (?, ?)",
+                       [(f"user{u}", "2024-01-01") for u in range(100)])
+        db.executemany("INSERT INTO history (username, question, answer, timestamp) VALUES (?, ?, ?, ?)",
+                       [(f"user{i % 100}", f"question {i}", "réponse", "2024-01-01") for i in range(size)])
+        # Utilisateur assidu : `size` consultations pour la recherche dans l'historique
+        db.execute("INSERT INTO users (username, created_at) VALUES ('power', '2024-01-01')")
+        db.executemany("INSERT INTO history (username, question, answer, timestamp) VALUES (?, ?, ?, ?)",
+                       [("power", question, "réponse", f"2024-01-01 {i:08d}")
+                        for i, question in enumerate(generate_questions(size, seed=args.seed + 6))])
+
+    with scratch_dir(args.keep):
+        questions = generate_questions(args.user_ops, seed=args.seed + 5)
+        for label, options in [("single", {"max_batch": 1}), ("group_commit", {})]:
+            store = UserStore(path=f"users_{label}.sqlite", legacy_file=None, **options)
+            store.writer.execute(populate)
+
+            for threads in args.threads:
+                def session(index):
+                    username = f"threads{threads}_session{index}"
+                    store.create_user(username, "motdepasse")
+                    samples = []
+                    for i, question in enumerate(questions):
+                        t0 = time.perf_counter()
+                        store.add_consultation(username, question, "réponse", ["source"], potential_disease=i % 2 == 0)
+                        if i % 5 == 0:
+                            store.update_user(username, language="en" if i % 10 else "fr")
+                        samples.append(time.perf_counter() - t0)
+                        store.user_stats(username)
+                    return samples
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    samples = [s for session_samples in pool.map(session, range(threads)) for s in session_samples]
+                elapsed = time.perf_counter() - start
+
+                expected = threads * len(questions)
+                stored = store.db.execute("SELECT COUNT(*) FROM history WHERE username LIKE ?",
+                                          (f"threads{threads}_%",)).fetchone()[0]
+                entry = percentiles(samples)
+                entry["writes_per_s"] = round(expected / elapsed, 1)
+                entry["lost_updates"] = expected - stored
+                results[f"threads={threads}_{label}"] = entry
+
+            # Lectures d'une relance de page (profil, barre latérale, historique), avec et sans cache
+            for cached in (False, True):
+                samples = []
+                for _ in range(200):
+                    if not cached:
+                        store.cache.invalidate(["user0", None])
+                    t0 = time.perf_counter()
+                    store.get_user("user0")
+                    store.user_stats("user0")
+                    store.count_users()
+                    store.history("user0")
+                    samples.append(time.perf_counter() - t0)
+                results[f"{label}_rerun_{'cached' if cached else 'uncached'}"] = percentiles(samples)
+
+            # Recherche dans l'historique de l'utilisateur assidu (dernier mot en cours de saisie) :
+            # une page de l'index plein texte / chargement complet puis filtre
+            keywords = [f"{CONDITIONS[i % len(CONDITIONS)]} {SYMPTOMS[i % len(SYMPTOMS)][:4]}" for i in range(50)]
+            for mode in ("fts_page", "scan"):
+                samples = []
+                for keyword in keywords:
+                    t0 = time.perf_counter()
+                    if mode == "fts_page":
+                        store.search_history("power", keyword, sort="relevance")
+                    else:
+                        store.cache.invalidate(["power"])
+                        [h for h in store.history("power")
+                         if all(word in (h["question"] + h["answer"]).lower() for word in keyword.split())]
+                    samples.append(time.perf_counter() - t0)
+                results[f"{label}_history_search_{mode}"] = percentiles(samples)
+
+            writes = store.writer.stats()
+            results[f"{label}_mean_batch"] = writes["mean_batch"]
+            results[f"{label}_coalesced"] = writes["coalesced"]
+            store.close()
+
+    return results
+
+
+def _embedder_probe(backend, workdir, n_docs, n_queries, seed):
+    """Exécuté dans un interpréteur neuf : mesures d'un encodeur et vecteurs écrits dans workdir"""
+    import resource
+    from corpus import iter_medical_documents, document_text
+    from embedders import create_embedder
+    from config import DATA_FILE
+
+    start = time.perf_counter()
+    embedder = create_embedder(backend)
+    load_s = time.perf_counter() - start
+    embedder.encode(["échauffement"])
+
+    questions = generate_questions(n_queries, seed=seed)
+    samples, query_vectors = [], []
+    for question in questions:
+        t0 = time.perf_counter()
+        query_vectors.append(embedder.encode([question])[0])
+        samples.append(time.perf_counter() - t0)
+
+    texts = [document_text(doc) for doc in iter_medical_documents(DATA_FILE)][:n_docs]
+    t0 = time.perf_counter()
+    doc_vectors = embedder.encode(texts, batch_size=64)
+    encode_s = time.perf_counter() - t0
+
+    np.save(os.path.join(workdir, f"queries_{backend}.npy"), np.asarray(query_vectors, dtype=np.float32))
+    np.save(os.path.join(workdir, f"docs_{backend}.npy"), np.asarray(doc_vectors, dtype=np.float32))
+    print(json.dumps({
+        "load_s": round(load_s, 3),
+        "query": percentiles(samples),
+        "docs_per_s": round(len(texts) / encode_s, 1) if encode_s else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }))
+
+
+def _normalized(path):
+    vectors = np.load(path)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def bench_embedder(args, size):
+    from config import DATA_FILE, ONNX_MODEL_DIR
+    from embedders import EMBEDDERS
+    reference, results = "sentence-transformers", {}
+
+    with scratch_dir(args.keep) as path:
+        generate_corpus(DATA_FILE, size, seed=args.seed)
+        env = dict(os.environ)
+        env["ONNX_MODEL_DIR"] = os.path.join(REPO_DIR, ONNX_MODEL_DIR)  # chemin relatif au dépôt
+
+        for backend in EMBEDDERS:
+            code = (f"import sys; sys.path.insert(0, {REPO_DIR!r}); import benchmark; "
+                    f"benchmark._embedder_probe({backend!r}, {path!r}, {size}, {args.queries}, {args.seed + 1})")
+            try:
+                output = subprocess.check_output([sys.executable, "-c", code], cwd=path, env=env, text=True,
+                                                 stderr=subprocess.PIPE)
+            except subprocess.CalledProcessError as e:
+                print(f"⚠️ Encodeur {backend} indisponible : {e.stderr.strip().splitlines()[-1:]}")
+                results[backend] = {"skipped": True}
+                continue
+            results[backend] = json.loads(output.strip().splitlines()[-1])
+
+        if results.get(reference, {}).get("skipped"):
+            return results
+        ref_docs = _normalized(os.path.join(path, f"docs_{reference}.npy"))
+        ref_queries = _normalized(os.path.join(path, f"queries_{reference}.npy"))
+        for backend, r in results.items():
+            if backend == reference or r.get("skipped"):
+                continue
+            docs = _normalized(os.path.join(path, f"docs_{backend}.npy"))
+            queries = _normalized(os.path.join(path, f"queries_{backend}.npy"))
+            cosines = np.concatenate([(ref_docs * docs).sum(axis=1), (ref_queries * queries).sum(axis=1)])
+            r["min_cosine"] = round(float(cosines.min()), 5)
+            r["mean_cosine"] = round(float(cosines.mean()), 5)
+            # Recouvrement des top_k : index de référence, questions encodées par le candidat
+            for top_k in args.top_k:
+                expected = np.argsort(-(ref_queries @ ref_docs.T), axis=1)[:, :top_k]
+                actual = np.argsort(-(queries @ ref_docs.T), axis=1)[:, :top_k]
+                overlap = [len(set(e) & set(a)) / top_k for e, a in zip(expected, actual)]
+                r[f"overlap@{top_k}"] = round(float(np.mean(overlap)), 4)
+
+    return results
+
+
+def over_budget(results, budget_ms):
+    """Imports plus lents que le budget fixé"""
+    return [(module, r["median_ms"]) for by_size in results.values()
+            for module, r in by_size["imports"].items() if r["median_ms"] > budget_ms]
+
+
+SUITES = {
+    "index": bench_index,
+    "retrieval": bench_retrieval,
+    "quantization": bench_quantization,
+    "e2e": bench_e2e,
+    "batching": bench_batching,
+    "users": bench_users,
+    "embedder": bench_embedder,
+    "startup": bench_startup,
+}
+
+
+# --- Comparaison ----------------------------------------------------------------------
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s") or "recall" in metric or "overlap" in metric
+
+
+def compare(current, baseline, tolerance):
+    """Liste des métriques dégradées de plus de `tolerance` (relatif) par rapport à la référence"""
+    regressions = []
+    cur, base = flatten(current), flatten(baseline)
+    for metric, old in base.items():
+        new = cur.get(metric)
+        if new is None or not old or metric.endswith((".n", "_workers", "mean_batch", "_coalesced")):
+            continue
+        change = (new - old) / abs(old)
+        worse = -change if higher_is_better(metric) else change
+        if worse > tolerance:
+            regressions.append({"metric": metric, "baseline": old, "current": new, "change": round(change, 3)})
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de performance de la chaîne RAG MedAi")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Suites à lancer ({', '.join(SUITES)})")
+    parser.add_argument("--sizes", default="1000,5000", help="Tailles de corpus (documents), séparées par des virgules")
+    parser.add_argument("--top-k", default="3,10", help="Valeurs de top_k pour la suite retrieval")
+    parser.add_argument("--queries", type=int, default=200, help="Questions par mesure de retrieval")
+    parser.add_argument("--e2e-queries", type=int, default=50, help="Questions pour la suite e2e")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--stores", default="chroma,numpy",
+                        help="Stockages vectoriels comparés (le premier sert de référence pour le recouvrement)")
+    parser.add_argument("--quantization", default="int8,binary",
+                        help="Premières passes comparées par la suite quantization (binary, int8)")
+    parser.add_argument("--rescore", type=int, default=None,
+                        help="Candidats re-classés exactement (défaut : VECTOR_RESCORE_CANDIDATES)")
+    parser.add_argument("--threads", default="1,8,32", help="Sessions concurrentes pour la suite batching")
+    parser.add_argument("--user-ops", type=int, default=50, help="Consultations par session pour la suite users")
+    parser.add_argument("--workers", type=int, default=None, help="Processus pour create_vector_store")
+    parser.add_argument("--no-create-store", dest="create_store", action="store_false",
+                        help="Ne pas mesurer create_vector_store")
+    parser.add_argument("--llm", choices=["local", "stub"], default="local",
+                        help="LLM simulé : backend local extractif ou serveur Gemini factice")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Latence simulée du LLM (s)")
+    parser.add_argument("--answer-cache", action="store_true", help="Garder le cache sémantique des réponses")
+    parser.add_argument("--import-runs", type=int, default=5, help="Mesures par module pour la suite startup")
+    parser.add_argument("--import-budget-ms", type=float, default=1500.0,
+                        help="Budget de temps d'import par module (suite startup)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Résultats de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Dégradation relative tolérée")
+    parser.add_argument("--keep", action="store_true", help="Conserver les répertoires temporaires")
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    args.top_k = [int(k) for k in args.top_k.split(",")]
+    args.threads = [int(t) for t in args.threads.split(",")]
+    args.stores = [s.strip() for s in args.stores.split(",") if s.strip()]
+    args.quantization = [q.strip() for q in args.quantization.split(",") if q.strip()]
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+
+    # La configuration est lue à l'import : l'environnement doit être prêt avant
+    os.environ["ANSWER_CACHE_ENABLED"] = "1" if args.answer_cache else "0"
+    if args.llm == "stub":
+        from gemini_stub_server import start_stub_server
+        server, url = start_stub_server(latency=args.llm_latency)
+        os.environ.update(GEMINI_BASE_URL=url, GEMINI_API_KEY=os.getenv("GEMINI_API_KEY") or "stub")
+        args.llm_backend = "gemini"
+    else:
+        os.environ["LOCAL_LLM_LATENCY"] = str(args.llm_latency)
+        args.llm_backend = "local"
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items()}
+        },
+        "results": {}
+    }
+
+    for suite in suites:
+        if suite not in SUITES:
+            parser.error(f"Suite inconnue : {suite}")
+        report["results"][suite] = {}
+        for size in args.sizes:
+            print(f"⏱️ {suite} ({size} documents)...")
+            report["results"][suite][str(size)] = SUITES[suite](args, size)
+
+    status = 0
+    if "startup" in report["results"]:
+        for module, ms in over_budget(report["results"]["startup"], args.import_budget_ms):
+            print(f"❌ Import de {module} : {ms} ms (budget {args.import_budget_ms:.0f} ms)")
+            status = 1
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline.get("results", {}), args.tolerance)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"❌ Régression {r['metric']} : {r['baseline']} -> {r['current']} ({r['change']:+.1%})")
+        if not regressions:
+            print(f"✅ Aucune régression au-delà de {args.tolerance:.0%}.")
+        status = 1 if regressions else status
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📊 Résultats écrits dans {args.output}")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
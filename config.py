@@ -0,0 +1,102 @@
+# config.py - Configuration partagée entre l'application et les scripts d'indexation
+
+import os
+
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement (.env) avant de lire la configuration
+load_dotenv()
+
+# Corpus et base vectorielle
+DATA_FILE = "data/raw/medical_data.jsonl"
+CONDITIONS_DIR = "data/raw/nhs_condition_details"  # une fiche par maladie (NHS)
+VECTOR_DB_PATH = "./vector_db"
+COLLECTION_NAME = "medical_kb"
+# Index HNSW de la collection (cf. vector_store.py et hnsw_tuner.py)
+VECTOR_SPACE = os.getenv("VECTOR_SPACE", "cosine")  # cosine, l2 ou ip
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+MANIFEST_FILE = os.path.join(VECTOR_DB_PATH, "manifest.json")
+# Stockage des vecteurs : "chroma" (index HNSW) ou "numpy" (matrice mappée, recherche exacte)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+NUMPY_STORE_PATH = os.getenv("NUMPY_STORE_PATH", "./vector_db_numpy")
+NUMPY_STORE_DTYPE = os.getenv("NUMPY_STORE_DTYPE", "float16")  # float16, float32 ou int8
+# Première passe approchée du stockage numpy : "none" (recherche exacte), "binary" ou "int8",
+# puis re-classement exact des VECTOR_RESCORE_CANDIDATES meilleurs candidats
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+VECTOR_RESCORE_CANDIDATES = int(os.getenv("VECTOR_RESCORE_CANDIDATES", "200"))
+
+# Découpage des documents en passages à l'indexation (all-MiniLM-L6-v2 tronque à 256 sous-mots)
+CHUNK_MAX_WORDS = int(os.getenv("CHUNK_MAX_WORDS", "120"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "30"))
+
+# Modèle d'embedding
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# 1 = chargement du modèle en arrière-plan dès la création de l'assistant, 0 = au premier encodage
+EMBEDDER_PRELOAD = os.getenv("EMBEDDER_PRELOAD", "1") == "1"
+# Encodeur : "sentence-transformers" (PyTorch, référence) ou "onnx" (ONNX Runtime int8, CPU)
+EMBEDDER_BACKEND = os.getenv("EMBEDDER_BACKEND", "sentence-transformers")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join("models", "onnx", EMBEDDING_MODEL.replace("/", "__")))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = choix d'ONNX Runtime
+ONNX_MIN_COSINE = float(os.getenv("ONNX_MIN_COSINE", "0.99"))  # tolérance vis-à-vis du modèle de référence
+
+# Micro-lots d'encodage des questions concurrentes (toutes sessions confondues)
+EMBED_BATCH_ENABLED = os.getenv("EMBED_BATCH_ENABLED", "1") == "1"
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))  # questions par lot au maximum
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "2"))  # attente maximale sous charge
+
+# Cache disque des embeddings (partagé par rag_pipeline et create_embeddings)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "cache/embeddings")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # float16 ou float32
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "2000000"))
+# Compactage automatique quand les lignes libérées par l'éviction dépassent cette fraction de max_rows
+EMBEDDING_CACHE_COMPACT_RATIO = float(os.getenv("EMBEDDING_CACHE_COMPACT_RATIO", "0.25"))
+
+# Assemblage du contexte (context_builder.py)
+CONTEXT_OVERFETCH = int(os.getenv("CONTEXT_OVERFETCH", "4"))  # candidats récupérés = top_k x facteur
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # tokens (estimés) de contexte au maximum
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))  # cosinus des quasi-doublons
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # 1 = pertinence seule, 0 = diversité seule
+
+# Cache mémoire des embeddings de questions (partagé entre sessions Streamlit)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))  # secondes
+
+# Cache sémantique des réponses du LLM
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "cache/answers.sqlite")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # similarité cosinus minimale
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))  # secondes
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))  # par backend et modèle ; au-delà : éviction LRU
+
+# Client HTTP du LLM (pool de connexions, délais, nouvelles tentatives)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3.05"))  # secondes
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))  # secondes
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))  # secondes
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))  # secondes
+
+# Backend LLM : "gemini" (API Google) ou "local" (extractif, déterministe, hors ligne)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # Clé Google Gemini (chargée depuis .env)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+LOCAL_LLM_LATENCY = float(os.getenv("LOCAL_LLM_LATENCY", "0"))  # secondes simulées par réponse
+
+# Données utilisateur (comptes, historiques), cf. user_store.py
+USER_DATA_DIR = "user_data"
+USER_DB_FILE = os.getenv("USER_DB_FILE", os.path.join(USER_DATA_DIR, "users.sqlite"))
+USERS_FILE = os.path.join(USER_DATA_DIR, "users.json")  # ancien format, importé au premier démarrage
+# Écrivain unique : mutations concurrentes validées par lots (group commit)
+USER_WRITE_BATCH_MAX = int(os.getenv("USER_WRITE_BATCH_MAX", "64"))  # mutations par transaction au maximum
+USER_WRITE_MAX_WAIT_MS = float(os.getenv("USER_WRITE_MAX_WAIT_MS", "0"))  # 0 = lot = mutations déjà en attente
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))  # consultations par page d'historique
+
+# Métriques (durées des étapes, format Prometheus)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = pas de serveur HTTP /metrics
+METRICS_FILE = os.getenv("METRICS_FILE", "")  # vide = pas d'export fichier
+METRICS_FILE_INTERVAL = float(os.getenv("METRICS_FILE_INTERVAL", "15"))  # secondes
+MEDAI_ADMINS = [u.strip() for u in os.getenv("MEDAI_ADMINS", "").split(",") if u.strip()]  # accès au panneau métriques
@@ -0,0 +1,94 @@
+# context_builder.py - Assemblage du contexte envoyé au LLM
+
+"""
+Étape intermédiaire entre la recherche vectorielle et la génération.
+
+À partir des candidats sur-récupérés (avec leurs embeddings, déjà calculés
+à l'indexation), le contexte est construit en trois temps :
+1. suppression des quasi-doublons (cosinus >= CONTEXT_DEDUP_THRESHOLD avec un
+   passage plus pertinent) ;
+2. sélection MMR (Maximal Marginal Relevance) : pertinence pour la question,
+   pénalisée par la ressemblance aux passages déjà retenus ;
+3. respect d'un budget de tokens : les passages qui ne tiennent plus sont
+   écartés, le premier est tronqué à une fin de phrase si besoin.
+
+Le nombre de tokens est estimé (≈ 4 caractères par token) : il n'y a pas de
+tokenizer Gemini local, et l'estimation suffit pour un budget.
+"""
+
+import re
+
+import numpy as np
+
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD, CONTEXT_MMR_LAMBDA
+
+CHARS_PER_TOKEN = 4
+_SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Coupe un passage à la dernière fin de phrase qui tient dans le budget"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    ends = [m.end() for m in _SENTENCE_END.finditer(text, 0, limit)]
+    return text[:ends[-1]] if ends else text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def _normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+
+
+def build_context(query_embedding, documents, metadatas, embeddings, top_k=3,
+                  token_budget=CONTEXT_TOKEN_BUDGET, dedup_threshold=CONTEXT_DEDUP_THRESHOLD,
+                  mmr_lambda=CONTEXT_MMR_LAMBDA):
+    """Sélectionne au plus top_k passages ; renvoie (passages, métadonnées, rapport)"""
+    report = {"candidates": len(documents), "duplicates": 0, "over_budget": 0, "truncated": 0}
+    if not documents:
+        report.update(passages=0, tokens=0)
+        return [], [], report
+
+    vectors = _normalize_rows(embeddings)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    # 1. Quasi-doublons : on garde le plus pertinent de chaque groupe
+    remaining = []
+    for i in np.argsort(-relevance):
+        if any(similarity[i, j] >= dedup_threshold for j in remaining):
+            report["duplicates"] += 1
+        else:
+            remaining.append(int(i))
+
+    # 2 et 3. MMR sous contrainte de budget
+    selected, passages, tokens = [], [], 0
+    while remaining and len(selected) < top_k:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+        scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+        best = remaining.pop(int(np.argmax(scores)))
+
+        text = documents[best]
+        cost = estimate_tokens(text)
+        if tokens + cost > token_budget:
+            if selected:
+                report["over_budget"] += 1
+                continue
+            text = truncate_to_tokens(text, token_budget)
+            cost = estimate_tokens(text)
+            report["truncated"] += 1
+        selected.append(best)
+        passages.append(text)
+        tokens += cost
+
+    report.update(passages=len(passages), tokens=tokens)
+    return passages, [metadatas[i] for i in selected], report
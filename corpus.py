@@ -0,0 +1,194 @@
+# corpus.py - Lecture du corpus médical (JSONL) pour l'indexation
+
+import hashlib
+import json
+import logging
+import os
+import re
+from itertools import islice
+
+from config import CHUNK_MAX_WORDS, CHUNK_OVERLAP_WORDS
+
+logger = logging.getLogger(__name__)
+
+
+def iter_medical_documents(file_path):
+    """Lit le fichier JSONL ligne par ligne sans le charger entièrement en mémoire"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ Ligne {line_number} ignorée (JSON invalide).")
+
+
+def document_text(doc):
+    """Texte indexé pour un document : 'titre: contenu'"""
+    return f"{doc.get('title', '')}: {doc.get('text', '')}"
+
+
+def document_metadata(doc):
+    """Métadonnées conservées avec chaque document dans la base vectorielle"""
+    return {
+        "source": doc.get("source") or "inconnue",
+        "domain": doc.get("domain") or "général",
+        "title": doc.get("title") or ""
+    }
+
+
+_SENTENCE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+_WORD = re.compile(r"\S+")
+
+
+def _sentence_spans(text, max_words):
+    """(début, fin, nombre de mots) de chaque phrase ; les phrases trop longues sont coupées par mots"""
+    spans = []
+    for match in _SENTENCE.finditer(text):
+        words = list(_WORD.finditer(match.group()))
+        if not words:
+            continue
+        base = match.start()
+        for i in range(0, len(words), max_words):
+            piece = words[i:i + max_words]
+            spans.append((base + piece[0].start(), base + piece[-1].end(), len(piece)))
+    return spans
+
+
+def chunk_document(doc, max_words=CHUNK_MAX_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """Découpe le texte d'un document en passages d'au plus max_words mots, sans couper de phrase.
+
+    Fenêtre glissante : chaque passage reprend les dernières phrases du précédent
+    (au plus overlap_words mots). Renvoie une liste de (début, fin) dans doc["text"].
+    """
+    text = doc.get("text") or ""
+    spans = _sentence_spans(text, max_words)
+    if not spans:
+        return [(0, len(text))]
+
+    chunks = []
+    first = 0
+    while first < len(spans):
+        last, words = first, spans[first][2]
+        while last + 1 < len(spans) and words + spans[last + 1][2] <= max_words:
+            last += 1
+            words += spans[last][2]
+        chunks.append((spans[first][0], spans[last][1]))
+        if last + 1 >= len(spans):
+            break
+        # Début du passage suivant : dernières phrases du passage courant dans la limite du recouvrement
+        following, kept = last + 1, 0
+        while following - 1 > first and kept + spans[following - 1][2] <= overlap_words:
+            following -= 1
+            kept += spans[following][2]
+        first = following
+    return chunks
+
+
+def chunk_text(doc, start, end):
+    """Texte indexé pour un passage : 'titre: extrait'"""
+    return f"{doc.get('title', '')}: {(doc.get('text') or '')[start:end]}"
+
+
+def chunk_metadata(doc, parent_id, index, start, end):
+    """Métadonnées d'un passage : celles du document, plus le parent et la position dans le texte"""
+    return {**document_metadata(doc), "parent_id": parent_id, "chunk": index, "start": start, "end": end}
+
+
+def chunk_id(parent_id, index):
+    return f"{parent_id}#{index}"
+
+
+def iter_chunks(doc, doc_hash):
+    """(identifiant, texte, métadonnées) de chaque passage d'un document"""
+    parent_id = document_id(doc_hash)
+    for index, (start, end) in enumerate(chunk_document(doc)):
+        yield (chunk_id(parent_id, index), chunk_text(doc, start, end),
+               chunk_metadata(doc, parent_id, index, start, end))
+
+
+def chunking_config():
+    """Paramètres de découpage enregistrés dans le manifeste (les changer impose une reconstruction)"""
+    return {"max_words": CHUNK_MAX_WORDS, "overlap_words": CHUNK_OVERLAP_WORDS}
+
+
+def batched(iterable, batch_size):
+    """Découpe un itérable en listes de taille batch_size (la dernière peut être plus courte)"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def file_signature(path):
+    """[date de modification (ns), taille] du fichier, ou None s'il n'existe pas"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def content_hash(doc):
+    """Empreinte SHA-1 du titre et du texte d'un document"""
+    payload = f"{doc.get('title', '')}\n{doc.get('text', '')}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def document_id(doc_hash):
+    """Identifiant Chroma stable dérivé de l'empreinte du contenu"""
+    return f"doc_{doc_hash[:20]}"
+
+
+class IndexManifest:
+    """Manifeste de l'index : empreinte de contenu -> nombre de passages indexés.
+
+    Permet de ne ré-encoder que les documents nouveaux ou modifiés et de
+    supprimer (passage par passage, cf. `chunk_ids`) ceux qui ont disparu du
+    corpus. `version` est incrémentée à chaque modification effective de l'index.
+    `source` est la signature (`file_signature`) du corpus lors de la dernière
+    synchronisation complète : inchangée, le corpus n'a pas besoin d'être relu.
+    """
+
+    def __init__(self, path, model=None, version=0, documents=None, chunking=None, source=None):
+        self.path = path
+        self.model = model
+        self.version = version
+        self.documents = documents or {}
+        self.chunking = chunking
+        self.source = source
+
+    def compatible(self, model):
+        """Index construit avec ce modèle et le découpage courant"""
+        return self.model == model and self.chunking == chunking_config()
+
+    def chunk_ids(self, doc_hash):
+        parent_id = document_id(doc_hash)
+        return [chunk_id(parent_id, i) for i in range(self.documents[doc_hash])]
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(path, data.get("model"), data.get("version", 0), data.get("documents", {}),
+                   data.get("chunking"), data.get("source"))
+
+    def save(self):
+        """Écriture atomique (fichier temporaire puis renommage)"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model,
+                "version": self.version,
+                "chunking": self.chunking,
+                "source": self.source,
+                "documents": self.documents
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,84 @@
+# corpus_stats.py - Statistiques du corpus et de l'index affichées dans la barre latérale
+
+"""
+Nombre de maladies référencées, de documents et de passages indexés.
+
+Chaque relance d'une page Streamlit affichait ces chiffres en listant le
+répertoire des fiches NHS et en comptant toutes les lignes du corpus JSONL.
+Ils sont maintenant calculés une fois par processus et recalculés seulement
+quand leur source change : un os.stat par source suffit à le savoir
+(date de modification et taille ; le manifeste est réécrit par renommage à
+chaque nouvelle version de l'index).
+
+Les documents et passages sont lus dans le manifeste de l'index (documents
+distincts effectivement indexés). Sans manifeste (index pas encore
+construit), les lignes du corpus sont comptées par blocs.
+"""
+
+import os
+import threading
+
+from config import DATA_FILE, CONDITIONS_DIR, VECTOR_STORE
+from corpus import IndexManifest, file_signature
+from vector_store import VECTOR_STORES
+
+READ_BLOCK = 1 << 20
+
+
+def count_lines(path):
+    """Nombre de lignes du fichier, lu par blocs binaires"""
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        while block := f.read(READ_BLOCK):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines + (last != b"\n")
+
+
+class CorpusStats:
+    """Chiffres du corpus et de l'index, recalculés quand leur source change. Sûr entre threads."""
+
+    def __init__(self, manifest_path=None, data_file=DATA_FILE, conditions_dir=CONDITIONS_DIR):
+        self.manifest_path = manifest_path or VECTOR_STORES[VECTOR_STORE].manifest_path
+        self.data_file = data_file
+        self.conditions_dir = conditions_dir
+        self.refreshes = 0
+        self._cache = {}  # source -> (signature, valeur)
+        self._lock = threading.Lock()
+
+    def _cached(self, path, compute):
+        signature = file_signature(path)
+        entry = self._cache.get(path)
+        if entry is None or entry[0] != signature:
+            entry = (signature, compute() if signature is not None else None)
+            self._cache[path] = entry
+            self.refreshes += 1
+        return entry[1]
+
+    def _index(self):
+        manifest = IndexManifest.load(self.manifest_path)
+        return {"documents": len(manifest.documents), "passages": sum(manifest.documents.values()),
+                "index_version": manifest.version}
+
+    def snapshot(self):
+        """{conditions, documents, passages, index_version} ; None pour une source absente"""
+        with self._lock:
+            index = self._cached(self.manifest_path, self._index)
+            if index is None or not index["documents"]:
+                documents = self._cached(self.data_file, lambda: count_lines(self.data_file))
+                index = {"documents": documents, "passages": None, "index_version": None}
+            conditions = self._cached(self.conditions_dir, lambda: len(os.listdir(self.conditions_dir)))
+        return {"conditions": conditions, **index}
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_corpus_stats():
+    """Instance partagée par toutes les sessions du processus"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = CorpusStats()
+        return _stats
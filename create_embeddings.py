@@ -1,32 +1,170 @@
 # create_embeddings.py
 
-from sentence_transformers import SentenceTransformer
-import chromadb
+import argparse
 import json
 import os
+import time
+from collections import deque
+from multiprocessing import get_context
+
+from config import DATA_FILE, VECTOR_STORE, EMBEDDING_MODEL
+from corpus import iter_chunks, chunking_config, batched, content_hash, file_signature, IndexManifest
+from embedding_cache import EmbeddingCache
+from vector_store import open_vector_store
+
+SHARD_SIZE = 2048        # documents encodés par tâche
+WRITE_BATCH_SIZE = 1000  # passages par écriture dans la base vectorielle
+
+# Modèle et cache (lecture seule) chargés une seule fois par processus de travail
+_worker_model = None
+_worker_cache = None
+
+
+def iter_shards(file_path, shard_size=SHARD_SIZE):
+    """Découpe le JSONL en plages d'octets (début, fin) de shard_size lignes, sans le charger en mémoire"""
+    with open(file_path, "rb") as f:
+        start = f.tell()
+        count = 0
+        for line in iter(f.readline, b""):
+            count += 1
+            if count == shard_size:
+                end = f.tell()
+                yield start, end
+                start, count = end, 0
+        if count:
+            yield start, f.tell()
+
+
+def _init_worker(model_name, threads):
+    global _worker_model, _worker_cache
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+    _worker_cache = EmbeddingCache(model_name, readonly=True)
+
+
+def _encode_shard(file_path, start, end, encode_batch_size):
+    """Lit et encode une plage du fichier.
+
+    Renvoie les empreintes des documents et leur nombre de passages, puis par passage :
+    identifiants, textes, métadonnées, embeddings, ainsi que les clés de cache et les
+    indices des vecteurs nouvellement calculés (enregistrés par le processus principal).
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        raw = f.read(end - start)
+
+    hashes, counts, ids, texts, metadatas = [], [], [], [], []
+    for line in raw.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        try:
+            doc = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        doc_hash = content_hash(doc)
+        chunks = list(iter_chunks(doc, doc_hash))
+        hashes.append(doc_hash)
+        counts.append(len(chunks))
+        for chunk_id, text, metadata in chunks:
+            ids.append(chunk_id)
+            texts.append(text)
+            metadatas.append(metadata)
+
+    embeddings, keys, missing = _worker_cache.encode_missing(_worker_model, texts, encode_batch_size)
+    return hashes, counts, ids, texts, metadatas, embeddings, keys, missing
+
+
+def _run_shards(file_path, workers, shard_size, encode_batch_size):
+    """Encode les shards en parallèle en gardant au plus 2 tâches en vol par processus"""
+    if workers <= 1:
+        _init_worker(EMBEDDING_MODEL, os.cpu_count() or 1)
+        for start, end in iter_shards(file_path, shard_size):
+            yield _encode_shard(file_path, start, end, encode_batch_size)
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(EMBEDDING_MODEL, threads)) as pool:
+        pending = deque()
+        for start, end in iter_shards(file_path, shard_size):
+            pending.append(pool.apply_async(_encode_shard, (file_path, start, end, encode_batch_size)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def create_vector_store(file_path=DATA_FILE, workers=None, shard_size=SHARD_SIZE,
+                        write_batch_size=WRITE_BATCH_SIZE, encode_batch_size=64, store=VECTOR_STORE):
+    """Reconstruit entièrement la base vectorielle à partir du JSONL, en mémoire bornée"""
+    workers = workers or os.cpu_count() or 1
+
+    vector_store = open_vector_store(store)
+    vector_store.reset()
+
+    cache = EmbeddingCache(EMBEDDING_MODEL)
+    previous = IndexManifest.load(vector_store.manifest_path)
+    manifest = IndexManifest(vector_store.manifest_path, model=EMBEDDING_MODEL, version=previous.version + 1,
+                             chunking=chunking_config(), source=file_signature(file_path))
+
+    total = 0
+    passages = 0
+    start = time.perf_counter()
+    reused = 0
+    # Workers en lecture seule pendant toute la boucle : les lignes libérées ne sont
+    # récupérées (compactage) qu'une fois les shards terminés
+    with cache.deferred_compaction():
+        for hashes, counts, ids, texts, metadatas, embeddings, keys, missing in _run_shards(
+                file_path, workers, shard_size, encode_batch_size):
+            # Les processus de travail lisent le cache sans le modifier : les vecteurs repris sont
+            # marqués comme récents ici, pour que l'éviction LRU ne les choisisse pas pendant la reconstruction
+            missing_set = set(missing)
+            cache.touch([key for i, key in enumerate(keys) if i not in missing_set])
+            if missing:
+                cache.store([keys[i] for i in missing], embeddings[missing])
+            reused += len(texts) - len(missing)
+
+            # Les doublons (même contenu) ne sont indexés qu'une fois
+            rows, offset = [], 0
+            for doc_hash, count in zip(hashes, counts):
+                if doc_hash not in manifest.documents:
+                    manifest.documents[doc_hash] = count
+                    rows.extend(range(offset, offset + count))
+                    total += 1
+                offset += count
+
+            for batch in batched(rows, write_batch_size):
+                vector_store.upsert(
+                    ids=[ids[i] for i in batch],
+                    embeddings=embeddings[list(batch)],
+                    documents=[texts[i] for i in batch],
+                    metadatas=[metadatas[i] for i in batch]
+                )
+            passages += len(rows)
+
+            elapsed = time.perf_counter() - start
+            print(f"[{total} docs] {total / elapsed:.1f} docs/s")
+
+    manifest.save()
+    cache.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {total} documents ({passages} passages) ajoutés à la base vectorielle en {elapsed:.1f}s "
+          f"({workers} processus, {reused} embeddings repris du cache).")
+    return total
 
-DATA_FILE = "data/raw/medical_data.jsonl"
-CHROMA_PATH = "vector_db/"
-
-def load_medical_documents(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        return [json.loads(line)["text"] for line in f]
-
-def create_vector_store(documents):
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = model.encode(documents, show_progress_bar=True)
-    
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    collection = client.get_or_create_collection("medical_kb")
-    
-    collection.add(
-        documents=documents,
-        embeddings=embeddings.tolist(),
-        metadatas=[{"source": "NHS"} for _ in documents],
-        ids=[f"id_{i}" for i in range(len(documents))]
-    )
-    print(f"✅ {len(documents)} documents ajoutés à la base vectorielle.")
 
 if __name__ == "__main__":
-    docs = load_medical_documents(DATA_FILE)
-    create_vector_store(docs)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Construit la base vectorielle à partir du corpus médical")
+    parser.add_argument("--data", default=DATA_FILE, help="Fichier JSONL du corpus")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus d'encodage (défaut : nombre de cœurs)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Documents par shard")
+    parser.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE, help="Passages par écriture dans la base vectorielle")
+    parser.add_argument("--store", default=VECTOR_STORE, help="Stockage des vecteurs : chroma ou numpy")
+    args = parser.parse_args()
+
+    create_vector_store(args.data, workers=args.workers, shard_size=args.shard_size,
+                        write_batch_size=args.batch_size, store=args.store)
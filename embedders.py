@@ -0,0 +1,291 @@
+# embedders.py - Encodeurs de texte interchangeables (PyTorch ou ONNX Runtime int8)
+
+"""
+Encodeurs utilisés par MedicalRAGAssistant pour les questions (et les
+documents ajoutés au fil de l'eau).
+
+- SentenceTransformerEmbedder : modèle de référence (PyTorch) ;
+- OnnxEmbedder : même modèle exporté en ONNX et quantifié en int8
+  (quantification dynamique), exécuté par ONNX Runtime sur CPU. Plus rapide
+  et nettement plus léger en mémoire sur des serveurs sans GPU.
+
+Les deux renvoient des vecteurs normalisés (mean pooling + L2, comme le
+pipeline all-MiniLM-L6-v2). Le backend est choisi par EMBEDDER_BACKEND.
+
+EmbeddingBatcher regroupe les questions encodées en même temps par
+plusieurs sessions en un seul appel à `encode`.
+
+Préparation du modèle ONNX (nécessite torch et sentence-transformers, une seule fois) :
+    python embedders.py export
+    python embedders.py validate --min-cosine 0.99
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from config import (DATA_FILE, EMBEDDING_MODEL, EMBEDDER_BACKEND, ONNX_MODEL_DIR, ONNX_THREADS,
+                    ONNX_MIN_COSINE, EMBED_BATCH_MAX, EMBED_BATCH_MAX_WAIT_MS)
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ONNX_META_FILE = "export.json"
+
+VALIDATION_QUESTIONS = ["Quels sont les symptômes du diabète ?", "Comment traiter une migraine ?",
+                        "Fièvre et toux depuis trois jours, faut-il consulter ?",
+                        "What are the side effects of beta blockers?", "hypertension"]
+
+
+class SentenceTransformerEmbedder:
+    name = "sentence-transformers"
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(texts, batch_size=batch_size)
+
+
+class OnnxEmbedder:
+    name = "onnx"
+
+    def __init__(self, model_name=EMBEDDING_MODEL, model_dir=ONNX_MODEL_DIR, threads=ONNX_THREADS,
+                 quantized=True):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("Le backend ONNX nécessite onnxruntime et tokenizers (pip install onnxruntime)") from e
+
+        path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+        meta_path = os.path.join(model_dir, ONNX_META_FILE)
+        if not os.path.exists(path) or not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Modèle ONNX introuvable dans {model_dir} : lancez `python embedders.py export`.")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["model"] != model_name:
+            raise ValueError(f"Modèle ONNX exporté depuis {meta['model']}, attendu {model_name}.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.model_name = model_name
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=meta["max_length"])
+        pad_token = meta.get("pad_token", "[PAD]")
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+        self.dimension = meta["dimension"]
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean pooling sur les tokens réels, puis normalisation L2
+        weights = mask[..., np.newaxis].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts, batch_size=32):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        # Lots de longueurs voisines : moins de padding, donc moins de calcul
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[i] for i in rows])
+        return embeddings[0] if single else embeddings
+
+
+EMBEDDERS = {
+    SentenceTransformerEmbedder.name: SentenceTransformerEmbedder,
+    OnnxEmbedder.name: OnnxEmbedder,
+}
+
+
+def create_embedder(name=EMBEDDER_BACKEND, **kwargs):
+    if name not in EMBEDDERS:
+        raise ValueError(f"Backend d'embedding inconnu : {name} (disponibles : {', '.join(EMBEDDERS)})")
+    return EMBEDDERS[name](**kwargs)
+
+
+class EmbeddingBatcher:
+    """File d'attente d'encodage : les requêtes concurrentes sont encodées par lots.
+
+    Un thread unique vide la file. Pendant qu'un lot est encodé, les requêtes
+    suivantes s'accumulent et partent ensemble au lot suivant (au plus
+    `max_batch`). Si le lot précédent comptait plusieurs requêtes (signe de
+    charge), le thread attend en plus jusqu'à `max_wait_ms` pour compléter le
+    lot ; un utilisateur seul n'attend donc jamais.
+    """
+
+    def __init__(self, encode, max_batch=EMBED_BATCH_MAX, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS):
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+
+    def encode(self, text):
+        """Vecteur d'un texte ; bloque jusqu'à l'encodage du lot qui le contient"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _collect(self, first, wait):
+        batch = [first]
+        deadline = time.perf_counter() + wait
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is None:  # arrêt demandé : on termine ce lot d'abord
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        previous = 1
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first, self.max_wait if previous > 1 else 0.0)
+            try:
+                vectors = self._encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            previous = len(batch)
+            self.batches += 1
+            self.items += len(batch)
+            self.largest = max(self.largest, len(batch))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest
+        }
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+def export_onnx(model_name=EMBEDDING_MODEL, model_dir=ONNX_MODEL_DIR, opset=14):
+    """Exporte le transformeur du modèle de référence en ONNX (fp32) puis le quantifie en int8"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(model_dir, exist_ok=True)
+    reference = SentenceTransformer(model_name, device="cpu")
+    transformer = reference[0].auto_model.eval()
+    tokenizer = reference.tokenizer
+    tokenizer.save_pretrained(model_dir)
+
+    sample = tokenizer(["Exemple de phrase médicale."], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "sequence"} for n in input_names + ["last_hidden_state"]}
+    fp32_path = os.path.join(model_dir, ONNX_FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(transformer, tuple(sample[n] for n in input_names), fp32_path,
+                          input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=axes, opset_version=opset)
+
+    quantize_dynamic(fp32_path, os.path.join(model_dir, ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+
+    with open(os.path.join(model_dir, ONNX_META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "max_length": reference.max_seq_length,
+                   "dimension": reference.get_sentence_embedding_dimension(),
+                   "pad_token": tokenizer.pad_token, "opset": opset}, f, indent=2)
+    return reference
+
+
+def _validation_texts(file_path=DATA_FILE, n_docs=200):
+    from corpus import iter_medical_documents, document_text
+    texts = list(VALIDATION_QUESTIONS)
+    if os.path.exists(file_path):
+        for i, doc in enumerate(iter_medical_documents(file_path)):
+            if i >= n_docs:
+                break
+            texts.append(document_text(doc))
+    return texts
+
+
+def validate(reference, candidate, texts, min_cosine=ONNX_MIN_COSINE):
+    """Similarité cosinus entre les vecteurs de référence et ceux du candidat, texte par texte"""
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    cosines = (expected * actual).sum(axis=1)
+    return {
+        "n": len(texts),
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "ok": bool(cosines.min() >= min_cosine)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export et validation de l'encodeur ONNX int8")
+    parser.add_argument("command", choices=["export", "validate"])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--min-cosine", type=float, default=ONNX_MIN_COSINE)
+    parser.add_argument("--docs", type=int, default=200, help="Documents du corpus utilisés pour la validation")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"📦 Export de {args.model} vers {args.model_dir}...")
+        reference = export_onnx(args.model, args.model_dir)
+    else:
+        reference = SentenceTransformerEmbedder(args.model)
+
+    report = validate(reference, OnnxEmbedder(args.model, args.model_dir), _validation_texts(n_docs=args.docs),
+                      args.min_cosine)
+    print(json.dumps(report, indent=2))
+    if not report["ok"]:
+        print(f"❌ Similarité minimale {report['min_cosine']} < {args.min_cosine}")
+        sys.exit(1)
+    print(f"✅ Encodeur ONNX int8 conforme (cosinus min {report['min_cosine']}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+# embedding_cache.py - Cache disque des embeddings de passages
+
+"""
+Cache persistant des embeddings, indexé par (modèle, empreinte du texte normalisé).
+
+Les vecteurs sont stockés dans une matrice NumPy mappée en mémoire
+(`vectors.bin`, float16 ou float32) et l'index empreinte -> ligne dans une
+petite base SQLite (`index.sqlite`). Chaque modèle a son propre répertoire,
+ce qui permet de comparer des modèles ou de migrer une collection sans
+recalculer les vecteurs déjà connus.
+
+Utilisation en ligne de commande :
+    python embedding_cache.py stats
+    python embedding_cache.py evict --max-rows 500000
+    python embedding_cache.py compact
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import (EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_DTYPE, EMBEDDING_CACHE_MAX_ROWS,
+                    EMBEDDING_CACHE_COMPACT_RATIO, EMBEDDING_MODEL, QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Modèles dont le tokenizer met le texte en minuscules (do_lower_case)
+UNCASED_MODELS = {"all-MiniLM-L6-v2", "all-MiniLM-L12-v2", "paraphrase-MiniLM-L6-v2", "multi-qa-MiniLM-L6-cos-v1"}
+
+
+def normalize_text(text):
+    """Normalisation Unicode (NFC) et des espaces, pour que les variantes triviales partagent une entrée"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(model_name, text):
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache disque borné (max_rows) avec éviction des entrées les moins récemment utilisées.
+
+    Les entrées vivantes occupent des lignes de [0, next_row) ; `store` écrit
+    toujours au-delà de next_row et ne réutilise jamais la ligne d'une entrée
+    évincée, qu'un lecteur (readonly=True) peut encore être en train de lire.
+    Quand ces lignes libérées dépassent compact_ratio * max_rows, l'écrivain
+    compacte la matrice (sauf dans un bloc `deferred_compaction`, pendant
+    lequel des lecteurs tournent : le compactage a lieu à la sortie), ce qui
+    borne aussi la taille de vectors.bin. Plusieurs lecteurs peuvent coexister
+    avec un seul écrivain.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, cache_dir=EMBEDDING_CACHE_DIR,
+                 dtype=EMBEDDING_CACHE_DTYPE, max_rows=EMBEDDING_CACHE_MAX_ROWS, readonly=False,
+                 compact_ratio=EMBEDDING_CACHE_COMPACT_RATIO):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.max_rows = max_rows
+        self.readonly = readonly
+        self.compact_ratio = compact_ratio
+        self._deferred = 0
+        os.makedirs(self.path, exist_ok=True)
+
+        self.db = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_row ON entries(row)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self._load_meta()
+        self.vectors_file = os.path.join(self.path, "vectors.bin")
+        self._matrix = None
+
+    def _load_meta(self):
+        """Le type et la dimension sont fixés par la première écriture"""
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if "dim" in meta:
+            self.dtype = np.dtype(meta["dtype"])
+            self.dim = int(meta["dim"])
+
+    # --- Matrice mappée en mémoire -------------------------------------------------
+
+    def _capacity(self):
+        if self.dim is None or not os.path.exists(self.vectors_file):
+            return 0
+        return os.path.getsize(self.vectors_file) // (self.dim * self.dtype.itemsize)
+
+    def _map(self, min_rows=0):
+        """(Re)mappe la matrice ; en écriture, agrandit le fichier par doublement si nécessaire"""
+        capacity = self._capacity()
+        if min_rows > capacity:
+            capacity = max(min_rows, 2 * capacity, 1024)
+            with open(self.vectors_file, "ab") as f:
+                f.truncate(capacity * self.dim * self.dtype.itemsize)
+            self._matrix = None
+        if self._matrix is None or self._matrix.shape[0] < max(min_rows, 1):
+            if capacity == 0:
+                return None
+            mode = "r" if self.readonly else "r+"
+            self._matrix = np.memmap(self.vectors_file, dtype=self.dtype, mode=mode, shape=(capacity, self.dim))
+        return self._matrix
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _next_row(self):
+        """Première ligne jamais attribuée depuis le dernier compactage"""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'next_row'").fetchone()
+        if row is not None:
+            return int(row[0])
+        return self.db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()[0]
+
+    def _set_next_row(self, next_row):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_row', ?)", (str(next_row),))
+
+    def dead_rows(self):
+        """Lignes libérées par l'éviction, pas encore récupérées par `compact`"""
+        return self._next_row() - self.count()
+
+    def _maybe_compact(self):
+        if not self._deferred and self.dead_rows() > self.compact_ratio * self.max_rows:
+            self.compact()
+
+    @contextmanager
+    def deferred_compaction(self):
+        """Pas de compactage tant que des lecteurs tournent (reconstruction) ; fait à la sortie si nécessaire"""
+        self._deferred += 1
+        try:
+            yield self
+        finally:
+            self._deferred -= 1
+        self._maybe_compact()
+
+    # --- Lecture / écriture ---------------------------------------------------------
+
+    def _rows(self, keys):
+        rows = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(self.db.execute(f"SELECT key, row FROM entries WHERE key IN ({placeholders})", chunk))
+        return rows
+
+    def lookup(self, keys):
+        """Renvoie {clé: vecteur float32} pour les clés présentes dans le cache"""
+        if self.dim is None:
+            self._load_meta()
+        if not keys or self.dim is None:
+            return {}
+        rows = self._rows(keys)
+        if not rows:
+            return {}
+
+        matrix = self._map(max(rows.values()) + 1)
+        found = {key: np.asarray(matrix[row], dtype=np.float32) for key, row in rows.items()}
+        if not self.readonly:
+            now = time.time()
+            self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            self.db.commit()
+        return found
+
+    def touch(self, keys):
+        """Marque des entrées comme utilisées (lues par un processus en lecture seule)"""
+        if self.readonly:
+            raise PermissionError("Cache ouvert en lecture seule.")
+        now = time.time()
+        self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in keys])
+        self.db.commit()
+
+    def store(self, keys, vectors):
+        """Ajoute des vecteurs ; au-delà de max_rows, évince les entrées les moins récentes sans réutiliser leurs lignes"""
+        if self.readonly:
+            raise PermissionError("Cache ouvert en lecture seule.")
+        if len(keys) == 0:
+            return
+        vectors = np.asarray(vectors)
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                [("dim", str(self.dim)), ("dtype", self.dtype.name), ("model", self.model_name)])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimension {vectors.shape[1]} incompatible avec le cache ({self.dim}).")
+
+        now = time.time()
+        assignments = self._rows(keys)
+        # Les entrées réécrites deviennent les plus récentes et ne peuvent donc pas être évincées ici
+        self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in assignments])
+
+        new_keys = [k for k in dict.fromkeys(keys) if k not in assignments]
+        excess = self.count() + len(new_keys) - self.max_rows
+        if excess > 0:
+            # Lignes libérées mais pas réécrites : `compact` les récupère
+            self.db.execute("DELETE FROM entries WHERE key IN "
+                            "(SELECT key FROM entries WHERE last_used < ? ORDER BY last_used LIMIT ?)", (now, excess))
+        next_row = self._next_row()
+        assignments.update(zip(new_keys, range(next_row, next_row + len(new_keys))))
+        self._set_next_row(next_row + len(new_keys))
+        if not assignments:
+            self.db.commit()
+            return
+
+        matrix = self._map(max(assignments.values()) + 1)
+        for key, vector in zip(keys, vectors):
+            if key in assignments:
+                matrix[assignments[key]] = vector
+        matrix.flush()
+
+        # Le vecteur est écrit avant que la clé ne devienne visible pour les lecteurs
+        self.db.executemany("INSERT OR REPLACE INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                            [(k, row, now) for k, row in assignments.items()])
+        self.db.commit()
+        self._maybe_compact()
+
+    def encode_missing(self, model, texts, batch_size=64):
+        """Encode uniquement les textes absents du cache, sans écrire.
+
+        Renvoie (vecteurs, clés, indices des textes encodés) pour que l'appelant
+        puisse enregistrer les nouveaux vecteurs, éventuellement dans un autre processus.
+        """
+        keys = [text_key(self.model_name, t) for t in texts]
+        found = self.lookup(keys)
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if missing:
+            fresh = np.asarray(model.encode([texts[i] for i in missing], batch_size=batch_size), dtype=np.float32)
+            found.update({keys[i]: vector for i, vector in zip(missing, fresh)})
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32), keys, missing
+        return np.stack([found[k] for k in keys]), keys, missing
+
+    def encode(self, model, texts, batch_size=64):
+        """Encode des textes en ne calculant que ceux absents du cache"""
+        vectors, keys, missing = self.encode_missing(model, texts, batch_size)
+        if missing and not self.readonly:
+            self.store([keys[i] for i in missing], vectors[missing])
+        return vectors
+
+    # --- Maintenance ----------------------------------------------------------------
+
+    def evict(self, max_rows):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_rows, puis compacte"""
+        excess = self.count() - max_rows
+        if excess > 0:
+            self.db.execute("DELETE FROM entries WHERE key IN "
+                            "(SELECT key FROM entries ORDER BY last_used LIMIT ?)", (excess,))
+            self.db.commit()
+        self.compact()
+        return max(0, excess)
+
+    def compact(self):
+        """Regroupe les lignes vivantes en tête de matrice et tronque le fichier"""
+        if self.dim is None:
+            return
+        entries = self.db.execute("SELECT key, row FROM entries ORDER BY row").fetchall()
+        matrix = self._map(0)
+        for new_row, (key, row) in enumerate(entries):
+            if row != new_row:
+                matrix[new_row] = matrix[row]
+        if matrix is not None:
+            matrix.flush()
+        self.db.executemany("UPDATE entries SET row = ? WHERE key = ?",
+                            [(new_row, key) for new_row, (key, row) in enumerate(entries) if row != new_row])
+        self._set_next_row(len(entries))
+        self.db.commit()
+        self._matrix = None
+        with open(self.vectors_file, "ab") as f:
+            f.truncate(len(entries) * self.dim * self.dtype.itemsize)
+        self.db.execute("VACUUM")
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "entries": self.count(),
+            "dead_rows": self.dead_rows(),
+            "max_rows": self.max_rows,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "size_mb": round(os.path.getsize(self.vectors_file) / 1e6, 1) if os.path.exists(self.vectors_file) else 0.0
+        }
+
+    def close(self):
+        self._matrix = None
+        self.db.close()
+
+
+def is_uncased(model_name):
+    """Vrai si le tokenizer du modèle met le texte en minuscules (la casse ne change pas l'embedding)"""
+    return model_name.split("/")[-1] in UNCASED_MODELS
+
+
+class QueryEmbeddingCache:
+    """Cache LRU/TTL en mémoire des embeddings de questions, sûr entre threads.
+
+    La clé est la question normalisée, mise en minuscules seulement pour un
+    modèle connu pour ne pas distinguer la casse (UNCASED_MODELS).
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, model_name=EMBEDDING_MODEL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.casefold = is_uncased(model_name)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, question):
+        text = normalize_text(question)
+        return text.casefold() if self.casefold else text
+
+    def get(self, question):
+        key = self.key(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, question, embedding):
+        key = self.key(question)
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintenance du cache disque des embeddings")
+    parser.add_argument("command", choices=["stats", "evict", "compact"])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--max-rows", type=int, default=EMBEDDING_CACHE_MAX_ROWS)
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.model, max_rows=args.max_rows)
+    if args.command == "evict":
+        print(f"🧹 {cache.evict(args.max_rows)} entrées supprimées.")
+    elif args.command == "compact":
+        cache.compact()
+    print(cache.stats())
+    cache.close()
@@ -1,10 +1,17 @@
 """
 Script pour corriger l'encodage des fichiers JSON
+
+À lancer sur un ancien users.json que l'import dans la base SQLite refuse
+(le fichier est alors laissé en place), puis relancer l'import :
+    python fix_encoding.py
+    python user_store.py migrate
 """
 
 import json
 import os
 
+from config import USERS_FILE
+
 def fix_json_encoding(file_path):
     """
     Lit un fichier JSON en essayant différents encodages et le réécrit en UTF-8
@@ -48,11 +55,12 @@ def fix_json_encoding(file_path):
         return False
 
 if __name__ == "__main__":
-    # Chemin du fichier users.json
-    users_file = os.path.join("user_data", "users.json")
+    # Ancien fichier users.json, pas encore importé dans la base SQLite
+    users_file = USERS_FILE
     
     if os.path.exists(users_file):
         print(f"Correction de l'encodage de {users_file}...")
-        fix_json_encoding(users_file)
+        if fix_json_encoding(users_file):
+            print("Relancer l'import : python user_store.py migrate")
     else:
         print(f"Le fichier {users_file} n'existe pas.")
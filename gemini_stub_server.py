@@ -0,0 +1,138 @@
+# gemini_stub_server.py - Serveur HTTP local imitant l'API Gemini (tests et benchmarks hors ligne)
+
+"""
+Répond à `:generateContent` et `:streamGenerateContent?alt=sse` avec la même
+forme de réponse que Gemini. La latence, le nombre de morceaux du flux et un
+taux d'erreurs (503, ou 429 avec Retry-After) sont configurables pour
+exercer le pool et les nouvelles tentatives de `llm_client.GeminiClient`
+(cf. tests/test_llm_client.py). `fail_first` fait échouer les N premières
+requêtes, de façon déterministe ; `body` remplace le corps des réponses 200
+(réponse bloquée ou mal formée, un seul événement en flux).
+
+    python gemini_stub_server.py --port 8765 --latency 0.3 --fail-rate 0.1
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=stub streamlit run app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANSWER = "Réponse factice du serveur local : consultez un professionnel de santé pour un avis personnalisé."
+
+
+def _candidate(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}]}
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme l'API réelle
+    latency = 0.0
+    fail_rate = 0.0
+    chunks = 5
+    fail_first = 0
+    fail_status = 503
+    retry_after = None
+    body = None
+    requests_served = 0
+    connections = 0  # connexions TCP acceptées (keep-alive : une par client et par slot du pool)
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self):
+        status = "RESOURCE_EXHAUSTED" if self.fail_status == 429 else "UNAVAILABLE"
+        payload = json.dumps({"error": {"code": self.fail_status, "message": "stub overloaded",
+                                        "status": status}}).encode("utf-8")
+        self.send_response(self.fail_status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        if self.retry_after is not None:
+            self.send_header("Retry-After", str(self.retry_after))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        type(self).requests_served += 1
+
+        if self.requests_served <= self.fail_first or random.random() < self.fail_rate:
+            self._send_error()
+            return
+
+        if ":streamGenerateContent" in self.path:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            if self.body is not None:
+                events = [self.body]
+            else:
+                words = STUB_ANSWER.split(" ")
+                size = max(1, len(words) // self.chunks)
+                events = [json.dumps(_candidate(" ".join(words[i:i + size]) + (" " if i + size < len(words) else "")),
+                                     ensure_ascii=False) for i in range(0, len(words), size)]
+            for data in events:
+                time.sleep(self.latency / len(events))
+                event = f"data: {data}\r\n\r\n".encode("utf-8")
+                self.wfile.write(f"{len(event):X}\r\n".encode() + event + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        elif ":generateContent" in self.path:
+            time.sleep(self.latency)
+            if self.body is not None:
+                payload = self.body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            else:
+                self._send_json(200, _candidate(STUB_ANSWER))
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "not found"}})
+
+
+def start_stub_server(port=0, latency=0.0, fail_rate=0.0, chunks=5, fail_first=0, fail_status=503,
+                      retry_after=None, body=None):
+    """Démarre le serveur dans un thread ; renvoie (serveur, URL de base). Compteurs : server.RequestHandlerClass"""
+    handler = type("Handler", (GeminiStubHandler,), {"latency": latency, "fail_rate": fail_rate, "chunks": chunks,
+                                                     "fail_first": fail_first, "fail_status": fail_status,
+                                                     "retry_after": retry_after, "body": body})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur Gemini factice")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Durée de génération simulée (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Proportion de réponses en erreur")
+    parser.add_argument("--fail-status", type=int, default=503, choices=[429, 500, 502, 503, 504])
+    parser.add_argument("--retry-after", help="En-tête Retry-After des réponses en erreur (secondes)")
+    parser.add_argument("--chunks", type=int, default=5, help="Nombre de morceaux du flux SSE")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency, args.fail_rate, args.chunks,
+                                    fail_status=args.fail_status, retry_after=args.retry_after)
+    print(f"🧪 Serveur Gemini factice sur {url} (Ctrl+C pour arrêter)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,186 @@
+# hnsw_tuner.py - Balayage des paramètres HNSW : rappel, latence p99, taille sur disque
+
+"""
+Aide au choix des paramètres HNSW de la collection (cf. vector_store.py).
+
+Les vecteurs sont repris de la base existante (aucun ré-encodage). Une partie
+est mise de côté comme questions de test, sauf si --questions fournit de
+vraies questions (une par ligne, ou JSONL avec un champ "question"), encodées
+avec l'encodeur configuré. Pour chaque combinaison (métrique, M,
+ef_construction, ef_search), un index est construit dans un répertoire
+temporaire (Chroma ne prend pas en compte un nouvel ef_search sur un index
+déjà chargé), puis mesuré :
+- rappel@k par rapport à une recherche exacte (force brute NumPy) ;
+- latences p50/p99 d'une requête ;
+- taille de l'index sur disque et durée de construction.
+
+    python hnsw_tuner.py --m 8,16,32 --ef-construction 64,100,200 --ef-search 10,50,100,200
+    python hnsw_tuner.py --questions questions.txt --top-k 3,10 --target-recall 0.95 --output hnsw.json
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from config import VECTOR_DB_PATH, VECTOR_SPACE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH
+from vector_store import open_collection, directory_size
+
+READ_BATCH = 5000
+
+
+def load_vectors(path=VECTOR_DB_PATH, max_docs=None):
+    """Vecteurs de la collection existante, par pages"""
+    import chromadb
+    collection = open_collection(chromadb.PersistentClient(path=path))
+    total = collection.count()
+    if not total:
+        raise SystemExit(f"❌ Collection vide dans {path} : lancez d'abord create_embeddings.py.")
+    limit = min(total, max_docs or total)
+    vectors = []
+    for offset in range(0, limit, READ_BATCH):
+        page = collection.get(include=["embeddings"], limit=min(READ_BATCH, limit - offset), offset=offset)
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    return np.vstack(vectors)
+
+
+def load_questions(path):
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def exact_neighbors(vectors, queries, k, space):
+    """Plus proches voisins exacts selon la métrique de l'index"""
+    if space == "cosine":
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        scores = queries @ vectors.T
+    elif space == "ip":
+        scores = queries @ vectors.T
+    else:
+        scores = -(np.sum(queries ** 2, axis=1, keepdims=True) - 2 * queries @ vectors.T
+                   + np.sum(vectors ** 2, axis=1))
+    top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def build_index(path, vectors, space, m, ef_construction, ef_search):
+    import chromadb
+    collection = open_collection(chromadb.PersistentClient(path=path), "hnsw_tuning",
+                                 space=space, m=m, ef_construction=ef_construction, ef_search=ef_search)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), READ_BATCH):
+        batch = vectors[offset:offset + READ_BATCH]
+        collection.add(ids=[str(offset + i) for i in range(len(batch))], embeddings=batch.tolist())
+    return collection, time.perf_counter() - start
+
+
+def measure(collection, queries, truth, top_k, warmup=5):
+    k = max(top_k)
+    for query in queries[:warmup]:
+        collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        latencies.append(time.perf_counter() - start)
+        found.append([int(i) for i in result["ids"][0]])
+
+    row = {"p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+           "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3)}
+    for top in top_k:
+        recalls = [len(set(f[:top]) & set(t[:top].tolist())) / top for f, t in zip(found, truth)]
+        row[f"recall@{top}"] = round(float(np.mean(recalls)), 4)
+    return row
+
+
+def sweep(vectors, queries, spaces, ms, ef_constructions, ef_searches, top_k):
+    rows = []
+    for space in spaces:
+        truth = exact_neighbors(vectors, queries, max(top_k), space)
+        for m in ms:
+            for ef_construction in ef_constructions:
+                for ef_search in ef_searches:
+                    path = tempfile.mkdtemp(prefix="medai_hnsw_")
+                    try:
+                        collection, build_s = build_index(path, vectors, space, m, ef_construction, ef_search)
+                        row = {"space": space, "m": m, "ef_construction": ef_construction, "ef_search": ef_search,
+                               "build_s": round(build_s, 2)}
+                        row.update(measure(collection, queries, truth, top_k))
+                        row["disk_mb"] = round(directory_size(path) / 2 ** 20, 2)
+                        rows.append(row)
+                        print(" | ".join(f"{key}={value}" for key, value in row.items()))
+                    finally:
+                        from chromadb.api.client import SharedSystemClient
+                        SharedSystemClient.clear_system_cache()
+                        shutil.rmtree(path, ignore_errors=True)
+    return rows
+
+
+def recommend(rows, metric, target):
+    """Réglage le plus rapide (p99) atteignant le rappel visé"""
+    eligible = [r for r in rows if r[metric] >= target]
+    return min(eligible, key=lambda r: (r["p99_ms"], r["disk_mb"])) if eligible else None
+
+
+def _ints(value):
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balayage des paramètres HNSW de la collection Chroma")
+    parser.add_argument("--spaces", default=VECTOR_SPACE, help="Métriques (cosine, l2, ip), séparées par des virgules")
+    parser.add_argument("--m", default=f"8,{HNSW_M},32")
+    parser.add_argument("--ef-construction", default=f"64,{HNSW_EF_CONSTRUCTION},200")
+    parser.add_argument("--ef-search", default=f"10,32,{HNSW_EF_SEARCH},200")
+    parser.add_argument("--top-k", default="3,10")
+    parser.add_argument("--queries", type=int, default=200, help="Vecteurs mis de côté comme questions de test")
+    parser.add_argument("--questions", help="Fichier de vraies questions (remplace --queries)")
+    parser.add_argument("--max-docs", type=int, default=None, help="Limiter le nombre de vecteurs indexés")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Écrire les mesures en JSON")
+    args = parser.parse_args()
+    top_k = _ints(args.top_k)
+
+    vectors = load_vectors(max_docs=args.max_docs)
+    if args.questions:
+        from embedders import create_embedder
+        queries = np.asarray(create_embedder().encode(load_questions(args.questions)), dtype=np.float32)
+    else:
+        order = np.random.default_rng(args.seed).permutation(len(vectors))
+        held_out = order[:args.queries]
+        queries, vectors = vectors[held_out], vectors[np.sort(order[args.queries:])]
+    print(f"📐 {len(vectors)} vecteurs indexés, {len(queries)} questions de test")
+
+    rows = sweep(vectors, queries, args.spaces.split(","), _ints(args.m), _ints(args.ef_construction),
+                 _ints(args.ef_search), top_k)
+
+    metric = f"recall@{max(top_k)}"
+    best = recommend(rows, metric, args.target_recall)
+    if best:
+        print(f"✅ Réglage conseillé ({metric} >= {args.target_recall}) : {metric}={best[metric]}, "
+              f"p99={best['p99_ms']} ms, {best['disk_mb']} Mo")
+        print(f"   VECTOR_SPACE={best['space']} HNSW_M={best['m']} "
+              f"HNSW_EF_CONSTRUCTION={best['ef_construction']} HNSW_EF_SEARCH={best['ef_search']}")
+    else:
+        print(f"⚠️ Aucun réglage n'atteint {metric} >= {args.target_recall}.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "recommended": best, "vectors": len(vectors), "queries": len(queries)},
+                      f, indent=2)
+        print(f"📊 Mesures écrites dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
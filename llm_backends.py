@@ -0,0 +1,138 @@
+# llm_backends.py - Backends de génération interchangeables
+
+"""
+Interface commune des backends LLM utilisés par MedicalRAGAssistant.
+
+- GeminiBackend : API Google Gemini via le client HTTP mutualisé ;
+- LocalExtractiveBackend : résumé extractif déterministe des passages
+  récupérés, avec latence simulée configurable. Il permet de tester et de
+  profiler toute la chaîne RAG sans réseau ni clé API.
+
+Le backend est choisi par la variable LLM_BACKEND ("gemini" ou "local").
+"""
+
+import re
+import time
+
+from config import LLM_BACKEND, GEMINI_API_KEY, GEMINI_MODEL, LOCAL_LLM_LATENCY
+from llm_client import GeminiClient, GeminiError
+
+
+class LLMError(Exception):
+    """Échec de génération, quel que soit le backend"""
+
+
+class LLMBackend:
+    name = "base"
+    label = "?"
+    model = ""  # identifiant du modèle : les réponses en cache ne sont servies qu'au même backend et modèle
+
+    def generate(self, question, context):
+        """Renvoie la réponse complète ; lève LLMError en cas d'échec"""
+        return "".join(self.stream(question, context))
+
+    def stream(self, question, context):
+        """Produit la réponse par morceaux ; lève LLMError en cas d'échec"""
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+def build_prompt(question, context):
+    return f"""Contexte médical :
+{chr(10).join(context)}
+
+Question : {question}
+
+Réponse (précise, sourcée, en français) :"""
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+    label = "Google Gemini Flash"
+
+    def __init__(self, api_key=GEMINI_API_KEY, model=GEMINI_MODEL):
+        if not api_key:
+            raise ValueError("Clé API Gemini non trouvée. Veuillez la définir dans le fichier .env")
+        self.client = GeminiClient(api_key, model)
+        self.model = model
+
+    @staticmethod
+    def payload(question, context):
+        return {
+            "contents": [{"parts": [{"text": build_prompt(question, context)}], "role": "user"}],
+            "generationConfig": {
+                "temperature": 0.2,
+                "topP": 0.95,
+                "maxOutputTokens": 300
+            }
+        }
+
+    def generate(self, question, context):
+        try:
+            return self.client.generate(self.payload(question, context))
+        except GeminiError as e:
+            raise LLMError(str(e)) from e
+
+    def stream(self, question, context):
+        try:
+            yield from self.client.stream(self.payload(question, context))
+        except GeminiError as e:
+            raise LLMError(str(e)) from e
+
+    def stats(self):
+        return self.client.stats()
+
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w{3,}")
+
+
+class LocalExtractiveBackend(LLMBackend):
+    """Sélectionne les phrases du contexte qui partagent le plus de mots avec la question"""
+
+    name = "local"
+    label = "Local extractif (hors ligne)"
+    model = "extractive"
+
+    def __init__(self, latency=LOCAL_LLM_LATENCY, max_sentences=3, chunks=5):
+        self.latency = latency
+        self.max_sentences = max_sentences
+        self.chunks = chunks
+
+    def _answer(self, question, context):
+        terms = set(_WORD.findall(question.lower()))
+        sentences = [s.strip() for passage in context for s in _SENTENCE_SPLIT.split(passage) if s.strip()]
+        if not sentences:
+            return "Aucune information pertinente trouvée dans les sources."
+        scored = sorted(range(len(sentences)),
+                        key=lambda i: (-len(terms & set(_WORD.findall(sentences[i].lower()))), i))
+        selected = sorted(scored[:self.max_sentences])
+        return "D'après les sources : " + " ".join(sentences[i] for i in selected)
+
+    def stream(self, question, context):
+        words = self._answer(question, context).split(" ")
+        size = max(1, -(-len(words) // self.chunks))
+        for i in range(0, len(words), size):
+            if self.latency:
+                time.sleep(self.latency / self.chunks)
+            yield " ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    LocalExtractiveBackend.name: LocalExtractiveBackend,
+}
+
+
+def label_for(name):
+    """Libellé affiché d'un backend, sans l'instancier (le nom brut s'il est inconnu)"""
+    backend = BACKENDS.get(name)
+    return backend.label if backend else name
+
+
+def create_llm_backend(name=LLM_BACKEND, **kwargs):
+    if name not in BACKENDS:
+        raise ValueError(f"Backend LLM inconnu : {name} (disponibles : {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
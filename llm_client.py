@@ -0,0 +1,224 @@
+# llm_client.py - Client HTTP mutualisé pour l'API Gemini
+
+"""
+Client HTTP partagé par l'assistant pour appeler Gemini :
+- pool de connexions keep-alive (une seule poignée de main TCP+TLS par connexion) ;
+- délais de connexion et de lecture distincts ;
+- nouvelles tentatives avec backoff exponentiel et gigue sur 429/5xx et erreurs réseau ;
+- mesure de la latence de chaque appel.
+
+L'URL de base est configurable (GEMINI_BASE_URL) pour viser le serveur
+factice `gemini_stub_server.py` en local.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (GEMINI_BASE_URL, LLM_POOL_SIZE, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+                    LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX)
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    """Échec définitif d'un appel à Gemini (après les nouvelles tentatives)"""
+
+    def __init__(self, message, status_code=None, attempts=1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.attempts = attempts
+
+
+def _parse(raw, attempts):
+    """Corps JSON d'une réponse 200 ; GeminiError (avec un extrait) s'il est illisible"""
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise GeminiError(f"Réponse illisible : {raw[:200]}", 200, attempts) from e
+    if not isinstance(data, dict):
+        raise GeminiError(f"Réponse inattendue : {raw[:200]}", 200, attempts)
+    return data
+
+
+def _candidate_parts(data, raw, attempts, required=True):
+    """Parties du premier candidat ; GeminiError si absentes (réponse bloquée ou mal formée)"""
+    try:
+        return data["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError) as e:
+        if not required:
+            return []
+        raise GeminiError(f"Réponse sans texte : {raw[:200]}", 200, attempts) from e
+
+
+class GeminiClient:
+    def __init__(self, api_key, model, base_url=GEMINI_BASE_URL, pool_size=LLM_POOL_SIZE,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "x-goog-api-key": api_key})
+
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.calls = 0
+        self.retries = 0
+        self.errors = 0
+
+    def _url(self, method):
+        return f"{self.base_url}/v1/models/{self.model}:{method}"
+
+    def _backoff(self, attempt, retry_after=None):
+        """Attente avant la tentative suivante : Retry-After si fourni, sinon backoff exponentiel avec gigue"""
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record(self, elapsed, attempts, failed):
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.calls += 1
+            self.retries += attempts - 1
+            self.errors += int(failed)
+        logger.debug(f"⏱️ Appel Gemini : {elapsed * 1000:.0f} ms ({attempts} tentative(s))")
+
+    def _post(self, method, payload, stream=False, params=None):
+        """POST avec nouvelles tentatives ; renvoie (réponse 200, nombre de tentatives)"""
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                response = self.session.post(self._url(method), json=payload, params=params,
+                                             timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    raise GeminiError(f"Erreur réseau : {e}", attempts=attempt + 1) from e
+                self._sleep(attempt, None, str(e))
+                continue
+
+            if response.status_code == 200:
+                return response, attempt + 1
+            if response.status_code not in RETRY_STATUS or last:
+                message = response.text[:200]
+                response.close()
+                raise GeminiError(f"Erreur API ({response.status_code}) : {message}",
+                                  response.status_code, attempts=attempt + 1)
+
+            retry_after = response.headers.get("Retry-After")
+            response.close()
+            self._sleep(attempt, retry_after, f"HTTP {response.status_code}")
+
+    def _sleep(self, attempt, retry_after, reason):
+        delay = self._backoff(attempt, retry_after)
+        logger.warning(f"🔄 Nouvelle tentative Gemini dans {delay:.2f}s ({reason})")
+        time.sleep(delay)
+
+    def generate(self, payload):
+        """Appel bloquant `generateContent` ; renvoie le texte de la réponse"""
+        start = time.perf_counter()
+        attempts, failed = 1, True
+        try:
+            response, attempts = self._post("generateContent", payload)
+            raw = response.text
+            parts = _candidate_parts(_parse(raw, attempts), raw, attempts)
+            text = "".join(part.get("text", "") for part in parts if isinstance(part, dict))
+            if not text:
+                raise GeminiError(f"Réponse sans texte : {raw[:200]}", 200, attempts)
+            failed = False
+            return text
+        except GeminiError as e:
+            attempts = e.attempts
+            raise
+        finally:
+            self._record(time.perf_counter() - start, attempts, failed)
+
+    def stream(self, payload):
+        """Appel `streamGenerateContent` (SSE) ; produit les morceaux de texte au fil de l'eau"""
+        start = time.perf_counter()
+        attempts, failed = 1, True
+        try:
+            try:
+                response, attempts = self._post("streamGenerateContent", payload, stream=True, params={"alt": "sse"})
+            except GeminiError as e:
+                attempts = e.attempts
+                raise
+            produced, last = False, ""
+            with response:
+                response.encoding = "utf-8"  # text/event-stream sans charset : requests supposerait latin-1
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    last = line[len("data:"):].strip()
+                    # Un événement sans candidat (métadonnées, fin de flux) est toléré, pas un flux sans texte
+                    parts = _candidate_parts(_parse(last, attempts), last, attempts, required=False)
+                    text = "".join(part.get("text", "") for part in parts if isinstance(part, dict))
+                    if text:
+                        produced = True
+                        yield text
+            if not produced:
+                raise GeminiError(f"Réponse sans texte : {last[:200]}", 200, attempts)
+            failed = False
+        finally:
+            self._record(time.perf_counter() - start, attempts, failed)
+
+    def stats(self):
+        """Compteurs et latences (ms) des derniers appels"""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            calls, retries, errors = self.calls, self.retries, self.errors
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {"calls": calls, "retries": retries, "errors": errors,
+                "p50_ms": percentile(0.50), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99)}
+
+    def close(self):
+        self.session.close()
+
+
+class RateLimiter:
+    """Seau à jetons : au plus `rate` appels par seconde (rafales jusqu'à `burst`), sûr entre threads"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
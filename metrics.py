@@ -0,0 +1,259 @@
+# metrics.py - Chronométrage des étapes et exposition des métriques (format Prometheus)
+
+"""
+Instrumentation légère, conçue pour rester active en production :
+un `span` coûte deux appels à perf_counter et une insertion dans un
+histogramme à seaux fixes (quelques microsecondes).
+
+    from metrics import span
+    with span("vector_search"):
+        ...
+
+Les métriques sont exposées au format texte Prometheus :
+- via un petit serveur HTTP (METRICS_PORT, ex. http://localhost:9108/metrics) ;
+- et/ou dans un fichier réécrit périodiquement (METRICS_FILE), pour node_exporter ;
+- et dans le panneau d'administration de la barre latérale (utils.show_metrics_panel).
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_ENABLED, METRICS_PORT, METRICS_FILE, METRICS_FILE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Seaux en secondes, de la milliseconde (cache) à la dizaine de secondes (LLM)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seaux pour les tailles (tokens d'un prompt, par ex.)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier seau : +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimation par interpolation linéaire dans le seau concerné (bornée par le maximum observé)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if cumulative + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return min(self.max, lower + (upper - lower) * (rank - cumulative) / n)
+            cumulative += n
+        return self.max
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}  # nom d'étape -> Histogram
+        self.distributions = {}  # nom -> Histogram de valeurs (tailles...)
+        self.counters = {}    # (nom, libellé) -> valeur
+        self.collectors = {}  # nom -> fonction renvoyant {nom_de_jauge: valeur}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_value(self, name, value, buckets=SIZE_BUCKETS):
+        with self._lock:
+            histogram = self.distributions.get(name)
+            if histogram is None:
+                histogram = self.distributions[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, label="", value=1):
+        with self._lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + value
+
+    def register_collector(self, name, collector):
+        """Enregistre (ou remplace) le collecteur `name` : une instance recréée n'en ajoute pas un second"""
+        with self._lock:
+            self.collectors[name] = collector
+
+    def snapshot(self):
+        """Résumé par étape (nombre, moyenne, p50, p95, p99 en ms) pour l'affichage"""
+        with self._lock:
+            rows = {}
+            for stage, h in sorted(self.histograms.items()):
+                rows[stage] = {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count * 1000, 1) if h.count else None,
+                    "p50_ms": round(h.quantile(0.50) * 1000, 1) if h.count else None,
+                    "p95_ms": round(h.quantile(0.95) * 1000, 1) if h.count else None,
+                    "p99_ms": round(h.quantile(0.99) * 1000, 1) if h.count else None,
+                }
+            return rows
+
+    def value_snapshot(self):
+        """Résumé des distributions de valeurs (nombre, moyenne, p50, p95)"""
+        with self._lock:
+            return {name: {"count": h.count, "mean": round(h.sum / h.count, 1),
+                           "p50": round(h.quantile(0.50), 1), "p95": round(h.quantile(0.95), 1)}
+                    for name, h in sorted(self.distributions.items()) if h.count}
+
+    def gauges(self):
+        values = {}
+        with self._lock:
+            collectors = list(self.collectors.values())
+        for collector in collectors:
+            try:
+                values.update(collector())
+            except Exception:
+                continue
+        return values
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP medai_stage_duration_seconds Durée des étapes du traitement d'une question",
+            "# TYPE medai_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f'medai_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'medai_stage_duration_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'medai_stage_duration_seconds_count{{stage="{stage}"}} {h.count}')
+            for name, h in sorted(self.distributions.items()):
+                lines.append(f"# TYPE medai_{name} histogram")
+                cumulative = 0
+                for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f'medai_{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"medai_{name}_sum {h.sum:.6f}")
+                lines.append(f"medai_{name}_count {h.count}")
+            counters = sorted(self.counters.items())
+
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE medai_{name}_total counter")
+            for (counter, label), value in counters:
+                if counter == name:
+                    labels = f'{{kind="{label}"}}' if label else ""
+                    lines.append(f"medai_{name}_total{labels} {value}")
+
+        for name, value in sorted(self.gauges().items()):
+            if value is None:
+                continue
+            lines.append(f"# TYPE medai_{name} gauge")
+            lines.append(f"medai_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(stage):
+    """Chronomètre un bloc et l'enregistre dans l'histogramme de l'étape"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(stage, time.perf_counter() - start)
+
+
+def observe(stage, seconds):
+    if METRICS_ENABLED:
+        registry.observe(stage, seconds)
+
+
+def observe_value(name, value, buckets=SIZE_BUCKETS):
+    if METRICS_ENABLED:
+        registry.observe_value(name, value, buckets)
+
+
+def increment(name, label="", value=1):
+    if METRICS_ENABLED:
+        registry.increment(name, label, value)
+
+
+def register_collector(name, collector):
+    registry.register_collector(name, collector)
+
+
+def render_prometheus():
+    return registry.render_prometheus()
+
+
+def write_prometheus(path):
+    """Écriture atomique, compatible avec le textfile collector de node_exporter"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("/metrics", ""):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+def start_exporter(port=METRICS_PORT, file_path=METRICS_FILE, interval=METRICS_FILE_INTERVAL):
+    """Démarre (une seule fois par processus) le serveur /metrics et/ou l'écriture périodique du fichier"""
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started or not METRICS_ENABLED:
+            return
+        _exporter_started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"⚠️ Serveur de métriques non démarré sur le port {port} : {e}")
+        else:
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"📈 Métriques Prometheus sur http://0.0.0.0:{port}/metrics")
+
+    if file_path:
+        def write_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_prometheus(file_path)
+                except OSError:
+                    pass
+        threading.Thread(target=write_loop, name="metrics-file", daemon=True).start()
@@ -2,15 +2,15 @@
 
 import streamlit as st
 from rag_pipeline import MedicalRAGAssistant
+from llm_backends import LLMError
 import os
 from datetime import datetime
 import sys
-import base64
-from fpdf import FPDF
 
 # Ajouter le répertoire parent au path pour importer utils
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from utils import get_user_profile, update_user_history, export_to_pdf, show_user_sidebar
+from metrics import span
 
 # Configuration de page
 st.set_page_config(
@@ -36,10 +36,12 @@ assistant = load_assistant()
 
 # Récupérer profil utilisateur
 user = st.session_state.current_user
-profile = get_user_profile(user)
+with span("page_user_profile"):
+    profile = get_user_profile(user)
 
 # Afficher la barre latérale utilisateur
-show_user_sidebar(user)
+with span("page_sidebar"):
+    show_user_sidebar(user)
 
 # Interface chat
 now = datetime.now().strftime('%d/%m/%Y %H:%M')
@@ -55,35 +57,42 @@ if 'last_answer' not in st.session_state:
 
 if st.button("Envoyer", key="send_chat"):
     if question.strip():
-        with st.spinner("Recherche... 🧠"):
+        with st.spinner("Recherche... 🧠"), span("page_retrieve"):
             context, metadata = assistant.retrieve_context(question)
-        with st.spinner("Génération de la réponse... ✨"):
-            answer = assistant.generate_answer_with_gemini(question, context)
         
         sources = [m.get('source','inconnue') for m in metadata]
         
-        # Stocker dans la session state
-        st.session_state.last_answer = answer
-        st.session_state.last_sources = sources
-        st.session_state.last_question = question
-        
-        # Mise à jour de l'historique utilisateur
-        update_user_history(user, question, answer, sources)
-        
-        # Actualiser le profil pour l'affichage à jour
-        profile = get_user_profile(user)
-        
-        # Affichage
+        # Affichage progressif de la réponse au fil de la génération
         st.markdown("#### 🧠 Réponse Médicale")
-        st.markdown(f"<div class='response-box'>{answer}</div>", unsafe_allow_html=True)
+        try:
+            with span("page_answer"), st.container(border=True):
+                answer = st.write_stream(assistant.stream_answer(question, context))
+        except LLMError:
+            # Réponse partielle : ni conservée ni enregistrée dans l'historique
+            answer = None
+            st.error("⚠️ Échec de la génération de réponse. Veuillez réessayer.")
         
-        st.markdown("#### 📄 Sources consultées")
-        for i, source in enumerate(sources):
-            st.markdown(f"{i+1}. {source}")
-          # Export PDF
-        if st.button("📥 Télécharger en PDF"):
-            href = export_to_pdf(question, answer, sources)
-            st.markdown(href, unsafe_allow_html=True)
+        if answer is not None:
+            # Stocker dans la session state
+            st.session_state.last_answer = answer
+            st.session_state.last_sources = sources
+            st.session_state.last_question = question
+            
+            # Mise à jour de l'historique utilisateur
+            with span("update_user_history"):
+                update_user_history(user, question, answer, sources)
+            
+            # Actualiser le profil pour l'affichage à jour
+            with span("page_user_profile"):
+                profile = get_user_profile(user)
+            
+            st.markdown("#### 📄 Sources consultées")
+            for i, source in enumerate(sources):
+                st.markdown(f"{i+1}. {source}")
+              # Export PDF
+            if st.button("📥 Télécharger en PDF"):
+                href = export_to_pdf(question, answer, sources)
+                st.markdown(href, unsafe_allow_html=True)
             
 # Boutons de navigation vers les autres pages
 st.markdown("---")
@@ -1,14 +1,17 @@
 # 01_Historique.py - Page d'historique des chats
 
 import streamlit as st
-from rag_pipeline import MedicalRAGAssistant
-import json
 import os
+import sys
 from datetime import datetime
 import logging
-from fpdf import FPDF
 import base64
 
+# Ajouter le répertoire parent au path pour importer user_store
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import HISTORY_PAGE_SIZE
+from user_store import get_user_store
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,17 +23,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# Chemin de stockage local
-USER_DATA_DIR = "user_data"
-USERS_FILE = os.path.join(USER_DATA_DIR, "users.json")
-
-# Charger les utilisateurs
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
-
 # Vérification de la session
 if "logged_in" not in st.session_state or not st.session_state.logged_in:
     st.warning("⚠️ Vous devez être connecté pour accéder à cette page.")
@@ -39,9 +31,7 @@ if "logged_in" not in st.session_state or not st.session_state.logged_in:
 
 # Obtenir les données utilisateur
 username = st.session_state.current_user
-users = load_users()
-user_data = users.get(username, {"history": []})
-history = user_data.get("history", [])
+store = get_user_store()
 
 # CSS personnalisé
 st.markdown("""
@@ -82,6 +72,7 @@ st.markdown("""
 
 # Fonction pour créer un PDF
 def create_medical_pdf(question, answer, sources):
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -121,30 +112,33 @@ def export_to_pdf(question, answer, sources):
 st.title("🕰️ Historique de vos Consultations")
 
 # Affichage des statistiques
-total_questions = len(history)
+total_questions = store.user_stats(username)["questions"]
 st.subheader(f"📊 Vous avez posé {total_questions} question{'s' if total_questions > 1 else ''}")
 
-# Filtrage par mot-clé
+# Recherche par mots-clés (index plein texte : accents et majuscules ignorés)
 keyword = st.text_input("🔍 Rechercher dans vos questions", "")
 
 # Tri des questions
-sort_options = ["Plus récentes d'abord", "Plus anciennes d'abord"]
-sort_choice = st.radio("Tri des questions:", sort_options, horizontal=True)
-
-# Filtrer et trier l'historique
-filtered_history = history
-if keyword:
-    filtered_history = [h for h in history if keyword.lower() in h["question"].lower() or keyword.lower() in h["answer"].lower()]
-
-# Tri selon l'option sélectionnée
-if sort_choice == "Plus anciennes d'abord":
-    filtered_history = sorted(filtered_history, key=lambda x: x.get("timestamp", ""))
-else:
-    filtered_history = sorted(filtered_history, key=lambda x: x.get("timestamp", ""), reverse=True)
+sort_options = {"Plus récentes d'abord": "newest", "Plus anciennes d'abord": "oldest", "Pertinence": "relevance"}
+sort_choice = st.radio("Tri des questions:", list(sort_options), horizontal=True)
+sort = sort_options[sort_choice]
+
+# Une seule page courante par session, remise à 1 quand la recherche ou le tri change
+if st.session_state.get("history_filter") != (keyword, sort):
+    st.session_state.history_filter = (keyword, sort)
+    st.session_state.history_page = 1
+
+# Recherche, tri et pagination faits par la base : seule la page affichée est chargée
+page = st.session_state.get("history_page", 1)
+filtered_history, total_found = store.search_history(username, keyword, sort, page - 1, HISTORY_PAGE_SIZE)
+pages = max(1, -(-total_found // HISTORY_PAGE_SIZE))
+if not filtered_history and page > pages:  # la page demandée n'existe plus (historique effacé)
+    page = st.session_state.history_page = pages
+    filtered_history, total_found = store.search_history(username, keyword, sort, page - 1, HISTORY_PAGE_SIZE)
 
 # Affichage des résultats de recherche
 if keyword and filtered_history:
-    st.success(f"✅ {len(filtered_history)} résultat(s) trouvé(s) pour '{keyword}'")
+    st.success(f"✅ {total_found} résultat(s) trouvé(s) pour '{keyword}'")
 elif keyword:
     st.warning(f"⚠️ Aucun résultat trouvé pour '{keyword}'")
 
@@ -179,12 +173,12 @@ else:
                       unsafe_allow_html=True)
             st.markdown("<hr>", unsafe_allow_html=True)
 
+    if pages > 1:
+        st.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, step=1, key="history_page")
+
 # Option pour effacer l'historique
 if total_questions > 0:
     if st.button("🗑️ Effacer tout l'historique", type="primary", use_container_width=True):
-        user_data["history"] = []
-        users[username] = user_data
-        with open(USERS_FILE, "w") as f:
-            json.dump(users, f, indent=2)
+        store.clear_history(username)
         st.success("✅ Historique effacé avec succès!")
         st.rerun()
@@ -1,11 +1,14 @@
 # 02_Profil.py - Page de profil utilisateur
 
 import streamlit as st
-import json
 import os
-from datetime import datetime
+import sys
 import logging
 
+# Ajouter le répertoire parent au path pour importer user_store
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from user_store import get_user_store
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,10 +20,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# Chemin de stockage local
-USER_DATA_DIR = "user_data"
-USERS_FILE = os.path.join(USER_DATA_DIR, "users.json")
-
 # CSS personnalisé pour un design fluide et pro
 st.markdown("""
 <style>
@@ -50,17 +49,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Fonctions pour gérer les utilisateurs
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
-
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
-
 # Vérification de la session
 if "logged_in" not in st.session_state or not st.session_state.logged_in:
     st.warning("⚠️ Vous devez être connecté pour accéder à cette page.")
@@ -69,8 +57,8 @@ if "logged_in" not in st.session_state or not st.session_state.logged_in:
 
 # Obtenir les données utilisateur
 username = st.session_state.current_user
-users = load_users()
-user_data = users.get(username, {})
+store = get_user_store()
+user_data = store.get_user(username) or {}
 
 # Interface principale
 st.title(f"👤 Profil de {username}")
@@ -93,11 +81,10 @@ with st.container():
     
     with col2:
         # Statistiques utilisateur
-        total_questions = len(user_data.get("history", []))
-        potential_diseases = len(user_data.get("potential_diseases", []))
+        stats = store.user_stats(username)
         
-        st.metric("Questions posées", total_questions)
-        st.metric("Symptômes analysés", potential_diseases)
+        st.metric("Questions posées", stats["questions"])
+        st.metric("Symptômes analysés", stats["potential_diseases"])
     
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -120,9 +107,7 @@ with st.container():
             elif new_password != confirm_password:
                 st.error("❌ Les nouveaux mots de passe ne correspondent pas.")
             else:
-                user_data["password"] = new_password
-                users[username] = user_data
-                save_users(users)
+                store.update_user(username, password=new_password)
                 st.success("✅ Mot de passe mis à jour avec succès!")
     
     # Changement de langue préférée
@@ -136,9 +121,7 @@ with st.container():
         )
         
         if st.button("Mettre à jour la langue", use_container_width=True):
-            user_data["language"] = new_language
-            users[username] = user_data
-            save_users(users)
+            store.update_user(username, language=new_language)
             st.success("✅ Préférence de langue mise à jour avec succès!")
     
     st.markdown("</div>", unsafe_allow_html=True)
@@ -162,8 +145,7 @@ with st.container():
             st.error("❌ Mot de passe incorrect.")
         else:
             # Supprimer l'utilisateur
-            del users[username]
-            save_users(users)
+            store.delete_user(username)
             # Réinitialiser la session
             st.session_state.logged_in = False
             st.session_state.current_user = None
@@ -1,13 +1,16 @@
 # 03_Maladies_Potentielles.py - Page des maladies potentielles
 
 import streamlit as st
-import json
 import os
+import sys
 from datetime import datetime
 import logging
-from fpdf import FPDF
 import base64
 
+# Ajouter le répertoire parent au path pour importer user_store
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from user_store import get_user_store
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,10 +22,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# Chemin de stockage local
-USER_DATA_DIR = "user_data"
-USERS_FILE = os.path.join(USER_DATA_DIR, "users.json")
-
 # CSS personnalisé
 st.markdown("""
 <style>
@@ -59,19 +58,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Fonctions pour gérer les utilisateurs
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
-
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
-
 # Créer un PDF des maladies potentielles
 def create_diseases_pdf(diseases):
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -131,9 +120,7 @@ if "logged_in" not in st.session_state or not st.session_state.logged_in:
 
 # Obtenir les données utilisateur
 username = st.session_state.current_user
-users = load_users()
-user_data = users.get(username, {})
-diseases = user_data.get("potential_diseases", [])
+store = get_user_store()
 
 # Interface principale
 st.title("🩺 Maladies Potentielles")
@@ -150,18 +137,15 @@ préoccupation de santé.
 """, unsafe_allow_html=True)
 
 # Affichage des statistiques
-total_diseases = len(diseases)
+total_diseases = store.user_stats(username)["potential_diseases"]
 st.subheader(f"📊 {total_diseases} symptôme{'s' if total_diseases > 1 else ''} analysé{'s' if total_diseases > 1 else ''}")
 
 # Tri des maladies
 sort_options = ["Plus récentes d'abord", "Plus anciennes d'abord"]
 sort_choice = st.radio("Tri des symptômes:", sort_options, horizontal=True)
 
-# Trier les maladies
-if sort_choice == "Plus anciennes d'abord":
-    diseases = sorted(diseases, key=lambda x: x.get("date", ""))
-else:
-    diseases = sorted(diseases, key=lambda x: x.get("date", ""), reverse=True)
+# Maladies triées par la base
+diseases = store.potential_diseases(username, newest_first=sort_choice != "Plus anciennes d'abord")
 
 # Affichage des maladies potentielles
 if not diseases:
@@ -188,19 +172,14 @@ else:
             """, unsafe_allow_html=True)
             
             # Option pour supprimer une entrée individuelle
-            if st.button(f"🗑️ Supprimer cette entrée", key=f"delete_{i}"):
-                diseases.pop(i)
-                user_data["potential_diseases"] = diseases
-                users[username] = user_data
-                save_users(users)
+            if st.button(f"🗑️ Supprimer cette entrée", key=f"delete_{disease['id']}"):
+                store.delete_potential_disease(username, disease["id"])
                 st.success("✅ Entrée supprimée avec succès!")
                 st.rerun()
     
     # Option pour effacer toutes les maladies
     if st.button("🗑️ Effacer toutes les maladies potentielles", type="primary", use_container_width=True):
-        user_data["potential_diseases"] = []
-        users[username] = user_data
-        save_users(users)
+        store.clear_potential_diseases(username)
         st.success("✅ Liste des maladies potentielles effacée avec succès!")
         st.rerun()
 
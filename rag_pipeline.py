@@ -2,121 +2,432 @@
 
 import os
 import json
-import requests
-from sentence_transformers import SentenceTransformer
-import chromadb
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from chromadb.config import Settings
+import time
+
+from config import (DATA_FILE, VECTOR_STORE, EMBEDDING_MODEL,
+                    EMBEDDER_BACKEND, EMBEDDER_PRELOAD, EMBED_BATCH_ENABLED, CONTEXT_OVERFETCH,
+                    ANSWER_CACHE_ENABLED, LLM_BACKEND)
+from answer_cache import SemanticAnswerCache
+from llm_backends import create_llm_backend, build_prompt, LLMError
+from llm_client import RateLimiter
+from corpus import (iter_medical_documents, iter_chunks, chunking_config, batched, content_hash, file_signature,
+                    IndexManifest)
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from embedders import create_embedder, EmbeddingBatcher, SentenceTransformerEmbedder
+from context_builder import build_context, estimate_tokens
+from vector_store import open_vector_store
+import metrics
+from metrics import span
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Chemins
-DATA_FILE = "data/raw/medical_data.jsonl"
-VECTOR_DB_PATH = "./vector_db"
-COLLECTION_NAME = "medical_kb"
-
-from dotenv import load_dotenv
+# Indexation par lots
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "256"))
 
-# Charger les variables d'environnement
-load_dotenv()
+class MedicalRAGAssistant:
+    def __init__(self, llm_backend=LLM_BACKEND, vector_store=VECTOR_STORE):
+        self.llm = create_llm_backend(llm_backend)
 
-# Clé Google Gemini (chargée depuis .env)
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = "gemini-1.5-flash"  # Modèle valide pour l'API Google
+        # Le modèle d'embedding (plusieurs secondes) n'est chargé qu'au premier encodage
+        self._embedder = None
+        self._document_embedder = None
+        self._embedder_lock = threading.Lock()
+        if EMBEDDER_PRELOAD:
+            self.warm_up(background=True)
 
-if not GEMINI_API_KEY:
-    raise ValueError("Clé API Gemini non trouvée. Veuillez la définir dans le fichier .env")
-
-class MedicalRAGAssistant:
-    def __init__(self):
-        logger.info("🧠 Chargement du modèle d'embedding...")
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_batcher = EmbeddingBatcher(self._encode_questions) if EMBED_BATCH_ENABLED else None
+        self.embedding_cache = EmbeddingCache(EMBEDDING_MODEL)
+        self.query_cache = QueryEmbeddingCache()
+        self.answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+        self.index_version = 0
 
         logger.info("📁 Initialisation de la base vectorielle...")
-        self.chroma_client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
-        self.collection = self.chroma_client.get_or_create_collection(COLLECTION_NAME)
+        self.store = open_vector_store(vector_store)
 
         logger.info("📄 Chargement des connaissances médicales...")
         self.load_medical_knowledge()
 
-    def load_medical_knowledge(self, file_path=DATA_FILE):
-        """Charge les documents médicaux et les indexe dans ChromaDB"""
-        if self.collection.count() > 0:
-            logger.info("🧠 Base vectorielle déjà chargée.")
-            return
+        metrics.register_collector("rag_pipeline", self._metrics_gauges)
+        metrics.start_exporter()
+
+    @property
+    def embedder(self):
+        """Modèle d'embedding, chargé et préchauffé au premier usage"""
+        if self._embedder is None:
+            with self._embedder_lock:
+                if self._embedder is None:
+                    self._embedder = self._load_embedder()
+        return self._embedder
 
+    @property
+    def document_embedder(self):
+        """Encodeur des passages : toujours le modèle de référence.
+
+        Le backend ONNX (int8) n'encode que les questions ; les vecteurs de
+        l'index et du cache d'embeddings (clé : EMBEDDING_MODEL) restent ceux
+        du modèle de référence, partagés avec create_embeddings.
+        """
+        if EMBEDDER_BACKEND == SentenceTransformerEmbedder.name:
+            return self.embedder
+        if self._document_embedder is None:
+            with self._embedder_lock:
+                if self._document_embedder is None:
+                    logger.info("🧠 Chargement du modèle de référence pour l'indexation...")
+                    self._document_embedder = SentenceTransformerEmbedder(EMBEDDING_MODEL)
+        return self._document_embedder
+
+    def _load_embedder(self):
+        logger.info(f"🧠 Chargement du modèle d'embedding ({EMBEDDER_BACKEND})...")
+        with span("embedder_load"):
+            model = create_embedder(EMBEDDER_BACKEND, model_name=EMBEDDING_MODEL)
+            model.encode(["échauffement"])  # premier appel plus lent : on le paie hors requête
+        logger.info("✅ Modèle d'embedding prêt.")
+        return model
+
+    def warm_up(self, background=False):
+        """Charge le modèle d'embedding maintenant, éventuellement dans un thread d'arrière-plan"""
+        if not background:
+            return self.embedder
+        thread = threading.Thread(target=lambda: self.embedder, name="embedder-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _metrics_gauges(self):
+        """Compteurs des caches et du client LLM, exposés avec les durées des étapes"""
+        gauges = {f"query_cache_{k}": v for k, v in self.query_cache.stats().items()}
+        if self.answer_cache is not None:
+            gauges.update({f"answer_cache_{k}": v for k, v in self.answer_cache.stats().items()})
+        if self.embedding_batcher is not None:
+            gauges.update({f"embedding_batcher_{k}": v for k, v in self.embedding_batcher.stats().items()})
+        gauges.update({f"llm_{k}": v for k, v in self.llm.stats().items()})
+        gauges["index_version"] = self.index_version
+        return gauges
+
+    def load_medical_knowledge(self, file_path=DATA_FILE, batch_size=INDEX_BATCH_SIZE):
+        """Indexe dans la base vectorielle les documents nouveaux ou modifiés et supprime ceux retirés du corpus"""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Fichier {file_path} introuvable.")
 
-        with open(file_path, "r", encoding="utf-8") as f:
-            docs = [json.loads(line) for line in f]
+        manifest = IndexManifest.load(self.store.manifest_path)
+        rebuild = self.store.needs_rebuild()
+        if rebuild or not manifest.compatible(EMBEDDING_MODEL):
+            if rebuild or self.store.count() > 0:
+                # Index sans manifeste, autre modèle, autre découpage ou autres paramètres de stockage
+                logger.info("♻️ Index existant incompatible, reconstruction complète.")
+                self.store.reset()
+                manifest = IndexManifest.load(self.store.manifest_path)  # invalidé par reset()
+            manifest = IndexManifest(self.store.manifest_path, model=EMBEDDING_MODEL, version=manifest.version,
+                                     chunking=chunking_config())
+
+        # Corpus inchangé depuis la dernière synchronisation : pas de relecture au démarrage
+        signature = file_signature(file_path)
+        if manifest.documents and manifest.source == signature:
+            self.index_version = manifest.version
+            logger.info(f"✅ Index à jour (v{manifest.version}) : corpus inchangé, "
+                        f"{len(manifest.documents)} documents.")
+            return
+
+        logger.info(f"🧠 Mise à jour incrémentale de l'index (lots de {batch_size})...")
+
+        current = {}  # empreinte -> nombre de passages
+        added = 0
+        start = time.perf_counter()
+        for batch in batched(iter_medical_documents(file_path), batch_size):
+            ids, texts, metadatas = [], [], []
+            for doc in batch:
+                doc_hash = content_hash(doc)
+                if doc_hash in current:
+                    continue
+                if doc_hash in manifest.documents:
+                    current[doc_hash] = manifest.documents[doc_hash]
+                    continue
+                chunks = list(iter_chunks(doc, doc_hash))
+                current[doc_hash] = len(chunks)
+                for chunk_id, text, metadata in chunks:
+                    ids.append(chunk_id)
+                    texts.append(text)
+                    metadatas.append(metadata)
+                added += 1
+
+            if not ids:
+                continue
+
+            with span("index_encode"):
+                embeddings = self.embedding_cache.encode(self.document_embedder, texts, batch_size=batch_size)
+
+            with span("index_write"):
+                for rows in batched(range(len(ids)), batch_size):
+                    self.store.upsert(
+                        ids=[ids[i] for i in rows],
+                        embeddings=embeddings[rows],
+                        documents=[texts[i] for i in rows],
+                        metadatas=[metadatas[i] for i in rows]
+                    )
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"[{added} docs encodés / {len(current)} parcourus] {added / elapsed:.1f} docs/s")
+
+        removed = [doc_hash for doc_hash in manifest.documents if doc_hash not in current]
+        for ids in batched((chunk_id for doc_hash in removed for chunk_id in manifest.chunk_ids(doc_hash)), batch_size):
+            self.store.delete(ids)
 
-        logger.info(f"✅ {len(docs)} documents médicaux chargés.")
+        if added or removed:
+            manifest.documents = current
+            manifest.version += 1
+        if added or removed or manifest.source != signature:
+            manifest.source = signature
+            manifest.save()
+        self.index_version = manifest.version
 
-        logger.info("🧠 Génération des embeddings et indexation...")
+        elapsed = time.perf_counter() - start
+        rate = added / elapsed if elapsed > 0 else 0.0
+        logger.info(f"✅ Index à jour (v{manifest.version}) : {added} ajoutés/modifiés, "
+                    f"{len(removed)} supprimés, {len(current)} au total ({sum(current.values())} passages) "
+                    f"en {elapsed:.1f}s ({rate:.1f} docs/s).")
 
-        for i, doc in enumerate(docs):
-            text = f"{doc.get('title', '')}: {doc.get('text', '')}"
-            embedding = self.embedder.encode(text).tolist()
-            
-            self.collection.add(
-                embeddings=[embedding],
-                documents=[text],
-                metadatas=[{
-                    "source": doc.get("source", "inconnue"),
-                    "domain": doc.get("domain", "général")
-                }],
-                ids=[f"id_{i}"]
-            )
-            logger.info(f"[{i+1}/{len(docs)}] '{doc['title'][:40]}...'")
+    def _encode_questions(self, questions):
+        return self.embedder.encode(questions, batch_size=len(questions)).tolist()
 
-        logger.info("✅ Indexation terminée.")
+    def embed_query(self, question: str):
+        """Embedding d'une question, servi depuis le cache LRU quand elle a déjà été posée.
+
+        Les questions concurrentes (plusieurs sessions) sont encodées par micro-lots.
+        """
+        query_embedding = self.query_cache.get(question)
+        if query_embedding is None:
+            with span("query_embedding"):
+                if self.embedding_batcher is not None:
+                    query_embedding = self.embedding_batcher.encode(question)
+                else:
+                    query_embedding = self._encode_questions([question])[0]
+            self.query_cache.put(question, query_embedding)
+        return query_embedding
+
+    def _query_candidates(self, query_embeddings, top_k):
+        """Sur-récupère top_k x CONTEXT_OVERFETCH candidats, avec leurs embeddings"""
+        with span("vector_search"):
+            return self.store.query(query_embeddings, n_results=top_k * CONTEXT_OVERFETCH)
+
+    def _build_context(self, query_embedding, documents, metadatas, embeddings, top_k):
+        with span("context_build"):
+            passages, metas, report = build_context(query_embedding, documents, metadatas, embeddings, top_k)
+        metrics.increment("context_passages", "duplicate", report["duplicates"])
+        metrics.increment("context_passages", "over_budget", report["over_budget"])
+        metrics.increment("context_passages", "truncated", report["truncated"])
+        metrics.observe_value("context_tokens", report["tokens"])
+        return passages, metas
 
     def retrieve_context(self, question: str, top_k: int = 3):
-        """Recherche les documents pertinents dans ChromaDB"""
-        query_embedding = self.embedder.encode([question]).tolist()[0]
-        results = self.collection.query(query_embeddings=[query_embedding], n_results=top_k)
-        return results["documents"][0], results["metadatas"][0]
+        """Recherche les documents pertinents dans la base vectorielle et assemble le contexte (dédoublonné, MMR, budget)"""
+        query_embedding = self.embed_query(question)
+        results = self._query_candidates([query_embedding], top_k)
+        return self._build_context(query_embedding, results["documents"][0], results["metadatas"][0],
+                                   results["embeddings"][0], top_k)
 
-    def generate_answer_with_gemini(self, question: str, context: list):
-        """Génère une réponse médicale via Gemini API"""
-        prompt = f"""Contexte médical :
-{chr(10).join(context)}
+    def embed_queries(self, questions: list):
+        """Version groupée de embed_query : un seul encode pour toutes les questions absentes du cache"""
+        embeddings = [self.query_cache.get(q) for q in questions]
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        if missing:
+            fresh = self.embedder.encode([questions[i] for i in missing], batch_size=INDEX_BATCH_SIZE).tolist()
+            for i, embedding in zip(missing, fresh):
+                self.query_cache.put(questions[i], embedding)
+                embeddings[i] = embedding
+        return embeddings
 
-Question : {question}
+    def retrieve_context_batch(self, questions: list, top_k: int = 3):
+        """Version groupée de retrieve_context : un seul encode et une seule requête vectorielle"""
+        embeddings = self.embed_queries(questions)
+        results = self._query_candidates(embeddings, top_k)
+        return [self._build_context(*candidates, top_k)
+                for candidates in zip(embeddings, results["documents"], results["metadatas"], results["embeddings"])]
 
-Réponse (précise, sourcée, en français) :"""
+    def _record_prompt(self, question: str, context: list):
+        """Taille du prompt envoyé au LLM, pour suivre la consommation de tokens"""
+        tokens = estimate_tokens(build_prompt(question, context))
+        metrics.observe_value("prompt_tokens", tokens)  # la somme de l'histogramme = tokens consommés
+        logger.info(f"🧾 Prompt : {len(context)} passage(s), ~{tokens} tokens")
 
-        try:
-            response = requests.post(
-                url=f"https://generativelanguage.googleapis.com/v1/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "contents": [{"parts": [{"text": prompt}], "role": "user"}],
-                    "generationConfig": {
-                        "temperature": 0.2,
-                        "topP": 0.95,
-                        "maxOutputTokens": 300
-                    }
-                },
-                timeout=10
-            )
-
-            if response.status_code != 200:
-                logger.error(f"❌ Erreur API ({response.status_code}) : {response.text[:200]}...")
-                return "⚠️ Échec de la génération de réponse."
-
-            data = response.json()
-            return data["candidates"][0]["content"]["parts"][0]["text"]
+    def _cached_answer(self, question: str, context: list):
+        if self.answer_cache is None:
+            return None
+        query_embedding = self.embed_query(question)
+        with span("answer_cache_lookup"):
+            cached = self.answer_cache.lookup(query_embedding, context, self.index_version,
+                                              self.llm.name, self.llm.model)
+        if cached is not None:
+            logger.info("⚡ Réponse servie depuis le cache sémantique.")
+            metrics.increment("answers", "cached")
+        return cached
+
+    def _cache_answer(self, question: str, context: list, answer: str):
+        if self.answer_cache is not None and answer:
+            self.answer_cache.store(question, self.embed_query(question), context, answer, self.index_version,
+                                    self.llm.name, self.llm.model)
+
+    def generate_answer(self, question: str, context: list, raise_on_error=False):
+        """Génère une réponse médicale via le backend LLM (ou la reprend du cache sémantique).
+
+        En cas d'échec, renvoie un message d'avertissement, ou lève LLMError si raise_on_error.
+        """
+        cached = self._cached_answer(question, context)
+        if cached is not None:
+            return cached
 
+        self._record_prompt(question, context)
+        try:
+            with span("llm_generate"):
+                answer = self.llm.generate(question, context)
+        except LLMError as e:
+            logger.error(f"❌ {e}")
+            metrics.increment("answers", "error")
+            if raise_on_error:
+                raise
+            return "⚠️ Échec de la génération de réponse."
         except Exception as e:
-            logger.error(f"💥 Erreur lors de l'appel à Gemini : {str(e)}")
+            logger.error(f"💥 Erreur lors de l'appel au LLM ({self.llm.name}) : {str(e)}")
+            metrics.increment("answers", "error")
+            if raise_on_error:
+                raise LLMError(f"Erreur pendant la réponse ({self.llm.name}) : {e}") from e
             return "⚠️ Une erreur est survenue pendant la réponse."
 
+        metrics.increment("answers", "generated")
+        self._cache_answer(question, context, answer)
+        return answer
+
+    def stream_answer(self, question: str, context: list):
+        """Génère la réponse en flux : produit les morceaux de texte au fil de l'eau.
+
+        Lève LLMError si la génération échoue, y compris après des morceaux déjà
+        produits : la réponse partielle n'est ni mise en cache ni à enregistrer.
+        """
+        cached = self._cached_answer(question, context)
+        if cached is not None:
+            yield cached
+            return
+
+        self._record_prompt(question, context)
+        chunks = []
+        start = time.perf_counter()
+        try:
+            for text in self.llm.stream(question, context):
+                if not chunks:
+                    metrics.observe("llm_first_chunk", time.perf_counter() - start)
+                chunks.append(text)
+                yield text
+        except LLMError as e:
+            logger.error(f"❌ {e}")
+            metrics.increment("answers", "error")
+            raise
+        except Exception as e:
+            logger.error(f"💥 Erreur lors de l'appel au LLM ({self.llm.name}) : {str(e)}")
+            metrics.increment("answers", "error")
+            raise LLMError(f"Erreur pendant la réponse ({self.llm.name}) : {e}") from e
+
+        metrics.observe("llm_stream", time.perf_counter() - start)
+        metrics.increment("answers", "generated")
+        self._cache_answer(question, context, "".join(chunks))
+
+    # Noms historiques, conservés pour compatibilité
+    generate_answer_with_gemini = generate_answer
+    stream_answer_with_gemini = stream_answer
+
+
+def _read_batch_questions(input_path):
+    """Questions au format JSONL : {"id": ..., "question": ...} (id facultatif : numéro de ligne)"""
+    for n, record in enumerate(iter_medical_documents(input_path)):
+        if isinstance(record, str):
+            record = {"question": record}
+        yield str(record.get("id", f"q{n}")), record["question"]
+
+
+def _completed_batch_ids(output_path):
+    """Identifiants déjà traités avec succès (reprise après interruption)"""
+    if not os.path.exists(output_path):
+        return set()
+    return {r["id"] for r in iter_medical_documents(output_path) if r.get("ok")}
+
+
+def run_batch(assistant, input_path, output_path, concurrency=4, rate=2.0, top_k=3, chunk_size=256):
+    """Répond à un fichier de questions : retrieval groupé puis génération concurrente à débit limité"""
+    done = _completed_batch_ids(output_path)
+    limiter = RateLimiter(rate, burst=concurrency)
+    write_lock = threading.Lock()
+    processed = 0
+    start = time.perf_counter()
+
+    def answer(qid, question, context, metadata, timings):
+        limiter.acquire()
+        t0 = time.perf_counter()
+        try:
+            response, error = assistant.generate_answer(question, context, raise_on_error=True), None
+        except LLMError as e:
+            response, error = None, str(e)
+        timings["generate_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        record = {
+            "id": qid,
+            "question": question,
+            "answer": response,
+            "sources": [m.get("source", "inconnue") for m in metadata],
+            "timings": timings,
+            "ok": error is None
+        }
+        if error is not None:
+            record["error"] = error  # question reprise au prochain lancement
+        with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = (item for item in _read_batch_questions(input_path) if item[0] not in done)
+        for chunk in batched(pending, chunk_size):
+            ids, questions = zip(*chunk)
+
+            # Durées des étapes groupées, ramenées à une question
+            t0 = time.perf_counter()
+            assistant.embed_queries(list(questions))
+            t1 = time.perf_counter()
+            retrieved = assistant.retrieve_context_batch(list(questions), top_k)
+            t2 = time.perf_counter()
+            timings = {
+                "embed_ms": round((t1 - t0) * 1000 / len(questions), 2),
+                "retrieve_ms": round((t2 - t1) * 1000 / len(questions), 2)
+            }
+
+            futures = [
+                pool.submit(answer, qid, question, context, metadata, dict(timings))
+                for qid, question, (context, metadata) in zip(ids, questions, retrieved)
+            ]
+            for future in futures:
+                future.result()
+
+            processed += len(questions)
+            logger.info(f"[{processed} questions] {processed / (time.perf_counter() - start):.2f} questions/s")
+
+    logger.info(f"✅ Lot terminé : {processed} nouvelles réponses ({len(done)} déjà présentes) dans {output_path}.")
+
+
 def main():
-    assistant = MedicalRAGAssistant()
+    parser = argparse.ArgumentParser(description="Assistant Santé IA en ligne de commande")
+    parser.add_argument("--batch", metavar="QUESTIONS.jsonl", help="Répondre à un fichier de questions au lieu du mode interactif")
+    parser.add_argument("--output", default="answers.jsonl", help="Fichier JSONL des réponses (mode lot, reprise automatique)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Générations simultanées au plus")
+    parser.add_argument("--rate", type=float, default=2.0, help="Appels LLM par seconde au plus (0 = illimité)")
+    parser.add_argument("--top-k", type=int, default=3, help="Passages récupérés par question")
+    parser.add_argument("--llm", default=LLM_BACKEND, help="Backend LLM (gemini, local)")
+    args = parser.parse_args()
+
+    assistant = MedicalRAGAssistant(llm_backend=args.llm)
+
+    if args.batch:
+        run_batch(assistant, args.batch, args.output, args.concurrency, args.rate, args.top_k)
+        return
     
     print("🏥 Assistant Santé IA – Tapez 'exit' pour quitter.")
     
@@ -125,12 +436,16 @@ def main():
         if question.lower() in ["exit", "quitter", "quit"]:
             break
 
-        context, metadata = assistant.retrieve_context(question)
-        answer = assistant.generate_answer_with_gemini(question, context)
+        context, metadata = assistant.retrieve_context(question, args.top_k)
 
         print("\n🧠 Réponse :")
-        print(answer)
+        try:
+            for chunk in assistant.stream_answer(question, context):
+                print(chunk, end="", flush=True)
+            print()
+        except LLMError:
+            print("\n⚠️ Échec de la génération de réponse.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,67 @@
+# test_answer_cache.py - Cache sémantique des réponses : succès, échecs et portée
+
+import time
+
+import numpy as np
+import pytest
+
+from answer_cache import SemanticAnswerCache
+
+CONTEXT = ["passage a", "passage b"]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "answers.sqlite")
+
+
+def _vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_backends_keep_their_answers(cache_path):
+    cache = SemanticAnswerCache(cache_path, threshold=0.9, ttl=3600)
+    cache.store("q", _vector(1, 0), CONTEXT, "réponse gemini", 1, "gemini", "flash")
+    assert cache.lookup(_vector(1, 0), CONTEXT, 1, "local", "extractive") is None
+    cache.store("q", _vector(1, 0), CONTEXT, "réponse locale", 1, "local", "extractive")
+
+    # Démarrage suivant sur Gemini : les réponses Gemini ont survécu au passage par le backend local
+    reopened = SemanticAnswerCache(cache_path, threshold=0.9, ttl=3600)
+    assert reopened.lookup(_vector(1, 0), CONTEXT, 1, "gemini", "flash") == "réponse gemini"
+    assert reopened.lookup(_vector(1, 0), CONTEXT, 1, "gemini", "pro") is None
+    assert reopened.lookup(_vector(1, 0), CONTEXT, 1, "local", "extractive") == "réponse locale"
+
+
+def test_hit_and_misses(cache_path):
+    cache = SemanticAnswerCache(cache_path, threshold=0.9, ttl=3600)
+    cache.store("q", _vector(1, 0, 0), CONTEXT, "réponse", 1, "local")
+    assert cache.lookup(_vector(0.99, 0.05, 0), list(reversed(CONTEXT)), 1, "local") == "réponse"  # ordre indifférent
+    assert cache.lookup(_vector(0, 1, 0), CONTEXT, 1, "local") is None  # question éloignée
+    assert cache.lookup(_vector(1, 0, 0), ["autre passage"], 1, "local") is None  # autre contexte
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2, "hit_rate": 0.333, "evictions": 0}
+
+
+def test_new_index_version_purges(cache_path):
+    cache = SemanticAnswerCache(cache_path, threshold=0.9, ttl=3600)
+    cache.store("q", _vector(1, 0), CONTEXT, "ancienne", 1, "local")
+    assert cache.lookup(_vector(1, 0), CONTEXT, 2, "local") is None
+    assert cache.lookup(_vector(1, 0), CONTEXT, 1, "local") is None  # supprimée, pas seulement masquée
+
+
+def test_ttl_expiry(cache_path, monkeypatch):
+    cache = SemanticAnswerCache(cache_path, threshold=0.9, ttl=60)
+    cache.store("q", _vector(1, 0), CONTEXT, "réponse", 1, "local")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.lookup(_vector(1, 0), CONTEXT, 1, "local") is None
+
+
+def test_least_recently_used_is_evicted(cache_path):
+    cache = SemanticAnswerCache(cache_path, threshold=0.99, ttl=3600, max_entries=2)
+    for i, vector in enumerate([_vector(1, 0, 0), _vector(0, 1, 0)]):
+        cache.store(f"q{i}", vector, CONTEXT, f"réponse {i}", 1, "local")
+    assert cache.lookup(_vector(1, 0, 0), CONTEXT, 1, "local") == "réponse 0"  # q0 devient la plus récente
+    cache.store("q2", _vector(0, 0, 1), CONTEXT, "réponse 2", 1, "local")
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+    assert cache.lookup(_vector(0, 1, 0), CONTEXT, 1, "local") is None
+    assert cache.lookup(_vector(1, 0, 0), CONTEXT, 1, "local") == "réponse 0"
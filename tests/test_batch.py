@@ -0,0 +1,50 @@
+# test_batch.py - Mode lot : statut des réponses et reprise
+
+import json
+
+from llm_backends import LLMError
+from rag_pipeline import run_batch
+
+
+class _Assistant:
+    """Assistant factice : la génération échoue pour les questions listées dans `failing`"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.generated = []
+
+    def embed_queries(self, questions):
+        return [[0.0] for _ in questions]
+
+    def retrieve_context_batch(self, questions, top_k):
+        return [([f"contexte {q}"], [{"source": "test"}]) for q in questions]
+
+    def generate_answer(self, question, context, raise_on_error=False):
+        self.generated.append(question)
+        if question in self.failing:
+            raise LLMError("quota dépassé")
+        return "⚠️ Réponse qui commence par un avertissement, mais réussie."
+
+
+def _run(tmp_path, assistant):
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text("".join(json.dumps({"id": q, "question": q}) + "\n" for q in ["q1", "q2", "q3"]),
+                         encoding="utf-8")
+    output = tmp_path / "answers.jsonl"
+    run_batch(assistant, str(questions), str(output), concurrency=2, rate=0)
+    return [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+
+
+def test_status_comes_from_llm_errors(tmp_path):
+    records = {r["id"]: r for r in _run(tmp_path, _Assistant(failing={"q2"}))}
+    assert records["q1"]["ok"] and records["q3"]["ok"]  # le texte de la réponse ne décide pas du statut
+    assert not records["q2"]["ok"] and records["q2"]["answer"] is None
+    assert "quota" in records["q2"]["error"]
+
+
+def test_resume_retries_failed_questions(tmp_path):
+    _run(tmp_path, _Assistant(failing={"q2"}))
+    retry = _Assistant()
+    records = _run(tmp_path, retry)
+    assert retry.generated == ["q2"]
+    assert [r["ok"] for r in records if r["id"] == "q2"] == [False, True]
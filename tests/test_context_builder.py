@@ -0,0 +1,50 @@
+# test_context_builder.py - Contexte envoyé au LLM : doublons, MMR et budget de tokens
+
+import numpy as np
+
+from context_builder import build_context, estimate_tokens, truncate_to_tokens
+
+QUERY = [1.0, 0.0, 0.0]
+
+
+def _build(documents, embeddings, **options):
+    metadatas = [{"title": d} for d in documents]
+    options = {"top_k": 3, "token_budget": 1000, "dedup_threshold": 0.95, "mmr_lambda": 0.5, **options}
+    return build_context(QUERY, documents, metadatas, np.array(embeddings, dtype=np.float32), **options)
+
+
+def test_near_duplicates_keep_most_relevant():
+    passages, metadatas, report = _build(["copie", "original", "autre"],
+                                         [[0.9, 0.1, 0.0], [0.91, 0.09, 0.0], [0.6, 0.0, 0.8]])
+    assert passages == ["original", "autre"]
+    assert metadatas == [{"title": "original"}, {"title": "autre"}]
+    assert report["duplicates"] == 1 and report["passages"] == 2
+
+
+def test_mmr_prefers_diversity():
+    embeddings = [[0.95, 0.31, 0.0], [0.9, 0.43, 0.0], [0.8, -0.6, 0.0]]
+    # Sans diversité : ordre de pertinence ; avec MMR, le passage éloigné du premier passe devant
+    assert _build(["a", "b", "c"], embeddings, top_k=2, mmr_lambda=1.0, dedup_threshold=1.1)[0] == ["a", "b"]
+    assert _build(["a", "b", "c"], embeddings, top_k=2, mmr_lambda=0.5, dedup_threshold=1.1)[0] == ["a", "c"]
+
+
+def test_token_budget():
+    long_text = "Première phrase assez longue. " * 10
+    embeddings = [[1.0, 0.0, 0.0], [0.7, 0.7, 0.0], [0.7, 0.0, 0.7]]
+    passages, _, report = _build([long_text, "court", "x" * 400], embeddings, token_budget=40, dedup_threshold=1.1)
+    # Le premier passage est tronqué à une fin de phrase, le dernier ne tient plus
+    assert passages[0].endswith(".") and estimate_tokens(passages[0]) <= 40
+    assert passages[1] == "court"
+    assert report["truncated"] == 1 and report["over_budget"] == 1
+    assert report["tokens"] == sum(estimate_tokens(p) for p in passages) <= 40
+
+
+def test_truncate_without_sentence_end():
+    truncated = truncate_to_tokens("mot " * 50, 5)
+    assert truncated.endswith("…") and truncated[:-1].split() == ["mot"] * 5  # coupé entre deux mots
+    assert truncate_to_tokens("court.", 5) == "court."
+
+
+def test_empty_candidates():
+    assert _build([], np.zeros((0, 3))) == ([], [], {"candidates": 0, "duplicates": 0, "over_budget": 0,
+                                                     "truncated": 0, "passages": 0, "tokens": 0})
@@ -0,0 +1,66 @@
+# test_corpus.py - Découpage des documents en passages
+
+from corpus import chunk_document, iter_chunks, content_hash
+
+
+def _doc(sentences):
+    return {"title": "Titre", "text": " ".join(sentences)}
+
+
+def _sentence(i, words=5):
+    return " ".join(f"m{i}_{w}" for w in range(words - 1)) + f" fin{i}."
+
+
+def _pieces(doc, **options):
+    return [doc["text"][start:end] for start, end in chunk_document(doc, **options)]
+
+
+def test_short_document_single_chunk():
+    doc = _doc([_sentence(0), _sentence(1)])
+    assert chunk_document(doc, max_words=20, overlap_words=5) == [(0, len(doc["text"]))]
+
+
+def test_empty_text():
+    assert chunk_document({"title": "Vide", "text": ""}) == [(0, 0)]
+
+
+def test_chunks_end_on_sentence_boundaries():
+    doc = _doc([_sentence(i) for i in range(10)])
+    pieces = _pieces(doc, max_words=12, overlap_words=0)
+    assert all(p.endswith(".") and len(p.split()) <= 12 for p in pieces)
+    # Sans recouvrement, les passages se suivent et couvrent tout le texte
+    assert " ".join(pieces) == doc["text"]
+    assert len(pieces) == 5
+
+
+def test_overlap_repeats_last_sentences():
+    doc = _doc([_sentence(i) for i in range(10)])
+    pieces = _pieces(doc, max_words=15, overlap_words=5)
+    for previous, following in zip(pieces, pieces[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        assert following.startswith(last_sentence)
+        assert len(following.split()) <= 15
+    assert pieces[-1].endswith("fin9.")
+
+
+def test_overlap_never_stalls():
+    # Recouvrement >= taille d'un passage : le découpage avance quand même d'au moins une phrase
+    doc = _doc([_sentence(i) for i in range(6)])
+    pieces = _pieces(doc, max_words=10, overlap_words=10)
+    assert len(pieces) == 5 and pieces[-1].endswith("fin5.")
+
+
+def test_long_sentence_split_by_words():
+    doc = {"title": "T", "text": " ".join(f"mot{i}" for i in range(25)) + "."}
+    pieces = _pieces(doc, max_words=10, overlap_words=0)
+    assert [len(p.split()) for p in pieces] == [10, 10, 5]
+
+
+def test_chunk_ids_and_metadata():
+    doc = {**_doc([_sentence(i) for i in range(4)]), "source": "NHS"}
+    chunks = list(iter_chunks(doc, content_hash(doc)))
+    ids = [chunk_id for chunk_id, _, _ in chunks]
+    assert len(set(ids)) == len(ids) and all(i.startswith(ids[0].split("#")[0] + "#") for i in ids)
+    for index, (_, text, metadata) in enumerate(chunks):
+        assert text == f"Titre: {doc['text'][metadata['start']:metadata['end']]}"
+        assert metadata["chunk"] == index and metadata["source"] == "NHS"
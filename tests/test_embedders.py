@@ -0,0 +1,51 @@
+# test_embedders.py - Encodeur ONNX int8 : vecteurs conformes au modèle de référence
+
+import os
+
+import numpy as np
+import pytest
+
+from config import EMBEDDING_MODEL, ONNX_MODEL_DIR, ONNX_MIN_COSINE
+from embedders import ONNX_INT8_FILE, ONNX_META_FILE, validate, _validation_texts
+
+
+class _FixedEncoder:
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+    def encode(self, texts):
+        return self.vectors[:len(texts)]
+
+
+def test_validate_reports_min_cosine():
+    reference = _FixedEncoder([[1, 0], [0, 1]])
+    report = validate(reference, _FixedEncoder([[2, 0], [1, 1]]), ["a", "b"], min_cosine=0.9)
+    assert report["n"] == 2
+    assert report["min_cosine"] == pytest.approx(np.sqrt(0.5), abs=1e-5)
+    assert not report["ok"]
+    assert validate(reference, reference, ["a", "b"], min_cosine=0.9999)["ok"]
+
+
+@pytest.fixture(scope="module")
+def onnx_pair(tmp_path_factory):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    pytest.importorskip("sentence_transformers")
+    from embedders import OnnxEmbedder, SentenceTransformerEmbedder, export_onnx
+
+    model_dir = ONNX_MODEL_DIR
+    if not all(os.path.exists(os.path.join(model_dir, f)) for f in (ONNX_INT8_FILE, ONNX_META_FILE)):
+        pytest.importorskip("torch")
+        model_dir = str(tmp_path_factory.mktemp("onnx"))
+        try:
+            export_onnx(EMBEDDING_MODEL, model_dir)
+        except OSError as e:  # modèle de référence non téléchargeable (hors ligne)
+            pytest.skip(f"Export ONNX impossible : {e}")
+    return SentenceTransformerEmbedder(EMBEDDING_MODEL), OnnxEmbedder(EMBEDDING_MODEL, model_dir)
+
+
+def test_onnx_within_cosine_tolerance(onnx_pair):
+    reference, candidate = onnx_pair
+    report = validate(reference, candidate, _validation_texts(n_docs=50))
+    assert report["min_cosine"] >= ONNX_MIN_COSINE, report
+    assert report["ok"]
@@ -0,0 +1,60 @@
+# test_embedding_cache.py - Cache disque des embeddings : éviction LRU et compactage
+
+import os
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+DIM = 8
+
+
+def _vectors(n, offset=0):
+    return np.arange(offset * DIM, (offset + n) * DIM, dtype=np.float32).reshape(n, DIM)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache("modele", cache_dir=str(tmp_path), dtype="float32", max_rows=10, compact_ratio=0.5)
+    yield cache
+    cache.close()
+
+
+def _keys(prefix, n):
+    return [f"{prefix}{i}" for i in range(n)]
+
+
+def test_lookup_returns_stored_vectors(cache):
+    cache.store(_keys("a", 4), _vectors(4))
+    found = cache.lookup(_keys("a", 4) + ["absent"])
+    assert sorted(found) == _keys("a", 4)
+    np.testing.assert_array_equal(found["a2"], _vectors(1, 2)[0])
+
+
+def test_evicted_rows_not_reused_during_build(cache):
+    cache.store(_keys("a", 10), _vectors(10))
+    reader = EmbeddingCache("modele", cache_dir=os.path.dirname(cache.path), readonly=True)
+    before = reader.lookup(_keys("a", 10))
+    with cache.deferred_compaction():
+        for batch in range(3):
+            cache.store(_keys(f"b{batch}-", 3), _vectors(3, 10 + 3 * batch))
+            assert cache.count() == 10
+        # Les lignes des entrées évincées n'ont pas été réécrites : le lecteur lit toujours ses vecteurs
+        matrix = reader._map(cache._next_row())
+        for key, row in zip(_keys("a", 10), range(10)):
+            np.testing.assert_array_equal(matrix[row], before[key])
+        assert cache.dead_rows() == 9
+    reader.close()
+    assert cache.dead_rows() == 0  # compactage à la sortie du bloc
+
+
+def test_file_size_is_bounded(cache):
+    for batch in range(20):
+        cache.store(_keys(f"c{batch}-", 3), _vectors(3, 3 * batch))
+    assert cache.count() == 10
+    assert cache.dead_rows() <= cache.compact_ratio * cache.max_rows
+    # 60 vecteurs écrits, mais la matrice n'utilise jamais plus de (1 + compact_ratio) * max_rows lignes
+    assert cache._next_row() <= (1 + cache.compact_ratio) * cache.max_rows
+    latest = cache.lookup(_keys("c19-", 3))
+    np.testing.assert_array_equal(latest["c19-1"], _vectors(1, 58)[0])
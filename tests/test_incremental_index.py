@@ -0,0 +1,95 @@
+# test_incremental_index.py - Ré-indexation incrémentale : ajouts, modifications, suppressions
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+import rag_pipeline
+from config import DATA_FILE
+from corpus import IndexManifest
+
+
+class _HashEmbedder:
+    """Vecteurs déterministes dérivés du texte ; mémorise les textes encodés"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32):
+        self.encoded.extend(texts)
+        return np.array([np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest()[:32], dtype=np.uint8)
+                         for t in texts], dtype=np.float32) + 1
+
+
+def _write_corpus(docs):
+    with open(DATA_FILE, "w", encoding="utf-8") as f:
+        for title, text in docs:
+            f.write(json.dumps({"title": title, "text": text, "source": "test"}, ensure_ascii=False) + "\n")
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(DATA_FILE))
+    _write_corpus([("Diabète", "Soif intense."), ("Migraine", "Maux de tête."), ("Grippe", "Fièvre et toux.")])
+    embedder = _HashEmbedder()
+    monkeypatch.setattr(rag_pipeline, "create_embedder", lambda *args, **kwargs: embedder)
+    assistant = rag_pipeline.MedicalRAGAssistant(llm_backend="local", vector_store="numpy")
+    yield assistant, embedder
+
+
+def _manifest(assistant):
+    return IndexManifest.load(assistant.store.manifest_path)
+
+
+def _resync(assistant):
+    os.utime(DATA_FILE, ns=(0, os.stat(DATA_FILE).st_mtime_ns + 10**9))  # signature changée : relecture
+    assistant.load_medical_knowledge()
+
+
+def test_initial_build(index):
+    assistant, embedder = index
+    manifest = _manifest(assistant)
+    assert manifest.version == 1 and len(manifest.documents) == 3
+    assert assistant.store.count() == sum(manifest.documents.values()) == 3
+    assert assistant.index_version == 1
+
+
+def test_unchanged_corpus_is_a_no_op(index):
+    assistant, embedder = index
+    embedder.encoded.clear()
+    _resync(assistant)
+    assert _manifest(assistant).version == 1 and not embedder.encoded
+    assert assistant.store.count() == 3
+
+
+def test_unchanged_signature_skips_the_scan(index, monkeypatch):
+    assistant, embedder = index
+    monkeypatch.setattr(rag_pipeline, "iter_medical_documents", lambda path: pytest.fail("corpus relu"))
+    assistant.load_medical_knowledge()
+    assert assistant.index_version == 1
+
+
+def test_added_modified_removed(index):
+    assistant, embedder = index
+    before = _manifest(assistant)
+    embedder.encoded.clear()
+    _write_corpus([("Diabète", "Soif intense."), ("Migraine", "Maux de tête et nausées."), ("Asthme", "Essoufflement.")])
+    _resync(assistant)
+
+    manifest = _manifest(assistant)
+    assert manifest.version == 2 and len(manifest.documents) == 3
+    # Seuls le document modifié et le nouveau sont encodés
+    assert sorted(embedder.encoded) == ["Asthme: Essoufflement.", "Migraine: Maux de tête et nausées."]
+    kept = set(before.documents) & set(manifest.documents)
+    assert len(kept) == 1
+    assert assistant.store.count() == 3
+    assert assistant.index_version == 2
+
+    # Les passages des documents retirés ou modifiés ont disparu de la base
+    removed_ids = [chunk for doc_hash in set(before.documents) - kept for chunk in before.chunk_ids(doc_hash)]
+    result = assistant.store.query(embedder.encode(["Grippe: Fièvre et toux."]).tolist(), n_results=3)
+    assert not set(removed_ids) & set(result["ids"][0])
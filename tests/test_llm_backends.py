@@ -0,0 +1,41 @@
+# test_llm_backends.py - Backend local extractif (hors ligne) et registre des backends
+
+import pytest
+
+from llm_backends import LocalExtractiveBackend, create_llm_backend, label_for
+
+CONTEXT = ["Le diabète provoque une soif intense. Il se traite par insuline.",
+           "La migraine donne des maux de tête. Le repos aide.",
+           "La fièvre accompagne la grippe."]
+QUESTION = "Quels symptômes du diabète et de la grippe ?"
+
+
+def test_answer_is_deterministic():
+    backend = LocalExtractiveBackend(latency=0)
+    answers = {backend.generate(QUESTION, CONTEXT) for _ in range(3)}
+    assert len(answers) == 1
+    assert answers == {LocalExtractiveBackend(latency=0).generate(QUESTION, CONTEXT)}
+
+
+def test_answer_keeps_most_relevant_sentences_in_source_order():
+    answer = LocalExtractiveBackend(latency=0, max_sentences=2).generate(QUESTION, CONTEXT)
+    assert answer == "D'après les sources : Le diabète provoque une soif intense. La fièvre accompagne la grippe."
+
+
+def test_stream_chunks_join_to_generate():
+    backend = LocalExtractiveBackend(latency=0, chunks=4)
+    chunks = list(backend.stream(QUESTION, CONTEXT))
+    assert 1 < len(chunks) <= 4
+    assert "".join(chunks) == backend.generate(QUESTION, CONTEXT)
+
+
+def test_empty_context():
+    assert LocalExtractiveBackend(latency=0).generate(QUESTION, []) == \
+        "Aucune information pertinente trouvée dans les sources."
+
+
+def test_registry():
+    assert isinstance(create_llm_backend("local", latency=0), LocalExtractiveBackend)
+    assert label_for("local") == LocalExtractiveBackend.label and label_for("inconnu") == "inconnu"
+    with pytest.raises(ValueError, match="inconnu"):
+        create_llm_backend("inconnu")
@@ -0,0 +1,130 @@
+# test_llm_client.py - GeminiClient face au serveur factice local (gemini_stub_server.py)
+
+import json
+import time
+
+import pytest
+
+from gemini_stub_server import STUB_ANSWER, start_stub_server
+from llm_backends import GeminiBackend, LLMError
+from llm_client import GeminiClient, GeminiError
+
+PAYLOAD = {"contents": [{"parts": [{"text": "Question ?"}], "role": "user"}]}
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server, url = start_stub_server(**options)
+        servers.append(server)
+        return server.RequestHandlerClass, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def client(url, **options):
+    options = {"max_retries": 3, "backoff_base": 0.001, "backoff_max": 1.0, **options}
+    return GeminiClient("stub", "gemini-test", base_url=url, **options)
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_then_succeeds(stub, status):
+    handler, url = stub(fail_first=2, fail_status=status)
+    gemini = client(url)
+    assert gemini.generate(PAYLOAD) == STUB_ANSWER
+    assert handler.requests_served == 3
+    assert gemini.stats()["retries"] == 2 and gemini.stats()["errors"] == 0
+
+
+def test_retry_after_is_honoured(stub):
+    handler, url = stub(fail_first=2, fail_status=429, retry_after="0.2")
+    gemini = client(url)
+    start = time.perf_counter()
+    assert gemini.generate(PAYLOAD) == STUB_ANSWER
+    assert time.perf_counter() - start >= 0.4  # deux attentes Retry-After, pas le backoff de 1 ms
+
+
+def test_gives_up_after_max_retries(stub):
+    handler, url = stub(fail_rate=1.0, fail_status=503)
+    gemini = client(url, max_retries=2)
+    with pytest.raises(GeminiError) as error:
+        gemini.generate(PAYLOAD)
+    assert error.value.status_code == 503
+    assert error.value.attempts == 3
+    assert handler.requests_served == 3
+    assert gemini.stats()["errors"] == 1
+
+
+def test_client_error_is_not_retried(stub):
+    handler, url = stub(fail_first=1, fail_status=400)
+    with pytest.raises(GeminiError) as error:
+        client(url).generate(PAYLOAD)
+    assert error.value.status_code == 400 and error.value.attempts == 1
+    assert handler.requests_served == 1
+
+
+def test_read_timeout(stub):
+    handler, url = stub(latency=1.0)
+    gemini = client(url, read_timeout=0.2, max_retries=0)
+    start = time.perf_counter()
+    with pytest.raises(GeminiError, match="réseau"):
+        gemini.generate(PAYLOAD)
+    assert time.perf_counter() - start < 0.9
+
+
+def test_stream_assembles_sse_chunks(stub):
+    handler, url = stub(chunks=4, latency=0.04)
+    gemini = client(url)
+    chunks = list(gemini.stream(PAYLOAD))
+    assert len(chunks) > 1
+    assert "".join(chunks) == STUB_ANSWER
+    assert gemini.stats()["calls"] == 1 and gemini.stats()["errors"] == 0
+
+
+def test_stream_retries_before_first_chunk(stub):
+    handler, url = stub(fail_first=1, fail_status=503)
+    assert "".join(client(url).stream(PAYLOAD)) == STUB_ANSWER
+    assert handler.requests_served == 2
+
+
+def test_connections_are_reused(stub):
+    handler, url = stub()
+    gemini = client(url)
+    for _ in range(5):
+        assert gemini.generate(PAYLOAD) == STUB_ANSWER
+    assert "".join(gemini.stream(PAYLOAD)) == STUB_ANSWER
+    assert gemini.generate(PAYLOAD) == STUB_ANSWER
+    assert handler.requests_served == 7
+    assert handler.connections == 1
+
+
+BLOCKED = json.dumps({"promptFeedback": {"blockReason": "SAFETY"}})
+
+
+@pytest.mark.parametrize("body, message", [(BLOCKED, "sans texte"), ("<html>pas du json", "illisible"),
+                                           (json.dumps({"candidates": []}), "sans texte"),
+                                           (json.dumps(["liste"]), "inattendue")])
+def test_malformed_response_raises_gemini_error(stub, body, message):
+    handler, url = stub(body=body)
+    gemini = client(url)
+    with pytest.raises(GeminiError, match=message) as error:
+        gemini.generate(PAYLOAD)
+    assert error.value.status_code == 200 and body[:20] in str(error.value)
+    with pytest.raises(GeminiError, match=message):
+        list(gemini.stream(PAYLOAD))
+    assert gemini.stats()["errors"] == 2
+
+
+def test_backend_turns_malformed_response_into_llm_error(stub):
+    handler, url = stub(body=BLOCKED)
+    backend = GeminiBackend("stub", "gemini-test")
+    backend.client = client(url)
+    with pytest.raises(LLMError):
+        backend.generate("Question ?", ["contexte"])
+    with pytest.raises(LLMError):
+        list(backend.stream("Question ?", ["contexte"]))
@@ -0,0 +1,83 @@
+# test_user_store.py - Recherche plein texte et pagination de l'historique
+
+import json
+import os
+
+import pytest
+
+import user_store
+from user_store import UserStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UserStore(str(tmp_path / "users.sqlite"), legacy_file=None)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("username", ["alice", "___", "@@", "jean-marc.d"])
+def test_search_any_username(store, username):
+    store.add_consultation(username, "J'ai de la Fièvre", "Repos", ["s1"])
+    store.add_consultation(username, "Toux sèche", "Sirop", [])
+    store.add_consultation("autre", "fièvre aussi", "x", [])
+    items, total = store.search_history(username, "fievre")
+    assert total == 1 and items[0]["question"] == "J'ai de la Fièvre"
+    assert store.search_history(username, "fiè")[1] == 1
+
+
+def test_pagination_and_sort(store):
+    for i in range(25):
+        store.add_consultation("alice", f"question {i}", "réponse", [])
+    items, total = store.search_history("alice", page=1, page_size=10)
+    assert total == 25 and [h["question"] for h in items] == [f"question {i}" for i in range(14, 4, -1)]
+    items, _ = store.search_history("alice", sort="oldest", page=2, page_size=10)
+    assert [h["question"] for h in items] == [f"question {i}" for i in range(20, 25)]
+    with pytest.raises(ValueError):
+        store.search_history("alice", sort="inconnu")
+
+
+def test_index_follows_deletions(store):
+    store.add_consultation("alice", "migraine", "repos", [])
+    store.clear_history("alice")
+    assert store.search_history("alice", "migraine") == ([], 0)
+    store.add_consultation("bob", "migraine", "repos", [])
+    store.delete_user("bob")
+    assert store.db.execute("SELECT COUNT(*) FROM history_fts WHERE history_fts MATCH 'migraine'").fetchone()[0] == 0
+
+
+def test_concurrent_json_migration(tmp_path, monkeypatch):
+    legacy = tmp_path / "users.json"
+    legacy.write_text(json.dumps({"alice": {"password": "x", "history": [{"question": "toux"}]}}), encoding="utf-8")
+    read = user_store.read_legacy_users
+
+    def read_then_renamed_elsewhere(path):
+        users = read(path)
+        os.replace(path, path + ".migrated")  # l'autre processus termine sa migration pendant la nôtre
+        return users
+
+    monkeypatch.setattr(user_store, "read_legacy_users", read_then_renamed_elsewhere)
+    store = UserStore(str(tmp_path / "users.sqlite"), legacy_file=str(legacy))
+    assert store.search_history("alice")[1] == 1
+    assert not legacy.exists() and (tmp_path / "users.json.migrated").exists()
+    store.close()
+
+
+@pytest.mark.parametrize("content", [b"{\"alice\": ", b"[1, 2]"])
+def test_unreadable_json_is_kept(tmp_path, content):
+    legacy = tmp_path / "users.json"
+    legacy.write_bytes(content)
+    store = UserStore(str(tmp_path / "users.sqlite"), legacy_file=str(legacy))
+    assert legacy.read_bytes() == content and not (tmp_path / "users.json.migrated").exists()
+    with pytest.raises(ValueError):
+        store.migrate_json(str(legacy))
+    assert legacy.exists()
+    store.close()
+
+
+def test_latin1_json_is_imported(tmp_path):
+    legacy = tmp_path / "users.json"
+    legacy.write_bytes(json.dumps({"zoé": {"password": "x"}}, ensure_ascii=False).encode("latin-1"))
+    store = UserStore(str(tmp_path / "users.sqlite"), legacy_file=str(legacy))
+    assert store.get_user("zoé") is not None and not legacy.exists()
+    store.close()
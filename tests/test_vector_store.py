@@ -0,0 +1,135 @@
+# test_vector_store.py - Chroma et NumPy : même corpus, mêmes résultats
+
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+
+from vector_store import ChromaVectorStore, NumpyVectorStore
+
+DIM = 32
+TOP_K = 5
+DISTANCE_TOLERANCE = 1e-4
+
+
+def _corpus(n, seed=0, prefix="doc"):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    ids = [f"{prefix}{i}" for i in range(n)]
+    return ids, vectors, [f"texte {i}" for i in ids], [{"title": i} for i in ids]
+
+
+def _queries(n, seed=1):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32).tolist()
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # manifeste de Chroma (chemin relatif de config.py)
+    chroma = ChromaVectorStore(path=str(tmp_path / "chroma"), collection_name="test")
+    numpy_store = NumpyVectorStore(path=str(tmp_path / "numpy"), dtype="float32", space="cosine",
+                                   quantization="none")
+    pair = (chroma, numpy_store)
+    for store in pair:
+        store.upsert(*_corpus(200))
+    yield pair
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+
+
+def _directions(embeddings):
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def assert_same_results(stores, queries, n_results=TOP_K):
+    chroma, numpy_store = (store.query(queries, n_results=n_results) for store in stores)
+    assert chroma["ids"] == numpy_store["ids"]
+    assert chroma["documents"] == numpy_store["documents"]
+    assert chroma["metadatas"] == numpy_store["metadatas"]
+    np.testing.assert_allclose(np.asarray(chroma["distances"]), np.asarray(numpy_store["distances"]),
+                               atol=DISTANCE_TOLERANCE)
+    # En cosinus, le stockage NumPy renvoie les vecteurs normalisés : seule la direction est comparée
+    np.testing.assert_allclose(_directions(chroma["embeddings"]), _directions(numpy_store["embeddings"]),
+                               atol=DISTANCE_TOLERANCE)
+    return numpy_store
+
+
+def test_count(stores):
+    assert [store.count() for store in stores] == [200, 200]
+
+
+def test_query_single(stores):
+    result = assert_same_results(stores, _queries(1))
+    assert len(result["ids"]) == 1 and len(result["ids"][0]) == TOP_K
+
+
+def test_query_batch(stores):
+    result = assert_same_results(stores, _queries(8))
+    assert len(result["ids"]) == 8
+
+
+def test_query_exact_match_first(stores):
+    _, vectors, _, _ = _corpus(200)
+    result = assert_same_results(stores, vectors[[3, 42]].tolist())
+    assert [ids[0] for ids in result["ids"]] == ["doc3", "doc42"]
+
+
+def test_upsert_overwrites(stores):
+    _, vectors, _, _ = _corpus(200)
+    for store in stores:
+        store.upsert(["doc0"], vectors[[7]], ["remplacé"], [{"title": "remplacé"}])
+    assert [store.count() for store in stores] == [200, 200]
+    result = assert_same_results(stores, vectors[[7]].tolist(), n_results=2)
+    assert set(result["ids"][0]) == {"doc0", "doc7"}
+    assert "remplacé" in result["documents"][0]
+
+
+def test_delete(stores):
+    deleted = [f"doc{i}" for i in range(0, 200, 2)]
+    for store in stores:
+        store.delete(deleted)
+        store.delete(["absent"])
+    assert [store.count() for store in stores] == [100, 100]
+    result = assert_same_results(stores, _queries(10))
+    assert not set(deleted) & {i for ids in result["ids"] for i in ids}
+
+
+def test_free_rows_reused(stores):
+    _, numpy_store = stores
+    size = numpy_store._size
+    deleted = [f"doc{i}" for i in range(50)]
+    new = _corpus(50, seed=5, prefix="new")
+    for store in stores:
+        store.delete(deleted)
+        store.upsert(*new)
+    assert numpy_store._size == size and not numpy_store._free
+    assert [store.count() for store in stores] == [200, 200]
+    assert_same_results(stores, new[1][:10].tolist())
+    assert_same_results(stores, _queries(10))
+
+
+def test_reset(stores):
+    for store in stores:
+        store.reset()
+    assert [store.count() for store in stores] == [0, 0]
+    for store in stores:
+        assert store.query(_queries(2), n_results=TOP_K)["ids"] == [[], []]
+        store.upsert(*_corpus(20, seed=3))
+    assert_same_results(stores, _queries(4))
+
+
+def test_int8_first_pass_l2(tmp_path):
+    ids, vectors, documents, metadatas = _corpus(200)
+    vectors *= np.random.default_rng(2).uniform(0.2, 5.0, size=(200, 1)).astype(np.float32)  # normes variées
+    exact, int8 = (NumpyVectorStore(path=str(tmp_path / quantization), dtype="float32", space="l2",
+                                    quantization=quantization, rescore=10) for quantization in ("none", "int8"))
+    for store in (exact, int8):
+        store.upsert(ids, vectors, documents, metadatas)
+    queries = _queries(20)
+    assert int8.query(queries, n_results=TOP_K)["ids"] == exact.query(queries, n_results=TOP_K)["ids"]
+
+
+def test_binary_rejects_l2(tmp_path):
+    with pytest.raises(ValueError, match="l2"):
+        NumpyVectorStore(path=str(tmp_path / "binary"), space="l2", quantization="binary")
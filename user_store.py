@@ -0,0 +1,650 @@
+# user_store.py - Comptes, historiques et maladies potentielles des utilisateurs (SQLite)
+
+"""
+Stockage des données utilisateur dans une base SQLite en mode WAL, à la
+place du fichier user_data/users.json réécrit en entier à chaque question.
+
+Trois tables : users (compte), history (une ligne par consultation) et
+potential_diseases (une ligne par symptôme relevé). Ajouter une consultation
+est une insertion, indépendante du nombre d'utilisateurs et de la longueur
+de l'historique.
+
+Toutes les écritures passent par un écrivain unique (WriteQueue) : les
+mutations concurrentes des sessions sont sérialisées, fusionnées quand
+elles se remplacent, et validées par lots (group commit). Les lectures
+utilisent une autre connexion et ne sont pas bloquées par les écritures (WAL).
+
+Les lectures passent par un cache du processus (UserCache) : une page
+Streamlit relancée sans changement ne lit plus la base. Après validation,
+l'écrivain invalide les utilisateurs touchés par le lot. Les écritures d'un
+autre processus (autre instance de l'application, migration en ligne de
+commande) sont détectées par PRAGMA data_version, lu dans la mémoire partagée
+du WAL sans accès au fichier, puis par le compteur store_meta.generation que
+chaque lot incrémente : s'il ne correspond pas au dernier lot de ce processus,
+tout le cache est vidé.
+
+La recherche dans l'historique utilise un index plein texte FTS5 (accents
+et casse ignorés), tenu à jour par des déclencheurs SQL ; le tri, le
+classement par pertinence (bm25) et la pagination sont faits par SQLite.
+
+Au premier démarrage, un users.json existant est importé en une transaction
+puis renommé en users.json.migrated. Migration manuelle :
+
+    python user_store.py migrate --file user_data/users.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from config import USER_DB_FILE, USERS_FILE, USER_WRITE_BATCH_MAX, USER_WRITE_MAX_WAIT_MS, HISTORY_PAGE_SIZE
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    language TEXT NOT NULL DEFAULT 'fr'
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    sources TEXT NOT NULL DEFAULT '[]',
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_user ON history(username, timestamp);
+CREATE TABLE IF NOT EXISTS potential_diseases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    symptom_question TEXT NOT NULL,
+    suggested_answer TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS potential_diseases_user ON potential_diseases(username, date);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('generation', 0);
+"""
+
+# Index plein texte de l'historique : contenu externe (table history), la colonne
+# username restreint la recherche à un utilisateur dans l'index lui-même
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    username, question, answer,
+    content='history', content_rowid='id',
+    prefix='2 3',
+    tokenize="unicode61 remove_diacritics 2"
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, username, question, answer)
+    VALUES (new.id, new.username, new.question, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, username, question, answer)
+    VALUES ('delete', old.id, old.username, old.question, old.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, username, question, answer)
+    VALUES ('delete', old.id, old.username, old.question, old.answer);
+    INSERT INTO history_fts (rowid, username, question, answer)
+    VALUES (new.id, new.username, new.question, new.answer);
+END;
+"""
+
+HISTORY_SORTS = ("newest", "oldest", "relevance")
+_HISTORY_COLUMNS = "h.id, h.question, h.answer, h.sources, h.timestamp"
+
+ACCOUNT_FIELDS = ("password", "language")
+
+
+def _now():
+    return str(datetime.now())
+
+
+def read_legacy_users(path=USERS_FILE):
+    """Contenu de l'ancien users.json (plusieurs encodages essayés), {} s'il est absent.
+
+    Lève ValueError si le fichier ne peut pas être lu comme un objet JSON :
+    il ne doit alors être ni importé à vide ni renommé.
+    """
+    for encoding in ["utf-8", "latin-1", "ISO-8859-1", "cp1252"]:
+        try:
+            with open(path, "r", encoding=encoding) as f:
+                users = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            continue
+        if not isinstance(users, dict):
+            raise ValueError(f"{path} : objet JSON attendu, {type(users).__name__} trouvé.")
+        return users
+    raise ValueError(f"{path} illisible (JSON invalide ou encodage inconnu) ; "
+                     f"le corriger avec fix_encoding.py puis relancer : python user_store.py migrate")
+
+
+def fts_query(text):
+    """Requête FTS5 à partir d'une saisie libre : tous les mots, le dernier en préfixe (saisie en cours)"""
+    words = [f'"{word}"' for word in re.findall(r"\w+", text)]
+    if words:
+        words[-1] += "*"
+    return " ".join(words)
+
+
+def _quote(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def connect(path):
+    db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # suffisant en WAL : pas de corruption en cas de crash
+    db.execute("PRAGMA foreign_keys=ON")
+    return db
+
+
+def _follow(done, future):
+    """Une mutation remplacée réussit ou échoue comme celle qui la remplace"""
+    error = done.exception()
+    future.set_exception(error) if error else future.set_result(None)
+
+
+class UserCache:
+    """Cache en mémoire des lectures, par utilisateur, sûr entre threads.
+
+    Les entrées d'un utilisateur sont rangées par type de lecture (compte,
+    statistiques, historique...) ; la clé None regroupe les valeurs globales
+    (nombre de comptes). Les valeurs renvoyées sont partagées : ne pas les
+    modifier. Un chargement lancé avant une invalidation n'est pas conservé.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.resets = 0
+        self.generation = None  # dernier lot reflété par le cache
+        self._entries = {}
+        self._versions = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, username, kind, load):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and kind in entry:
+                self.hits += 1
+                return entry[kind]
+            self.misses += 1
+            version = (self._epoch, self._versions.get(username, 0))
+        value = load()
+        with self._lock:
+            if (self._epoch, self._versions.get(username, 0)) == version:
+                self._entries.setdefault(username, {})[kind] = value
+        return value
+
+    def invalidate(self, usernames):
+        with self._lock:
+            for username in usernames:
+                self._entries.pop(username, None)
+                self._versions[username] = self._versions.get(username, 0) + 1
+                self.invalidations += 1
+
+    def _reset(self):
+        self._entries.clear()
+        self._versions.clear()
+        self._epoch += 1
+        self.resets += 1
+
+    def committed(self, before, after, usernames):
+        """Lot validé par l'écrivain : `before` et `after` encadrent sa génération"""
+        with self._lock:
+            if self.generation is not None and before != self.generation and after != self.generation:
+                self._reset()  # un autre processus a écrit depuis notre dernier lot
+            self.generation = after
+        self.invalidate(usernames)
+
+    def sync(self, generation):
+        """La base a changé : vide le cache si ce n'est pas par nos propres lots"""
+        with self._lock:
+            if self.generation is not None and generation != self.generation:
+                self._reset()
+            self.generation = generation
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": sum(len(entry) for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "invalidations": self.invalidations,
+                "resets": self.resets
+            }
+
+
+class WriteQueue:
+    """Écrivain unique d'une base SQLite : les mutations concurrentes sont appliquées par lots.
+
+    Une mutation est une fonction (connexion) -> résultat. Le thread écrivain
+    prend toutes les mutations en attente (au plus `max_batch`) et les applique
+    dans une seule transaction (group commit). Chacune a son point de
+    sauvegarde : une mutation en échec est annulée seule. Dans un même lot,
+    une mutation est abandonnée si une suivante a la même clé de fusion (elle
+    la remplace, ex. deux changements de langue). Comme EmbeddingBatcher, le
+    thread n'attend `max_wait_ms` pour compléter un lot que sous charge.
+
+    Chaque lot incrémente store_meta.generation ; `on_commit(avant, après,
+    utilisateurs touchés)` est appelé après validation, avant que les
+    appelants ne soient débloqués.
+    """
+
+    def __init__(self, path, max_batch=USER_WRITE_BATCH_MAX, max_wait_ms=USER_WRITE_MAX_WAIT_MS, on_commit=None):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.on_commit = on_commit
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="user-store-writer", daemon=True)
+        self._thread.start()
+        self.batches = 0
+        self.items = 0
+        self.coalesced = 0
+        self.largest = 0
+
+    def submit(self, mutation, key=None, users=()):
+        future = Future()
+        self._queue.put((mutation, key, tuple(users), future))
+        return future
+
+    def execute(self, mutation, key=None, users=()):
+        """Applique une mutation et attend sa validation ; renvoie son résultat"""
+        return self.submit(mutation, key, users).result()
+
+    def _collect(self, first, wait):
+        batch = [first]
+        deadline = time.perf_counter() + wait
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is None:  # arrêt demandé : on termine ce lot d'abord
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    @staticmethod
+    def _coalesce(batch):
+        """(mutations à appliquer, mutations remplacées -> mutation qui les remplace)"""
+        last = {key: i for i, (_, key, _, _) in enumerate(batch) if key is not None}
+        kept, replaced = [], []
+        for i, item in enumerate(batch):
+            if item[1] is not None and last[item[1]] != i:
+                replaced.append((item, batch[last[item[1]]]))
+            else:
+                kept.append(item)
+        return kept, replaced
+
+    def _apply(self, db, batch):
+        """(résultats, (génération avant, après) ou None si le lot est annulé)"""
+        results = []
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            before = db.execute("SELECT value FROM store_meta WHERE key = 'generation'").fetchone()[0]
+            db.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'generation'")
+            for mutation, _, _, _ in batch:
+                db.execute("SAVEPOINT mutation")
+                try:
+                    results.append((True, mutation(db)))
+                except Exception as e:
+                    db.execute("ROLLBACK TO mutation")
+                    results.append((False, e))
+                db.execute("RELEASE mutation")
+            db.execute("COMMIT")
+        except Exception as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            return [(False, e)] * len(batch), None
+        return results, (before, before + 1)
+
+    def _run(self):
+        db = connect(self.path)
+        previous = 1
+        while True:
+            first = self._queue.get()
+            if first is None:
+                db.close()
+                return
+            batch = self._collect(first, self.max_wait if previous > 1 else 0.0)
+            kept, replaced = self._coalesce(batch)
+            with metrics.span("user_store_commit"):
+                results, generations = self._apply(db, kept)
+            if generations and self.on_commit is not None:
+                self.on_commit(*generations, {user for _, _, users, _ in batch for user in users})
+            for (_, _, _, future), (ok, value) in zip(kept, results):
+                future.set_result(value) if ok else future.set_exception(value)
+            for (_, _, _, future), (_, _, _, winner) in replaced:
+                winner.add_done_callback(lambda done, future=future: _follow(done, future))
+            previous = len(batch)
+            self.batches += 1
+            self.items += len(batch)
+            self.coalesced += len(replaced)
+            self.largest = max(self.largest, len(batch))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "coalesced": self.coalesced,
+            "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest
+        }
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class UserStore:
+    def __init__(self, path=USER_DB_FILE, legacy_file=USERS_FILE, **writer_options):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data_version = None
+        self.cache = UserCache()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = connect(path)
+        self.db.executescript(SCHEMA)
+        self.writer = WriteQueue(path, on_commit=self.cache.committed, **writer_options)
+        self.fts = self._create_fts()
+
+        if legacy_file and os.path.exists(legacy_file):
+            try:
+                self.migrate_json(legacy_file)
+            except ValueError as e:
+                # Fichier laissé en place : l'import sera retenté au prochain démarrage
+                logger.error(f"❌ Comptes de {legacy_file} NON importés : {e}")
+
+    def _create_fts(self):
+        """Crée l'index plein texte et y importe l'historique existant ; False si SQLite n'a pas FTS5"""
+        try:
+            self.db.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ FTS5 indisponible ({e}) : recherche dans l'historique sans index.")
+            return False
+
+        def backfill(db):
+            if db.execute("SELECT 1 FROM store_meta WHERE key = 'history_fts'").fetchone():
+                return False
+            db.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+            db.execute("INSERT INTO store_meta (key, value) VALUES ('history_fts', 1)")
+            return True
+
+        if self.writer.execute(backfill):
+            logger.info("🔎 Index plein texte de l'historique construit.")
+        return True
+
+    # --- Migration ------------------------------------------------------------------
+
+    def migrate_json(self, path=USERS_FILE, rename=True):
+        """Importe un users.json en une transaction ; les comptes déjà présents sont conservés.
+
+        Le fichier n'est renommé qu'après un import réussi (ValueError s'il est illisible).
+        """
+        users = read_legacy_users(path)
+
+        def migrate(db):
+            imported = 0
+            for username, data in users.items():
+                created = db.execute(
+                    "INSERT OR IGNORE INTO users (username, password, created_at, language) VALUES (?, ?, ?, ?)",
+                    (username, data.get("password", ""), data.get("created_at") or _now(),
+                     data.get("language", "fr"))).rowcount
+                if not created:
+                    continue
+                imported += 1
+                db.executemany(
+                    "INSERT INTO history (username, question, answer, sources, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    [(username, item.get("question", ""), item.get("answer", ""),
+                      json.dumps(item.get("sources", []), ensure_ascii=False), item.get("timestamp") or _now())
+                     for item in data.get("history", [])])
+                db.executemany(
+                    "INSERT INTO potential_diseases (username, symptom_question, suggested_answer, date) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(username, item.get("symptom_question", ""), item.get("suggested_answer", ""),
+                      item.get("date") or _now())
+                     for item in data.get("potential_diseases", [])])
+            return imported
+
+        imported = self.writer.execute(migrate, users=[*users, None])
+        if rename:
+            try:
+                os.replace(path, path + ".migrated")
+            except FileNotFoundError:
+                # Démarrage simultané : un autre processus a importé et renommé le fichier (import idempotent)
+                logger.info(f"ℹ️ {path} déjà migré par un autre processus.")
+        logger.info(f"📦 {imported} compte(s) importé(s) depuis {path} vers {self.path}.")
+        return imported
+
+    # --- Lectures ---------------------------------------------------------------------
+
+    def _read(self, username, kind, query):
+        """Lecture via le cache ; `query(connexion)` n'est appelée qu'en cas d'absence"""
+        with self._lock:
+            data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self.cache.sync(self.db.execute(
+                    "SELECT value FROM store_meta WHERE key = 'generation'").fetchone()[0])
+
+        def load():
+            with self._lock:
+                return query(self.db)
+
+        return self.cache.get(username, kind, load)
+
+    # --- Comptes --------------------------------------------------------------------
+
+    def get_user(self, username):
+        """Compte (password, created_at, language) ou None"""
+        def query(db):
+            row = db.execute("SELECT password, created_at, language FROM users WHERE username = ?",
+                             (username,)).fetchone()
+            return dict(row) if row else None
+
+        return self._read(username, "account", query)
+
+    def create_user(self, username, password="", language="fr", created_at=None):
+        """Crée le compte ; False s'il existe déjà"""
+        row = (username, password, created_at or _now(), language)
+        return self.writer.execute(lambda db: db.execute(
+            "INSERT OR IGNORE INTO users (username, password, created_at, language) VALUES (?, ?, ?, ?)",
+            row).rowcount == 1, users=(username, None))
+
+    def update_user(self, username, **fields):
+        unknown = set(fields) - set(ACCOUNT_FIELDS)
+        if unknown:
+            raise ValueError(f"Champs de compte inconnus : {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        values = (*fields.values(), username)
+        self.writer.execute(lambda db: db.execute(f"UPDATE users SET {assignments} WHERE username = ?", values),
+                            key=("update_user", username, tuple(sorted(fields))), users=(username,))
+
+    def delete_user(self, username):
+        """Supprime le compte, son historique et ses maladies potentielles"""
+        self.writer.execute(lambda db: db.execute("DELETE FROM users WHERE username = ?", (username,)),
+                            key=("delete_user", username), users=(username, None))
+
+    def count_users(self):
+        return self._read(None, "count", lambda db: db.execute("SELECT COUNT(*) FROM users").fetchone()[0])
+
+    def user_stats(self, username):
+        """Nombre de questions, de symptômes analysés et date de la dernière consultation"""
+        def query(db):
+            questions, last = db.execute(
+                "SELECT COUNT(*), MAX(timestamp) FROM history WHERE username = ?", (username,)).fetchone()
+            diseases = db.execute(
+                "SELECT COUNT(*) FROM potential_diseases WHERE username = ?", (username,)).fetchone()[0]
+            return {"questions": questions, "potential_diseases": diseases, "last_consultation": last}
+
+        return self._read(username, "stats", query)
+
+    # --- Historique et maladies potentielles ----------------------------------------
+
+    def add_consultation(self, username, question, answer, sources, potential_disease=False):
+        """Ajoute une consultation (et le symptôme relevé) en une transaction"""
+        now = _now()
+        sources = json.dumps(list(sources), ensure_ascii=False)
+
+        def add(db):
+            db.execute("INSERT OR IGNORE INTO users (username, created_at) VALUES (?, ?)", (username, now))
+            db.execute("INSERT INTO history (username, question, answer, sources, timestamp) VALUES (?, ?, ?, ?, ?)",
+                       (username, question, answer, sources, now))
+            if potential_disease:
+                db.execute("INSERT INTO potential_diseases (username, symptom_question, suggested_answer, date) "
+                           "VALUES (?, ?, ?, ?)", (username, question, answer, now))
+
+        self.writer.execute(add, users=(username, None))
+
+    def history(self, username, newest_first=True):
+        order = "DESC" if newest_first else "ASC"
+
+        def query(db):
+            rows = db.execute(
+                "SELECT id, question, answer, sources, timestamp FROM history WHERE username = ? "
+                f"ORDER BY timestamp {order}, id {order}", (username,)).fetchall()
+            return [dict(row, sources=json.loads(row["sources"])) for row in rows]
+
+        return self._read(username, ("history", order), query)
+
+    def search_history(self, username, text="", sort="newest", page=0, page_size=HISTORY_PAGE_SIZE):
+        """Une page de l'historique, filtrée par mots-clés ; renvoie (consultations, nombre total).
+
+        `sort` : "newest", "oldest" ou "relevance" (bm25, la question pesant
+        double ; plus récentes d'abord sans mots-clés). Les pages sans
+        mots-clés passent par le cache.
+        """
+        if sort not in HISTORY_SORTS:
+            raise ValueError(f"Tri inconnu : {sort} (disponibles : {', '.join(HISTORY_SORTS)})")
+        order = "h.timestamp ASC, h.id ASC" if sort == "oldest" else "h.timestamp DESC, h.id DESC"
+        text = text.strip()
+
+        if not text:
+            source, where, params = "history h", "h.username = ?", [username]
+        elif self.fts:
+            query = fts_query(text)
+            if not query:
+                return [], 0
+            # CROSS JOIN : l'index plein texte pilote la jointure (sinon la recherche est rejouée par ligne)
+            source = "history_fts CROSS JOIN history h ON h.id = history_fts.rowid"
+            where = "history_fts MATCH ? AND h.username = ?"
+            match = f"{{question answer}} : ({query})"
+            # Un nom sans lettre ni chiffre ne produit aucun token unicode61 ("_" est un séparateur) :
+            # la jointure sur h.username filtre seule
+            if re.search(r"[^\W_]", username):
+                match = f"username : {_quote(username)} AND {match}"
+            params = [match, username]
+            if sort == "relevance":
+                order = "bm25(history_fts, 0.0, 2.0, 1.0), " + order
+        else:
+            source = "history h"
+            where = "h.username = ? AND (instr(lower(h.question), ?) OR instr(lower(h.answer), ?))"
+            params = [username, text.lower(), text.lower()]
+
+        def run(db):
+            total = db.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+            rows = db.execute(f"SELECT {_HISTORY_COLUMNS} FROM {source} WHERE {where} ORDER BY {order} "
+                              "LIMIT ? OFFSET ?", (*params, page_size, page * page_size)).fetchall()
+            return [dict(row, sources=json.loads(row["sources"])) for row in rows], total
+
+        if text:
+            with self._lock:
+                return run(self.db)
+        return self._read(username, ("history_page", sort, page, page_size), run)
+
+    def clear_history(self, username):
+        self.writer.execute(lambda db: db.execute("DELETE FROM history WHERE username = ?", (username,)),
+                            key=("clear_history", username), users=(username,))
+
+    def potential_diseases(self, username, newest_first=True):
+        order = "DESC" if newest_first else "ASC"
+
+        def query(db):
+            rows = db.execute(
+                "SELECT id, symptom_question, suggested_answer, date FROM potential_diseases WHERE username = ? "
+                f"ORDER BY date {order}, id {order}", (username,)).fetchall()
+            return [dict(row) for row in rows]
+
+        return self._read(username, ("potential_diseases", order), query)
+
+    def delete_potential_disease(self, username, disease_id):
+        self.writer.execute(lambda db: db.execute(
+            "DELETE FROM potential_diseases WHERE username = ? AND id = ?", (username, disease_id)),
+            key=("delete_potential_disease", username, disease_id), users=(username,))
+
+    def clear_potential_diseases(self, username):
+        self.writer.execute(lambda db: db.execute("DELETE FROM potential_diseases WHERE username = ?", (username,)),
+                            key=("clear_potential_diseases", username), users=(username,))
+
+    def close(self):
+        self.writer.close()
+        with self._lock:
+            self.db.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_user_store():
+    """Instance partagée par toutes les sessions du processus"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UserStore()
+            metrics.register_collector("user_store", lambda: {
+                **{f"user_writes_{k}": v for k, v in _store.writer.stats().items()},
+                **{f"user_cache_{k}": v for k, v in _store.cache.stats().items()}
+            })
+        return _store
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Base des utilisateurs de MedAi")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--file", default=USERS_FILE, help="Ancien fichier users.json à importer")
+    parser.add_argument("--keep", action="store_true", help="Ne pas renommer le fichier importé")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        raise SystemExit(f"❌ Fichier {args.file} introuvable.")
+    store = UserStore(legacy_file=None)
+    try:
+        store.migrate_json(args.file, rename=not args.keep)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    finally:
+        store.close()
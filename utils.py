@@ -1,86 +1,34 @@
 # utils.py - Fonctions utilitaires partagées pour l'application 
 
 import streamlit as st
-import json
-import os
 from datetime import datetime
-from fpdf import FPDF
 import base64
+# fpdf est importé dans les fonctions d'export : il n'est chargé qu'au premier PDF demandé
 
-# Chemins de stockage local
-USER_DATA_DIR = "user_data"
-USERS_FILE = os.path.join(USER_DATA_DIR, "users.json")
-os.makedirs(USER_DATA_DIR, exist_ok=True)
+from config import EMBEDDING_MODEL, LLM_BACKEND, MEDAI_ADMINS
+from corpus_stats import get_corpus_stats
+from user_store import get_user_store
+from llm_backends import label_for
+import metrics
 
-# Charger les utilisateurs
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    
-    # Essayer différents encodages
-    encodings = ['utf-8', 'latin-1', 'ISO-8859-1', 'cp1252']
-    for encoding in encodings:
-        try:
-            with open(USERS_FILE, "r", encoding=encoding) as f:
-                return json.load(f)
-        except UnicodeDecodeError:
-            continue
-        except json.JSONDecodeError:
-            break
-    
-    # Si rien ne fonctionne, créer un nouveau fichier vide
-    return {}
-
-# Sauvegarder les utilisateurs
-def save_users(users):
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=2, ensure_ascii=False)
-
-# Charger ou créer un profil utilisateur
+# Charger ou créer un profil utilisateur (compte : password, created_at, language)
 def get_user_profile(username):
-    users = load_users()
-    if username in users:
-        return users[username]
-    else:
-        users[username] = {
-            "password": "",
-            "created_at": str(datetime.now()),
-            "history": [],
-            "potential_diseases": [],
-            "language": "fr"
-        }
-        save_users(users)
-        return users[username]
+    store = get_user_store()
+    profile = store.get_user(username)
+    if profile is None:
+        store.create_user(username)
+        profile = store.get_user(username)
+    return profile
 
 # Mettre à jour l'historique utilisateur
 def update_user_history(username, question, answer, sources):
-    users = load_users()
-    user = users.get(username, {"history": [], "potential_diseases": []})
-
-    user["history"].append({
-        "question": question,
-        "answer": answer,
-        "sources": sources,
-        "timestamp": str(datetime.now())
-    })
-
     keywords = ["maladie", "symptôme", "tête", "ventre", "diabète", "hypertension", "fièvre", "douleur"]
-    
-    if any(k in question.lower() for k in keywords):
-        if "potential_diseases" not in user:
-            user["potential_diseases"] = []
-
-        user["potential_diseases"].append({
-            "symptom_question": question,
-            "suggested_answer": answer,
-            "date": str(datetime.now())
-        })
-    
-    users[username] = user
-    save_users(users)
+    potential_disease = any(k in question.lower() for k in keywords)
+    get_user_store().add_consultation(username, question, answer, sources, potential_disease)
 
 # Créer un PDF de la réponse médicale
 def create_medical_pdf(question, answer, sources):
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -121,6 +69,7 @@ def export_to_pdf(question, answer, sources):
     return href
 
 def create_full_history_pdf(history, username):
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -158,6 +107,7 @@ def export_full_history_pdf(history, username):
 
 # Fonction pour exporter le PDF d'une maladie potentielle
 def export_potential_disease_pdf(question, answer):
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -186,6 +136,7 @@ def export_disease_pdf(question, answer):
 
 # Export all diseases to PDF
 def create_all_diseases_pdf(diseases):
+    from fpdf import FPDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -245,31 +196,27 @@ def show_user_sidebar(username):
     profile = get_user_profile(username)
     
     st.sidebar.header("📊 À propos du Modèle")
-    # Statistiques sur les données médicales
-    try:
-        # Nombre de maladies (fichiers dans nhs_condition_details)
-        nb_maladies = len(os.listdir("data/raw/nhs_condition_details"))
-    except Exception:
-        nb_maladies = "?"
+    # Statistiques sur les données médicales (recalculées seulement quand le corpus ou l'index change)
     try:
-        # Nombre de documents médicaux
-        nb_docs = sum(1 for _ in open("data/raw/medical_data.jsonl", encoding="utf-8"))
+        corpus = get_corpus_stats().snapshot()
     except Exception:
-        nb_docs = "?"
+        corpus = {}
+    nb_maladies = "?" if corpus.get("conditions") is None else corpus["conditions"]
+    nb_docs = "?" if corpus.get("documents") is None else corpus["documents"]
+    passages = f" ({corpus['passages']} passages)" if corpus.get("passages") else ""
     try:
-        # Nombre d'utilisateurs
-        users = load_users()
-        nb_users = len(users)
+        # Nombre d'utilisateurs (servi par le cache du stockage utilisateur)
+        nb_users = get_user_store().count_users()
     except Exception:
         nb_users = "?"
         
     st.sidebar.markdown(f"""
     <div style='background:#e9f7fe;padding:12px 18px;border-radius:10px;margin-bottom:10px;'>
     <b>📚 Maladies référencées :</b> {nb_maladies}<br>
-    <b>📄 Documents médicaux :</b> {nb_docs}<br>
+    <b>📄 Documents médicaux :</b> {nb_docs}{passages}<br>
     <b>👥 Utilisateurs :</b> {nb_users}<br>
-    <b>🧠 Modèle d'embedding :</b> all-MiniLM-L6-v2<br>
-    <b>🤖 LLM utilisé :</b> Google Gemini Flash<br>
+    <b>🧠 Modèle d'embedding :</b> {EMBEDDING_MODEL}<br>
+    <b>🤖 LLM utilisé :</b> {label_for(LLM_BACKEND)}<br>
     </div>
     """, unsafe_allow_html=True)
     
@@ -283,18 +230,41 @@ def show_user_sidebar(username):
     st.sidebar.subheader("📊 Vos Statistiques")
     with st.sidebar.container():
         st.markdown("<div class='stats-box'>", unsafe_allow_html=True)
-        total_questions = len(profile["history"])
-        potential_diseases = len(profile.get("potential_diseases", []))
-        st.metric("Questions posées", total_questions)
-        st.metric("Symptômes analysés", potential_diseases)
-        if total_questions > 0:
-            last_consultation = profile["history"][-1]["timestamp"]
-            st.markdown(f"Dernière consultation: {last_consultation}")
+        stats = get_user_store().user_stats(username)
+        st.metric("Questions posées", stats["questions"])
+        st.metric("Symptômes analysés", stats["potential_diseases"])
+        if stats["questions"] > 0:
+            st.markdown(f"Dernière consultation: {stats['last_consultation']}")
         st.markdown("</div>", unsafe_allow_html=True)
     
+    show_metrics_panel(username)
+
     st.sidebar.markdown("---")
     if st.sidebar.button("🔓 Déconnexion", use_container_width=True):
         st.session_state.logged_in = False
         st.session_state.current_user = None
         st.success("👋 Vous avez été déconnecté.")
         st.switch_page("app.py")
+
+
+def show_metrics_panel(username):
+    """Panneau de latence par étape, réservé aux administrateurs (MEDAI_ADMINS)"""
+    if username not in MEDAI_ADMINS:
+        return
+    st.sidebar.markdown("---")
+    with st.sidebar.expander("📈 Métriques (admin)"):
+        rows = metrics.registry.snapshot()
+        if rows:
+            st.dataframe([{"étape": stage, **values} for stage, values in rows.items()],
+                         use_container_width=True, hide_index=True)
+        else:
+            st.write("Aucune mesure pour l'instant.")
+        sizes = metrics.registry.value_snapshot()
+        if sizes:
+            st.dataframe([{"mesure": name, **values} for name, values in sizes.items()],
+                         use_container_width=True, hide_index=True)
+        gauges = metrics.registry.gauges()
+        if gauges:
+            st.json(gauges, expanded=False)
+        st.download_button("📥 Export Prometheus", metrics.render_prometheus(),
+                           file_name="medai_metrics.prom", mime="text/plain")
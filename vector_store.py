@@ -0,0 +1,584 @@
+# vector_store.py - Stockage et recherche des vecteurs de passages
+
+"""
+Interface VectorStore et ses deux implémentations, choisies par VECTOR_STORE :
+
+- ChromaVectorStore ("chroma") : collection Chroma persistante, index HNSW ;
+- NumpyVectorStore ("numpy") : matrice float16 (ou int8 + échelle par ligne)
+  mappée en mémoire, table SQLite des passages, top-k exact par produit
+  scalaire vectorisé et argpartition. Sans aller-retour client ni graphe
+  HNSW en mémoire : plus rapide et bien plus léger pour un corpus de taille
+  moyenne. Pour les très grands corpus, VECTOR_QUANTIZATION ajoute une
+  première passe sur des codes binaires ou int8 suivie d'un re-classement
+  exact (cf. QuantizedCodes).
+
+Les deux ont la même sémantique de requête : résultats au format Chroma
+(listes par question de ids, documents, metadatas, embeddings, distances),
+triés par distance croissante, distance selon VECTOR_SPACE (cosine : 1 - cos,
+l2 : carré de la distance euclidienne, ip : 1 - produit scalaire).
+
+Les fonctions ci-dessous centralisent la création de la collection Chroma,
+pour que rag_pipeline, create_embeddings et les outils (benchmark,
+hnsw_tuner) utilisent la même métrique et les mêmes paramètres HNSW :
+
+- VECTOR_SPACE : "cosine" (défaut, vecteurs MiniLM normalisés), "l2" ou "ip" ;
+- HNSW_M : voisins par nœud du graphe (mémoire et rappel) ;
+- HNSW_EF_CONSTRUCTION : largeur de recherche à la construction (qualité du graphe) ;
+- HNSW_EF_SEARCH : largeur de recherche à la requête (rappel contre latence).
+
+La métrique, M et ef_construction sont figés à la création : les changer
+impose une reconstruction. ef_search se modifie sur une collection existante
+(pris en compte au prochain chargement de l'index par Chroma).
+Pour choisir les valeurs : `python hnsw_tuner.py`.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from config import (VECTOR_DB_PATH, COLLECTION_NAME, MANIFEST_FILE, VECTOR_STORE, VECTOR_SPACE, HNSW_M,
+                    HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, NUMPY_STORE_PATH, NUMPY_STORE_DTYPE,
+                    VECTOR_QUANTIZATION, VECTOR_RESCORE_CANDIDATES)
+from corpus import IndexManifest
+
+logger = logging.getLogger(__name__)
+
+BUILD_PARAMS = ("space", "max_neighbors", "ef_construction")
+
+
+def hnsw_config(space=VECTOR_SPACE, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH):
+    return {"space": space, "max_neighbors": m, "ef_construction": ef_construction, "ef_search": ef_search}
+
+
+def open_collection(client, name=COLLECTION_NAME, **params):
+    """Ouvre la collection, ou la crée avec la configuration HNSW voulue"""
+    return client.get_or_create_collection(name, configuration={"hnsw": hnsw_config(**params)})
+
+
+def recreate_collection(client, name=COLLECTION_NAME, **params):
+    """Supprime la collection (si elle existe) et la recrée vide"""
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass  # Collection inexistante
+    return open_collection(client, name, **params)
+
+
+def current_hnsw(collection):
+    configuration = getattr(collection, "configuration", None) or {}
+    return configuration.get("hnsw") or {}
+
+
+def needs_rebuild(collection, **params):
+    """Vrai si la collection a été construite avec une autre métrique, un autre M ou ef_construction"""
+    current, wanted = current_hnsw(collection), hnsw_config(**params)
+    return any(current.get(key) != wanted[key] for key in BUILD_PARAMS)
+
+
+def set_ef_search(collection, ef_search=HNSW_EF_SEARCH):
+    """Ajuste ef_search sans reconstruire l'index"""
+    if current_hnsw(collection).get("ef_search") != ef_search:
+        collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+
+
+def directory_size(path):
+    """Taille sur disque (octets) d'un répertoire de base vectorielle"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+# --- Implémentations ------------------------------------------------------------------
+
+class VectorStore:
+    name = "base"
+    manifest_path = MANIFEST_FILE
+
+    def count(self):
+        raise NotImplementedError
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results):
+        """Résultats au format Chroma, avec ids, documents, metadatas, embeddings et distances.
+
+        En métrique cosinus, les embeddings renvoyés peuvent être normalisés
+        (seule leur direction compte, cf. context_builder).
+        """
+        raise NotImplementedError
+
+    def needs_rebuild(self):
+        """Vrai si l'index existant a été construit avec d'autres paramètres"""
+        return False
+
+    def reset(self):
+        """Vide complètement le stockage.
+
+        Le manifeste est invalidé d'abord (aucun document, aucun modèle,
+        version suivante) : une reconstruction interrompue ne laisse pas un
+        manifeste « compatible » décrivant un index partiel.
+        """
+        previous = IndexManifest.load(self.manifest_path)
+        if os.path.exists(self.manifest_path):
+            IndexManifest(self.manifest_path, version=previous.version + 1).save()
+        self._clear()
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def disk_size(self):
+        raise NotImplementedError
+
+    def resident_size(self):
+        """Octets à garder en mémoire pour chercher (par défaut : tout le stockage)"""
+        return self.disk_size()
+
+
+class ChromaVectorStore(VectorStore):
+    name = "chroma"
+
+    def __init__(self, path=VECTOR_DB_PATH, collection_name=COLLECTION_NAME):
+        import chromadb
+        self.path = path
+        self.collection_name = collection_name
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = open_collection(self.client, collection_name)
+        set_ef_search(self.collection)
+
+    def count(self):
+        return self.collection.count()
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=list(ids), embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+                               documents=list(documents), metadatas=list(metadatas))
+
+    def delete(self, ids):
+        self.collection.delete(ids=list(ids))
+
+    def query(self, query_embeddings, n_results):
+        return self.collection.query(query_embeddings=[list(map(float, q)) for q in query_embeddings],
+                                     n_results=n_results,
+                                     include=["documents", "metadatas", "embeddings", "distances"])
+
+    def needs_rebuild(self):
+        return needs_rebuild(self.collection)
+
+    def _clear(self):
+        self.collection = recreate_collection(self.client, self.collection_name)
+
+    def disk_size(self):
+        return directory_size(self.path)
+
+
+def quantize_int8(vectors):
+    """Quantification symétrique par ligne : (codes int8, échelles float32)"""
+    scales = (np.clip(np.abs(vectors).max(axis=1), 1e-12, None) / 127).astype(np.float32)
+    return np.round(vectors / scales[:, np.newaxis]).astype(np.int8), scales
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits):
+    return np.bitwise_count(bits) if hasattr(np, "bitwise_count") else _POPCOUNT[bits]
+
+
+class QuantizedCodes:
+    """Codes compacts des vecteurs d'un NumpyVectorStore, pour une première passe sur tout le corpus.
+
+    - binary : signe de chaque dimension, 1 bit (48 octets par passage en 384
+      dimensions), comparé à la question par distance de Hamming ;
+    - int8 : 1 octet par dimension et une échelle par passage, produit
+      scalaire approché avec la question en float32.
+
+    Seuls ces codes sont parcourus à chaque requête ; les vecteurs complets ne
+    sont lus que pour les candidats à re-classer.
+    """
+
+    KINDS = ("binary", "int8")
+
+    def __init__(self, path, kind, dim):
+        if kind not in self.KINDS:
+            raise ValueError(f"Quantification inconnue : {kind} (disponibles : none, {', '.join(self.KINDS)})")
+        self.kind, self.dim = kind, dim
+        self.codes_file = os.path.join(path, f"codes_{kind}.bin")
+        self.scales_file = os.path.join(path, f"codes_{kind}_scales.bin")
+        self.width = -(-dim // 64) * 8 if kind == "binary" else dim  # bits groupés en mots de 64
+        self.dtype = np.dtype(np.uint8 if kind == "binary" else np.int8)
+        self.codes = self.scales = None
+
+    def capacity(self):
+        return os.path.getsize(self.codes_file) // self.width if os.path.exists(self.codes_file) else 0
+
+    def map(self, capacity):
+        files = [(self.codes_file, self.width)] + ([(self.scales_file, 4)] if self.kind == "int8" else [])
+        for path, row_bytes in files:
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self.codes = np.memmap(self.codes_file, dtype=self.dtype, mode="r+", shape=(capacity, self.width))
+        if self.kind == "int8":
+            self.scales = np.memmap(self.scales_file, dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def _bits(self, vectors):
+        bits = np.packbits(vectors > 0, axis=1)
+        return np.pad(bits, ((0, 0), (0, self.width - bits.shape[1])))
+
+    def write(self, rows, vectors):
+        if self.kind == "binary":
+            self.codes[rows] = self._bits(vectors)
+        else:
+            self.codes[rows], self.scales[rows] = quantize_int8(vectors)
+            self.scales.flush()
+        self.codes.flush()
+
+    def remove(self):
+        self.codes = self.scales = None
+        for path in (self.codes_file, self.scales_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def row_bytes(self):
+        return self.width + (4 if self.kind == "int8" else 0)
+
+    def scores(self, queries, start, end):
+        """Ressemblance approchée (plus grand = plus proche) des lignes [start, end) avec chaque question"""
+        if self.kind == "binary":
+            bits = self._bits(queries).view(np.uint64)
+            block = np.ascontiguousarray(self.codes[start:end]).view(np.uint64)
+            hamming = np.zeros((len(block), len(bits)), dtype=np.uint16)
+            for word in range(block.shape[1]):
+                hamming += _popcount(block[:, word, np.newaxis] ^ bits[np.newaxis, :, word])
+            return -hamming.astype(np.float32)
+        block = np.asarray(self.codes[start:end], dtype=np.float32)
+        return (block @ queries.T) * self.scales[start:end, np.newaxis]
+
+
+class NumpyVectorStore(VectorStore):
+    """Matrice de vecteurs mappée en mémoire (vectors.bin) et table des passages (store.sqlite).
+
+    Les lignes libérées par une suppression sont réutilisées. En int8, chaque
+    ligne est quantifiée symétriquement avec sa propre échelle (scales.bin).
+    Sans quantification, la recherche est exacte ; elle parcourt la matrice par
+    blocs pour borner la mémoire temporaire. Avec VECTOR_QUANTIZATION (binary
+    ou int8), une première passe sur les codes compacts retient
+    VECTOR_RESCORE_CANDIDATES candidats, re-classés ensuite exactement avec
+    les vecteurs complets : la matrice peut rester sur disque (float32 compris)
+    et seuls les codes ont besoin de tenir en RAM.
+    """
+
+    name = "numpy"
+    manifest_path = os.path.join(NUMPY_STORE_PATH, "manifest.json")
+    BLOCK_ROWS = 65536
+
+    def __init__(self, path=NUMPY_STORE_PATH, dtype=NUMPY_STORE_DTYPE, space=VECTOR_SPACE,
+                 quantization=VECTOR_QUANTIZATION, rescore=VECTOR_RESCORE_CANDIDATES):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        os.makedirs(path, exist_ok=True)
+        self.vectors_file = os.path.join(path, "vectors.bin")
+        self.scales_file = os.path.join(path, "scales.bin")
+        self.quantization = quantization
+        self.rescore = rescore
+        self._lock = threading.RLock()
+
+        self.db = sqlite3.connect(os.path.join(path, "store.sqlite"), check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS passages (
+            id TEXT PRIMARY KEY,
+            row INTEGER UNIQUE NOT NULL,
+            document TEXT NOT NULL,
+            metadata TEXT NOT NULL
+        )""")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+
+        self.wanted = {"dtype": np.dtype(dtype).name, "space": space}
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        self.dtype = np.dtype(meta.get("dtype", self.wanted["dtype"]))
+        self.space = meta.get("space", space)
+        if quantization == "binary" and "l2" in (space, self.space):
+            # Le signe des composantes ignore la norme des vecteurs : inutilisable pour classer en l2
+            raise ValueError("Quantification binary incompatible avec la distance l2 (utiliser int8 ou cosine).")
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        self._load()
+
+    # --- État en mémoire ------------------------------------------------------------
+
+    def _load(self):
+        """Masque des lignes occupées, normes (l2), matrices mappées et codes de première passe"""
+        rows = [row for (row,) in self.db.execute("SELECT row FROM passages")]
+        self._size = max(rows) + 1 if rows else 0
+        self._matrix = self._scales = self._codes = None
+        capacity = self._capacity()
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._valid[rows] = True
+        self._free = sorted(set(range(self._size)) - set(rows), reverse=True)
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        if not capacity:
+            return
+        self._map(capacity)
+        if self.space == "l2" and self._size:
+            for start in range(0, self._size, self.BLOCK_ROWS):
+                block = self._block(start, min(self._size, start + self.BLOCK_ROWS))
+                self._norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+        if self._codes is not None:
+            self._check_codes()
+        else:
+            # Codes non tenus à jour sans quantification : à recalculer si elle est réactivée
+            self.db.execute("DELETE FROM meta WHERE key = 'codes'")
+            self.db.commit()
+
+    def _check_codes(self):
+        """Recalcule les codes depuis la matrice s'ils manquent (quantification activée après l'indexation)"""
+        built = self.db.execute("SELECT value FROM meta WHERE key = 'codes'").fetchone()
+        if built and built[0] == self.quantization:
+            return
+        logger.info(f"🗜️ Calcul des codes {self.quantization} de {self._size} vecteurs...")
+        for start in range(0, self._size, self.BLOCK_ROWS):
+            end = min(self._size, start + self.BLOCK_ROWS)
+            self._codes.write(np.arange(start, end), self._block(start, end))
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('codes', ?)", (self.quantization,))
+        self.db.commit()
+
+    def _capacity(self):
+        if self.dim is None or not os.path.exists(self.vectors_file):
+            return 0
+        return os.path.getsize(self.vectors_file) // (self.dim * self.dtype.itemsize)
+
+    def _map(self, min_rows):
+        """(Re)mappe la matrice (échelles int8, codes), agrandie par doublement si nécessaire"""
+        capacity = self._capacity()
+        if min_rows > capacity:
+            capacity = max(min_rows, 2 * capacity, 1024)
+            with open(self.vectors_file, "ab") as f:
+                f.truncate(capacity * self.dim * self.dtype.itemsize)
+            if self.dtype == np.int8:
+                with open(self.scales_file, "ab") as f:
+                    f.truncate(capacity * 4)
+            self._valid = np.concatenate([self._valid, np.zeros(capacity - len(self._valid), dtype=bool)])
+            self._norms = np.concatenate([self._norms, np.zeros(capacity - len(self._norms), dtype=np.float32)])
+            self._matrix = None
+        if self._matrix is None:
+            self._matrix = np.memmap(self.vectors_file, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+            if self.dtype == np.int8:
+                self._scales = np.memmap(self.scales_file, dtype=np.float32, mode="r+", shape=(capacity,))
+            if self.quantization != "none":
+                self._codes = self._codes or QuantizedCodes(self.path, self.quantization, self.dim)
+                self._codes.map(capacity)
+        return self._matrix
+
+    def _block(self, start, end):
+        """Lignes [start, end) en float32 (déquantifiées en int8)"""
+        block = np.asarray(self._matrix[start:end], dtype=np.float32)
+        if self.dtype == np.int8:
+            block *= self._scales[start:end, np.newaxis]
+        return block
+
+    def _block_rows(self, rows):
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+        if self.dtype == np.int8:
+            vectors *= self._scales[rows, np.newaxis]
+        return vectors
+
+    def _prepare(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.space == "cosine":
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    # --- Écriture -------------------------------------------------------------------
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+
+    def _rows(self, ids):
+        rows = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(self.db.execute(f"SELECT id, row FROM passages WHERE id IN ({placeholders})", chunk))
+        return rows
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        ids = list(ids)
+        if not ids:
+            return
+        vectors = self._prepare(embeddings)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self.dtype, self.space = np.dtype(self.wanted["dtype"]), self.wanted["space"]
+                meta = [("dim", str(self.dim)), ("dtype", self.dtype.name), ("space", self.space)]
+                if self.quantization != "none":
+                    meta.append(("codes", self.quantization))
+                self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimension {vectors.shape[1]} incompatible avec le stockage ({self.dim}).")
+
+            rows = self._rows(ids)
+            for passage_id in ids:
+                if passage_id not in rows:
+                    if self._free:
+                        rows[passage_id] = self._free.pop()
+                    else:
+                        rows[passage_id] = self._size
+                        self._size += 1
+            targets = np.array([rows[passage_id] for passage_id in ids])
+
+            matrix = self._map(self._size)
+            if self.dtype == np.int8:
+                matrix[targets], self._scales[targets] = quantize_int8(vectors)
+                self._scales.flush()
+            else:
+                matrix[targets] = vectors.astype(self.dtype)
+            matrix.flush()
+            if self._codes is not None:
+                self._codes.write(targets, vectors)
+            if self.space == "l2":
+                stored = self._block_rows(targets)
+                self._norms[targets] = np.einsum("ij,ij->i", stored, stored)
+
+            # Le vecteur est écrit avant que le passage ne devienne visible
+            self.db.executemany(
+                "INSERT OR REPLACE INTO passages (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                [(passage_id, int(rows[passage_id]), document, json.dumps(metadata, ensure_ascii=False))
+                 for passage_id, document, metadata in zip(ids, documents, metadatas)])
+            self.db.commit()
+            self._valid[targets] = True
+
+    def delete(self, ids):
+        ids = list(ids)
+        with self._lock:
+            rows = self._rows(ids)
+            if not rows:
+                return
+            self._valid[list(rows.values())] = False
+            self.db.executemany("DELETE FROM passages WHERE id = ?", [(i,) for i in rows])
+            self.db.commit()
+            self._free.extend(rows.values())
+            self._free.sort(reverse=True)
+
+    def needs_rebuild(self):
+        return self.dim is not None and (self.dtype.name, self.space) != (self.wanted["dtype"], self.wanted["space"])
+
+    def _clear(self):
+        with self._lock:
+            self.db.execute("DELETE FROM passages")
+            self.db.execute("DELETE FROM meta")
+            self.db.commit()
+            self._matrix = self._scales = None
+            for path in (self.vectors_file, self.scales_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            if self._codes is not None:
+                self._codes.remove()
+            self.dim = None
+            self.dtype, self.space = np.dtype(self.wanted["dtype"]), self.wanted["space"]
+            self._load()
+
+    def disk_size(self):
+        return directory_size(self.path)
+
+    def resident_size(self):
+        """Octets lus par une recherche : codes + candidats re-classés, ou matrice entière sans quantification"""
+        if self.dim is None:
+            return 0
+        if self._codes is not None:
+            return self._size * self._codes.row_bytes() + self.rescore * self.dim * self.dtype.itemsize
+        return self._size * (self.dim * self.dtype.itemsize + (4 if self.dtype == np.int8 else 0))
+
+    # --- Recherche ------------------------------------------------------------------
+
+    def _to_distances(self, dots, norms, queries):
+        """Produits scalaires (lignes, questions) -> distances selon la métrique du stockage"""
+        if self.space == "l2":
+            return norms[:, np.newaxis] - 2 * dots + np.einsum("ij,ij->i", queries, queries)
+        return 1 - dots
+
+    def _scan(self, queries, scores):
+        """Matrice (lignes, questions) des scores par blocs, -inf pour les lignes libres"""
+        size = self._size
+        result = np.empty((size, len(queries)), dtype=np.float32)
+        for start in range(0, size, self.BLOCK_ROWS):
+            end = min(size, start + self.BLOCK_ROWS)
+            result[start:end] = scores(queries, start, end)
+        result[~self._valid[:size]] = -np.inf
+        return result
+
+    def _search(self, queries, k):
+        """(lignes, distances) des k plus proches voisins de chaque question, triés"""
+        if self._codes is None:
+            dots = self._scan(queries, lambda q, start, end: self._block(start, end) @ q.T)
+            distances = self._to_distances(dots, self._norms[:self._size], queries)
+            return [_top_k(column, k) for column in distances.T]
+
+        # Première passe approchée sur les codes, puis re-classement exact des candidats
+        scores = self._codes.scores
+        if self.space == "l2":
+            # -distance l2 à une constante près (|q|²) : 2 q·x - |x|²
+            scores = lambda q, start, end: 2 * self._codes.scores(q, start, end) - self._norms[start:end, np.newaxis]
+        approx = self._scan(queries, scores)
+        found = []
+        for query, column in zip(queries, approx.T):
+            candidates, _ = _top_k(-column, max(self.rescore, k))
+            rows = np.sort(candidates[self._valid[candidates]])
+            dots = self._block_rows(rows) @ query
+            distances = self._to_distances(dots[:, np.newaxis], self._norms[rows], query[np.newaxis])[:, 0]
+            top, top_distances = _top_k(distances, k)
+            found.append((rows[top], top_distances))
+        return found
+
+    def query(self, query_embeddings, n_results):
+        queries = self._prepare(np.atleast_2d(query_embeddings))
+        results = {"ids": [], "documents": [], "metadatas": [], "embeddings": [], "distances": []}
+        with self._lock:
+            k = min(n_results, int(self._valid[:self._size].sum())) if self.dim is not None else 0
+            if not k:
+                for key in results:
+                    results[key] = [[] for _ in queries]
+                return results
+
+            for top, distances in self._search(queries, k):
+                placeholders = ",".join("?" * len(top))
+                found = {row: (passage_id, document, metadata) for passage_id, row, document, metadata in self.db.execute(
+                    f"SELECT id, row, document, metadata FROM passages WHERE row IN ({placeholders})",
+                    [int(r) for r in top])}
+                results["ids"].append([found[r][0] for r in top])
+                results["documents"].append([found[r][1] for r in top])
+                results["metadatas"].append([json.loads(found[r][2]) for r in top])
+                results["embeddings"].append(self._block_rows(top))
+                results["distances"].append([float(d) for d in distances])
+        return results
+
+
+def _top_k(distances, k):
+    """Indices et valeurs des k plus petites distances, triés (argpartition puis tri des k)"""
+    top = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+    top = top[np.argsort(distances[top], kind="stable")]
+    return top, distances[top]
+
+
+VECTOR_STORES = {
+    ChromaVectorStore.name: ChromaVectorStore,
+    NumpyVectorStore.name: NumpyVectorStore,
+}
+
+
+def open_vector_store(name=VECTOR_STORE, **kwargs):
+    if name not in VECTOR_STORES:
+        raise ValueError(f"Stockage vectoriel inconnu : {name} (disponibles : {', '.join(VECTOR_STORES)})")
+    return VECTOR_STORES[name](**kwargs)